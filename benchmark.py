@@ -1,63 +1,294 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # Author: eph, Thomas Roder
+"""
+Benchmark all available backends and track regressions against a stored baseline.
 
-from timeit import timeit
-from scipy.stats import fisher_exact as fisher_scipy
+Suites:
+    latency  mean time of a single test, per backend, workload family and alternative
+    batch    throughput of the batch functions, in tables per second
+    threads  throughput of the cython batch function with 1, 2, 4, ... threads
+    memory   peak memory allocated by the batch functions, in bytes per table (traced by tracemalloc)
+
+The tables of each workload family are generated from a fixed seed, and every timing is the best of --repeat runs,
+so results are comparable between runs on the same machine.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json --threshold 0.1  # exit code 1 if anything got >10% worse
+"""
+import os
+import sys
+import json
+import platform
+import argparse
+import tracemalloc
+from time import perf_counter
+from datetime import datetime, timezone
+from importlib import import_module
+
+import numpy as np
+
+import fast_fisher
 from fast_fisher import fast_fisher_python
-from fast_fisher import fast_fisher_compiled
-from fast_fisher import fast_fisher_cython
-from fisher import pvalue as brentp_fisher  # pip install git+https://github.com/brentp/fishers_exact_test.git
-
-# fisher_scipy = lambda table, type: [0, 0]
-#
-#
-# class FakeRes:
-#     left_tail = 0
-#     right_tail = 0
-#     two_tail = 0
-#
-#
-# brentp_fisher = lambda a, b, c, d: FakeRes
 
-if __name__ == '__main__':
+ALTERNATIVES = ('less', 'greater', 'two-sided')
+TAIL_SUFFIX = {'less': 'l', 'greater': 'r', 'two-sided': 't'}
+BRENTP_TAIL = {'less': 'left_tail', 'greater': 'right_tail', 'two-sided': 'two_tail'}
+FAMILIES = ('small', 'moderate', 'skewed', 'huge', 'near_maxn')
+SUITES = ('latency', 'batch', 'threads', 'memory')
+
+
+# ======================== Backends ========================
+
+def _fast_fisher_backend(module_name):
+    def load():
+        module = import_module(module_name)
+        tests = {alternative: getattr(module, f'test1{suffix}') for alternative, suffix in TAIL_SUFFIX.items()}
+        batch = getattr(module, 'fisher_exact_batch', None)
+        return (lambda a, b, c, d, alternative: tests[alternative](a, b, c, d)), batch
+
+    return load
+
+
+def _load_scipy():
+    from scipy.stats import fisher_exact
+    return (lambda a, b, c, d, alternative: fisher_exact([[a, b], [c, d]], alternative)[1]), None
+
+
+def _load_brentp():
+    from fisher import pvalue  # pip install git+https://github.com/brentp/fishers_exact_test.git
+    return (lambda a, b, c, d, alternative: getattr(pvalue(a, b, c, d), BRENTP_TAIL[alternative])), None
+
+
+BACKENDS = {
+    'python': _fast_fisher_backend('fast_fisher.fast_fisher_python'),
+    'numba': _fast_fisher_backend('fast_fisher.fast_fisher_numba'),
+    'compiled': _fast_fisher_backend('fast_fisher.fast_fisher_compiled'),  # python -m fast_fisher.fast_fisher_numba
+    'cython': _fast_fisher_backend('fast_fisher.fast_fisher_cython'),
+    'scipy': _load_scipy,
+    'brentp': _load_brentp,
+}
+
+
+def load_backends(names) -> dict:
+    """
+    :return: {name: (test, batch)} of all backends that can be imported; batch is None if there is no batch function
+    """
+    backends = {}
+    for name in names:
+        try:
+            backends[name] = BACKENDS[name]()
+        except ImportError as e:
+            print(f'skipping {name}: {e}', file=sys.stderr)
+    return backends
+
+
+# ======================== Workloads ========================
+
+def workload(family: str, n: int, seed: int):
+    """
+    :return: a, b, c, d as int64 arrays of n tables of the given family
+    """
+    rng = np.random.default_rng([seed, FAMILIES.index(family)])
+    if family == 'small':
+        return tuple(rng.integers(0, 20, (4, n)))
+    if family == 'moderate':
+        return tuple(rng.integers(0, 1000, (4, n)))
+    if family == 'skewed':
+        # one small row against a large one
+        a, b = rng.integers(0, 20, (2, n))
+        c, d = rng.integers(10 ** 4, 10 ** 6, (2, n))
+        return a, b, c, d
+    if family == 'huge':
+        # grand totals on both sides of the switch to the large-total mode
+        a, b = rng.integers(0, 1000, (2, n))
+        c, d = (10 ** rng.uniform(6, 10, (2, n))).astype(np.int64)
+        return a, b, c, d
+    if family == 'near_maxn':
+        # grand totals just below the precision limit MAXN of the log-factorials
+        total_max = min(fast_fisher_python.MAXN, fast_fisher_python.MAX_TOTAL)
+        a, b = rng.integers(0, 1000, (2, n))
+        c = rng.integers(total_max // 4, total_max // 2, n)
+        d = rng.integers(total_max // 4, total_max // 2, n) - a - b
+        return a, b, c, d
+    raise ValueError(f'unknown workload family: {family}')
+
+
+# ======================== Measurements ========================
+
+def best_time(function, repeat: int) -> float:
+    """
+    :return: the shortest of `repeat` runs of function, in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def bench_latency(backends: dict, families, args, results: dict):
+    for family in families:
+        tables = list(zip(*(x.tolist() for x in workload(family, args.latency_tables, args.seed))))
+        for name, (test, _) in backends.items():
+            for alternative in ALTERNATIVES:
+                try:
+                    test(*tables[0], alternative)  # warm up, e.g. numba compilation
+                except (ValueError, OverflowError) as e:
+                    print(f'skipping latency/{name}/{family}/{alternative}: {e}', file=sys.stderr)
+                    continue
+
+                def run():
+                    for table in tables:
+                        test(*table, alternative)
 
-    test_mapping = {'left-tailed': 'less',
-                    'right-tailed': 'greater',
-                    'two-tailed': 'two-sided'}
-
-    setup = 'from __main__ import fisher_scipy, fast_fisher_python, fast_fisher_compiled, fast_fisher_cython, brentp_fisher'
-
-    print('| {:>6s} | {:>6s} | {:>6s} | {:>6s} | {:>12s} | {:>9s} | {:>9s} | {:>10s} | {:>10s} | {:>10s} |'
-          .format('a', 'b', 'c', 'd', 'test type', 'scipy', 'f_python', 'f_compiled', 'f_cython', 'brentp'))
-    print('|-------:|-------:|-------:|-------:|-------------:|----------:|----------:|-----------:|-----------:|-----------:|')
-    for a, b, c, d, test_type in [
-        (8, 2, 1, 5, 'left-tailed'),
-        (8, 2, 1, 5, 'right-tailed'),
-        (8, 2, 1, 5, 'two-tailed'),
-        (10, 100, 10, 100, 'left-tailed'),
-        (10, 100, 10, 100, 'right-tailed'),
-        (10, 100, 10, 100, 'two-tailed'),
-        (10, 1000, 10000, 100000, 'left-tailed'),
-        (100, 1000, 10000, 100000, 'right-tailed'),
-        (100, 1000, 10000, 100000, 'two-tailed'),
-        (10000, 100, 1000, 100000, 'left-tailed'),
-        (10000, 100, 1000, 100000, 'right-tailed'),
-        (10000, 100, 1000, 100000, 'two-tailed'),
-        (10000, 10000, 10000, 10000, 'left-tailed'),
-        (10000, 10000, 10000, 10000, 'right-tailed'),
-        (10000, 10000, 10000, 10000, 'two-tailed'),
-    ]:
-        print('| {:>6d} | {:>6d} | {:>6d} | {:>6d} | {:>12s} | {:>6.0f} us | {:>6.0f} us | {:>7.0f} us | {:>7.0f} us | {:>7.0f} us |'.format(
-            a, b, c, d, test_type,
-            timeit(f'fisher_scipy([[{a}, {b}], [{c}, {d}]], "{test_mapping[test_type]}")',
-                   setup=setup, number=100) * 1e4,
-            timeit(f'fast_fisher_python.test1{test_type[0]}({a}, {b}, {c}, {d})',
-                   setup=setup, number=100) * 1e4,
-            timeit(f'fast_fisher_compiled.test1{test_type[0]}({a}, {b}, {c}, {d})',
-                   setup=setup, number=100) * 1e4,
-            timeit(f'fast_fisher_cython.test1{test_type[0]}({a}, {b}, {c}, {d})',
-                   setup=setup, number=100) * 1e4,
-            timeit(f'brentp_fisher({a}, {b}, {c}, {d}).{test_type.replace("-", "_").rstrip("ed")}',
-                   setup=setup, number=100) * 1e4,
-        ))
+                seconds = best_time(run, args.repeat) / len(tables)
+                results[f'latency/{name}/{family}/{alternative}'] = {'value': seconds * 1e6, 'unit': 'us',
+                                                                     'better': 'lower'}
+
+
+def bench_batch(backends: dict, families, args, results: dict):
+    for family in families:
+        for name, (_, batch) in backends.items():
+            if batch is None:
+                continue
+            n = args.batch_tables
+            a, b, c, d = workload(family, n, args.seed)
+            for alternative in ALTERNATIVES:
+                seconds = best_time(lambda: batch(a, b, c, d, alternative), args.repeat)
+                results[f'batch/{name}/{family}/{alternative}'] = {'value': n / seconds, 'unit': 'tables/s',
+                                                                   'better': 'higher'}
+
+
+def bench_threads(backends: dict, families, args, results: dict):
+    if 'cython' not in backends:
+        return
+    batch = backends['cython'][1]
+    cpus = os.cpu_count() or 1
+    threads = sorted({1, cpus} | {2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus})
+    for family in families:
+        a, b, c, d = workload(family, args.batch_tables, args.seed)
+        for num_threads in threads:
+            seconds = best_time(lambda: batch(a, b, c, d, 'two-sided', num_threads=num_threads), args.repeat)
+            results[f'threads/cython/{family}/{num_threads}'] = {'value': args.batch_tables / seconds,
+                                                                 'unit': 'tables/s', 'better': 'higher'}
+
+
+def bench_memory(backends: dict, families, args, results: dict):
+    for family in families:
+        for name, (_, batch) in backends.items():
+            if batch is None:
+                continue
+            n = args.batch_tables
+            a, b, c, d = workload(family, n, args.seed)
+            tracemalloc.start()
+            try:
+                batch(a, b, c, d, 'two-sided')
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            results[f'memory/{name}/{family}/two-sided'] = {'value': peak / n, 'unit': 'bytes/table',
+                                                            'better': 'lower'}
+
+
+BENCHMARKS = {'latency': bench_latency, 'batch': bench_batch, 'threads': bench_threads, 'memory': bench_memory}
+
+
+# ======================== Reporting ========================
+
+def metadata() -> dict:
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'fast_fisher': fast_fisher.__version__,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    :return: [(key, baseline value, new value, relative slowdown)] of all results more than threshold worse
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        old, new = baseline[key]['value'], result['value']
+        if old <= 0 or new <= 0:
+            continue
+        slowdown = new / old - 1 if result['better'] == 'lower' else old / new - 1
+        if slowdown > threshold:
+            regressions.append((key, old, new, slowdown))
+    return regressions
+
+
+def print_markdown(results: dict, baseline: dict):
+    print('| benchmark | value | unit | baseline | change |')
+    print('|:----------|------:|:-----|---------:|-------:|')
+    for key, result in results.items():
+        old = baseline.get(key, {}).get('value')
+        change = f'{result["value"] / old - 1:+.1%}' if old else ''
+        print(f'| {key} | {result["value"]:.4g} | {result["unit"]} | {"" if old is None else f"{old:.4g}"} | {change} |')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='comma-separated (default: all available)')
+    parser.add_argument('--suites', default=','.join(SUITES), help='comma-separated (default: all)')
+    parser.add_argument('--families', default=','.join(FAMILIES), help='comma-separated (default: all)')
+    parser.add_argument('--latency-tables', type=int, default=200, help='tables per latency measurement')
+    parser.add_argument('--batch-tables', type=int, default=2 ** 16, help='tables per batch measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='timings are the best of this many runs')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated workloads')
+    parser.add_argument('--quick', action='store_true', help='10x fewer tables and 3 repeats')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--baseline', help='compare to the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown flagged as regression')
+    args = parser.parse_args(argv)
+    for option, choices in (('backends', BACKENDS), ('suites', SUITES), ('families', FAMILIES)):
+        values = getattr(args, option).split(',')
+        if not set(values) <= set(choices):
+            parser.error(f'--{option} must be a subset of {",".join(choices)}')
+        setattr(args, option, values)
+    if args.quick:
+        args.latency_tables = max(1, args.latency_tables // 10)
+        args.batch_tables = max(1, args.batch_tables // 10)
+        args.repeat = min(args.repeat, 3)
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    backends = load_backends(args.backends)
+    results = {}
+    for suite in args.suites:
+        BENCHMARKS[suite](backends, args.families, args, results)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored['results']
+        if stored['metadata'].get('platform') != platform.platform():
+            print(f'warning: the baseline is from another platform: {stored["metadata"].get("platform")}',
+                  file=sys.stderr)
+    print_markdown(results, baseline)
+
+    if args.output:
+        settings = {key: getattr(args, key) for key in ('latency_tables', 'batch_tables', 'repeat', 'seed')}
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': metadata(), 'settings': settings, 'results': results}, f, indent=2)
+
+    regressions = compare(results, baseline, args.threshold)
+    for key, old, new, slowdown in regressions:
+        print(f'REGRESSION {key}: {old:.4g} -> {new:.4g} ({slowdown:.1%} worse)', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
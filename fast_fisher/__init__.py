@@ -1,22 +1,64 @@
 __version__ = '0.0.4'
 
-from logging import warning
+from importlib import import_module
 
-from . import fast_fisher_python
+from .backends import BACKENDS, set_backend, get_backend, backend_name, available_backends, warm_up
 
-# from . import fast_fisher_numba
-# from . import fast_fisher_compiled
+# imported on first access, see __getattr__
+_LAZY_ATTRIBUTES = {
+    'AsyncFisher': '.aio',
+    'FisherCache': '.cache',
+    'FixedMargins': '.margins',
+    'PresenceAbsence': '.presence',
+    'ResultStore': '.store',
+    'sharded_batch': '.sharded',
+    'deduplicated_batch': '.batch',
+    'chunked_batch': '.batch',
+}
+_BACKEND_ATTRIBUTES = ('odds_ratio', 'STATUS_OK', 'STATUS_INVALID', 'STATUS_OVERFLOW', 'enable_lnfact_table',
+                       'disable_lnfact_table', 'enable_recurrence', 'disable_recurrence', 'enable_stats',
+                       'disable_stats', 'reset_stats', 'get_stats')
 
-try:
-    from . import fast_fisher_cython
 
-    fast_fisher = fast_fisher_cython
-except ImportError as e:
-    warning(f'Failed to import fast_fisher_cython: {str(e)}')
+def __getattr__(name: str):
+    # keeps `import fast_fisher` cheap: neither the backend nor numpy is imported before they are needed
+    if name == 'fast_fisher':
+        return get_backend()
+    if name in _BACKEND_ATTRIBUTES:
+        return getattr(get_backend(), name)
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-    fast_fisher = fast_fisher_python
 
-odds_ratio = fast_fisher.odds_ratio
+_cache = None
+
+
+def enable_cache(maxsize: int = 2 ** 16) -> 'FisherCache':
+    """
+    Memoize fast_fisher_exact in a bounded LRU cache. The eight equivalent permutations of a table share one entry.
+
+    :param maxsize: maximal number of cached (table, alternative) entries
+    :return: the cache, which also offers cached versions of test1*, mlnTest1* and mlog10Test1*
+    """
+    from .cache import FisherCache
+
+    global _cache
+    _cache = FisherCache(get_backend(), maxsize)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+
+def cache_info():
+    """
+    :return: CacheInfo(hits, misses, evictions, maxsize, currsize), or None if the cache is disabled
+    """
+    return None if _cache is None else _cache.cache_info()
+
 
 def fast_fisher_exact(a: int, b: int, c: int, d: int, alternative: str = 'two-sided'):
     """
@@ -32,7 +74,155 @@ def fast_fisher_exact(a: int, b: int, c: int, d: int, alternative: str = 'two-si
     if alternative is None:
         alternative = 'two-sided'
 
-    return fast_fisher.fisher_exact(a, b, c, d, alternative)
+    if _cache is not None:
+        return _cache.fisher_exact(a, b, c, d, alternative)
+    return get_backend().fisher_exact(a, b, c, d, alternative)
+
+
+def fast_fisher_exact_array(a, b, c, d, alternative: str = 'two-sided', out=None):
+    """
+    Perform Fisher exact tests on arrays of 2x2 contingency tables.
+
+    The inputs are broadcast against each other like in any NumPy ufunc.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional output array of float64
+    :return: array of pvalues
+    """
+    if alternative is None:
+        alternative = 'two-sided'
+
+    return get_backend().fisher_exact_array(a, b, c, d, alternative, out)
+
+
+def fast_fisher_exact_batch(a, b, c, d, alternative: str = 'two-sided', out=None, output: str = 'pvalue',
+                            num_threads: int = 0, dedup: bool = False, chunk_size: int = 2 ** 20,
+                            errors: str = 'raise', status=None):
+    """
+    Perform Fisher exact tests on 1-D arrays of contingency tables, spread over several threads.
+
+    Unlike fast_fisher_exact_array, this releases the GIL and uses one thread per CPU by default.
+    int32 and int64 arrays, including memory maps, are used without copying them, and the tables are computed in
+    chunks, so that apart from the inputs and out, the memory needed does not grow with the number of tables.
+
+    :param a: row 1 col 1 (1-D array of integers)
+    :param b: row 1 col 2 (1-D array of integers)
+    :param c: row 2 col 1 (1-D array of integers)
+    :param d: row 2 col 2 (1-D array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional contiguous output array of float64, e.g. a memory map
+    :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+    :param num_threads: number of threads (default: 0, i.e. one per CPU)
+    :param dedup: compute each table only once, taking into account that eight permutations of a table are equivalent
+                  (needs memory for all tables at once)
+    :param chunk_size: number of tables computed at once (default: 2 ** 20)
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table after all others have been computed, or only
+                   set its result to NaN (default: 'raise')
+    :param status: optional output array of int8 for the status of each table, see table_status
+    :return: array of results
+    """
+    if alternative is None:
+        alternative = 'two-sided'
+
+    from .batch import deduplicated_batch, chunked_batch
+
+    if dedup:
+        import numpy as np
+
+        a, b, c, d = (np.ascontiguousarray(x, dtype=np.int64) for x in (a, b, c, d))
+        if status is not None:
+            table_status(a, b, c, d, out=status, num_threads=num_threads)
+        return deduplicated_batch(get_backend().fisher_exact_batch, a, b, c, d, alternative, out,
+                                  output=output, num_threads=num_threads, errors=errors)
+    return chunked_batch(get_backend().fisher_exact_batch, a, b, c, d, alternative, out=out, chunk_size=chunk_size,
+                         status=status, output=output, num_threads=num_threads, errors=errors)
+
+
+def is_significant(a: int, b: int, c: int, d: int, alpha: float = 0.05, alternative: str = 'two-sided') -> bool:
+    """
+    Decide whether the pvalue of a Fisher exact test on a 2x2 contingency table is below alpha.
+
+    This stops summing as soon as the decision is certain, which is much faster than computing the pvalue.
+
+    :param a: row 1 col 1
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param alpha: significance level, 0 < alpha <= 1 (default: 0.05)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :return: whether pvalue < alpha
+    """
+    if alternative is None:
+        alternative = 'two-sided'
+
+    return get_backend().is_significant(a, b, c, d, alpha, alternative)
+
+
+def is_significant_batch(a, b, c, d, alpha: float = 0.05, alternative: str = 'two-sided', out=None,
+                         num_threads: int = 0, chunk_size: int = 2 ** 20, errors: str = 'raise', status=None):
+    """
+    Decide for 1-D arrays of contingency tables whether their pvalues are below alpha, spread over several threads.
+
+    Like fast_fisher_exact_batch, this takes int32 and int64 arrays without copying and works in chunks.
+
+    :param a: row 1 col 1 (1-D array of integers)
+    :param b: row 1 col 2 (1-D array of integers)
+    :param c: row 2 col 1 (1-D array of integers)
+    :param d: row 2 col 2 (1-D array of integers)
+    :param alpha: significance level, 0 < alpha <= 1 (default: 0.05)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional contiguous output array of bool
+    :param num_threads: number of threads (default: 0, i.e. one per CPU)
+    :param chunk_size: number of tables decided at once (default: 2 ** 20)
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table after all others have been decided, or only
+                   set its result to False (default: 'raise')
+    :param status: optional output array of int8 for the status of each table, see table_status
+    :return: boolean array, whether pvalue < alpha
+    """
+    if alternative is None:
+        alternative = 'two-sided'
+
+    from .batch import chunked_batch
+
+    return chunked_batch(get_backend().is_significant_batch, a, b, c, d, alpha, alternative, out=out, out_dtype=bool,
+                         chunk_size=chunk_size, status=status, num_threads=num_threads, errors=errors)
+
+
+def table_status(a, b, c, d, out=None, num_threads: int = 0, chunk_size: int = 2 ** 20):
+    """
+    Validate 1-D arrays of contingency tables in one vectorized pass, without computing any test.
+
+    :param a: row 1 col 1 (1-D array of integers)
+    :param b: row 1 col 2 (1-D array of integers)
+    :param c: row 2 col 1 (1-D array of integers)
+    :param d: row 2 col 2 (1-D array of integers)
+    :param out: optional contiguous output array of int8
+    :param num_threads: number of threads (default: 0, i.e. one per CPU)
+    :param chunk_size: number of tables validated at once (default: 2 ** 20)
+    :return: array of STATUS_OK, STATUS_INVALID (negative counts) or STATUS_OVERFLOW (grand total above 2 ** 53)
+    """
+    from .batch import chunked_batch
+
+    return chunked_batch(get_backend().table_status, a, b, c, d, out=out, out_dtype='int8', chunk_size=chunk_size,
+                         num_threads=num_threads)
+
+
+def odds_ratio_array(a, b, c, d, out=None):
+    """
+    Calculate odds ratios of arrays of contingency tables.
+
+    :param a: row 1 col 1 (array)
+    :param b: row 1 col 2 (array)
+    :param c: row 2 col 1 (array)
+    :param d: row 2 col 2 (array)
+    :param out: optional output array of float64
+    :return: array of odds ratios
+    """
+    return get_backend().odds_ratio_array(a, b, c, d, out)
 
 
 def fast_fisher_exact_compatibility(table: [[int, int], [int, int]], alternative: str = 'two-sided'):
@@ -44,7 +234,5 @@ def fast_fisher_exact_compatibility(table: [[int, int], [int, int]], alternative
     :return: pvalue
     """
     (a, b), (c, d) = table
-    return fast_fisher.odds_ratio(a, b, c, d), fast_fisher.fisher_exact(a, b, c, d, alternative)
-
-
-
+    backend = get_backend()
+    return backend.odds_ratio(a, b, c, d), backend.fisher_exact(a, b, c, d, alternative)
@@ -0,0 +1,214 @@
+"""
+Stream contingency tables from files or stdin through the Fisher exact test.
+
+Reads whitespace- or delimiter-separated rows, takes a, b, c, d (or a, ab, ac, abcd with --margins) from four of the
+columns and appends the requested result columns. The input is processed in chunks of --chunk-size rows: one thread
+parses, one computes and one writes, so memory stays constant however long the input is. Invalid tables (negative
+counts or a grand total above 2 ** 53) get NaN results and are counted in a warning at the end, unless --strict.
+
+    python -m fast_fisher counts.tsv -o results.tsv
+    zcat counts.tsv.gz | python -m fast_fisher --header --columns 2,3,4,5 --alternative greater > results.tsv
+"""
+import os
+import sys
+import argparse
+from math import log, nan
+from contextlib import nullcontext
+from queue import Queue
+from threading import Thread
+from itertools import islice
+
+import numpy as np
+
+from . import fast_fisher_exact_batch, odds_ratio_array, STATUS_OK
+
+OUTPUT_COLUMNS = ('pvalue', 'mlog10', 'odds_ratio', 'status')
+DEFAULT_OUTPUT_COLUMNS = ('pvalue', 'mlog10', 'odds_ratio')
+LN10 = log(10)
+# number of chunks that may be waiting between the threads
+QUEUE_SIZE = 2
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m fast_fisher', description="Fisher's exact test on table files.")
+    parser.add_argument('input', nargs='*', default=['-'], help="input files (default: '-', i.e. stdin)")
+    parser.add_argument('-o', '--output', default='-', help="output file (default: '-', i.e. stdout)")
+    parser.add_argument('--alternative', default='two-sided', choices=['two-sided', 'less', 'greater'])
+    parser.add_argument('--margins', action='store_true', help='the columns are a, ab, ac, abcd instead of a, b, c, d')
+    parser.add_argument('--columns', default='1,2,3,4', help='1-based indices of the four input columns (default: 1,2,3,4)')
+    parser.add_argument('--output-columns', default=','.join(DEFAULT_OUTPUT_COLUMNS),
+                        help=f'comma-separated subset of {",".join(OUTPUT_COLUMNS)} '
+                             f'(default: {",".join(DEFAULT_OUTPUT_COLUMNS)})')
+    parser.add_argument('-d', '--delimiter', default=None, help='column delimiter (default: any whitespace)')
+    parser.add_argument('--header', action='store_true', help='the first line of each input file is a header')
+    parser.add_argument('--only-results', action='store_true', help='do not repeat the input columns')
+    parser.add_argument('--chunk-size', type=int, default=2 ** 16, help='rows per chunk (default: 65536)')
+    parser.add_argument('--threads', type=int, default=0, help='computation threads (default: 0, i.e. one per CPU)')
+    parser.add_argument('--strict', action='store_true',
+                        help='stop at the first chunk with an invalid table instead of writing NaN for it')
+    args = parser.parse_args(argv)
+
+    try:
+        args.columns = [int(column) - 1 for column in args.columns.split(',')]
+    except ValueError:
+        parser.error(f'invalid --columns: {args.columns}')
+    if len(args.columns) != 4 or min(args.columns) < 0:
+        parser.error('--columns must be four positive column indices')
+    args.output_columns = args.output_columns.split(',')
+    if not set(args.output_columns) <= set(OUTPUT_COLUMNS):
+        parser.error(f'--output-columns must be a subset of {",".join(OUTPUT_COLUMNS)}')
+    if args.chunk_size <= 0:
+        parser.error('--chunk-size must be positive')
+    return args
+
+
+def open_input(path):
+    # stdin is not closed, so that '-' can be given more than once
+    return nullcontext(sys.stdin) if path == '-' else open(path)
+
+
+def read_lines(args, header: list):
+    """
+    Yield the data lines of all input files, without line endings. The header of the first file is put into `header`.
+    """
+    for path in args.input:
+        with open_input(path) as file:
+            if args.header:
+                line = file.readline().rstrip('\r\n')
+                if not header:
+                    header.append(line)
+            for line in file:
+                line = line.rstrip('\r\n')
+                if line:
+                    yield line
+
+
+def parse_chunk(lines: list, args):
+    """
+    :return: a, b, c, d as contiguous int64 arrays
+    """
+    fields = [line.split(args.delimiter) for line in lines]
+    try:
+        table = np.array([[row[column] for column in args.columns] for row in fields], dtype=np.int64)
+    except (IndexError, ValueError) as e:
+        raise ValueError(f'cannot parse the columns {args.columns} of the input: {e}')
+    a, b, c, d = (np.ascontiguousarray(table[:, i]) for i in range(4))
+    if args.margins:
+        a, b, c, d = a, b - a, c - a, d - b - c + a
+    return a, b, c, d
+
+
+def compute_chunk(a, b, c, d, args) -> dict:
+    """
+    :return: the arrays of the output columns, and always 'status', see table_status
+    """
+    status = np.empty(len(a), dtype=np.int8)
+    mln = fast_fisher_exact_batch(a, b, c, d, args.alternative, output='mln', num_threads=args.threads,
+                                  errors='raise' if args.strict else 'nan', status=status)
+    results = {'status': status}
+    if 'pvalue' in args.output_columns:
+        results['pvalue'] = np.exp(-mln)
+    if 'mlog10' in args.output_columns:
+        results['mlog10'] = mln / LN10
+    if 'odds_ratio' in args.output_columns:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results['odds_ratio'] = odds_ratio_array(a, b, c, d)
+        results['odds_ratio'][status != STATUS_OK] = nan
+    return results
+
+
+def format_chunk(lines: list, results: dict, args) -> str:
+    delimiter = args.delimiter or '\t'
+    columns = [map(repr, results[name].tolist()) for name in args.output_columns]
+    if args.only_results:
+        rows = zip(*columns)
+    else:
+        rows = zip(lines, *columns)
+    return ''.join(delimiter.join(row) + '\n' for row in rows)
+
+
+def run(args, output):
+    """
+    Stream all input through the Fisher exact test and write the results to `output`.
+
+    A reader thread parses the chunks and a writer thread formats and writes the results, while this thread computes.
+    The bounded queues between them keep at most a few chunks in memory.
+
+    :return: the number of invalid tables, whose results are NaN
+    """
+    header = []
+    lines = read_lines(args, header)
+    chunks = iter(lambda: list(islice(lines, args.chunk_size)), [])
+    parsed, computed = Queue(QUEUE_SIZE), Queue(QUEUE_SIZE)
+    write_errors = []
+    invalid = 0
+
+    def read():
+        # None marks the end, an exception is passed on to the computing thread
+        try:
+            for chunk in chunks:
+                parsed.put((chunk, parse_chunk(chunk, args)))
+        except BaseException as e:
+            parsed.put(e)
+        else:
+            parsed.put(None)
+
+    def write():
+        item = computed.get()
+        try:
+            # the header has been read by the time the first chunk arrives
+            if header:
+                columns = [] if args.only_results else header
+                output.write((args.delimiter or '\t').join(columns + args.output_columns) + '\n')
+            while item is not None:
+                output.write(format_chunk(*item, args))
+                item = computed.get()
+        except BaseException as e:
+            write_errors.append(e)
+            # keep the computing thread from blocking
+            while item is not None:
+                item = computed.get()
+
+    reader = Thread(target=read, daemon=True)
+    writer = Thread(target=write, daemon=True)
+    reader.start()
+    writer.start()
+    try:
+        while not write_errors:
+            item = parsed.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            chunk, table = item
+            results = compute_chunk(*table, args)
+            invalid += np.count_nonzero(results['status'] != STATUS_OK)
+            computed.put((chunk, results))
+    finally:
+        computed.put(None)
+        writer.join()
+    if write_errors:
+        raise write_errors[0]
+    return invalid
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        invalid = run(args, output)
+    except (ValueError, OverflowError) as e:
+        sys.exit(f'python -m fast_fisher: error: {e}')
+    except BrokenPipeError:
+        # e.g. piped into head: silence the error Python would print when flushing stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if invalid:
+        print(f'python -m fast_fisher: warning: {invalid} invalid tables, their results are NaN', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+asyncio front end for services, e.g. aiohttp: Fisher exact tests that do not block the event loop.
+
+Requests that arrive within max_delay of each other are coalesced into one call of fast_fisher_exact_batch, which runs
+in a worker thread and releases the GIL, so the event loop keeps serving other clients meanwhile. A batch is sent as
+soon as it has max_batch_size tables, or max_delay after its first table arrived, whichever comes first; while it is
+computed, the next batch is collected.
+
+Small tables (grand total up to inline_total) take only microseconds, less than handing them to a thread. They are
+computed right away on the event loop, so that they never wait for a batch. So are invalid tables, which raise the same
+errors as fast_fisher_exact.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# tables with grand totals up to this are computed on the event loop (a few microseconds each)
+INLINE_TOTAL = 2 ** 12
+# grand totals above this cannot be computed, see table_status
+MAX_TOTAL = 2 ** 53
+
+_ALTERNATIVES = ('two-sided', 'less', 'greater')
+
+
+class AsyncFisher:
+    """
+    Fisher exact tests for asyncio: small tables are computed right away, the others coalesced into batches that are
+    computed in a worker thread.
+
+    Use it from one event loop, e.g. as `async with AsyncFisher() as fisher: pvalue = await fisher.fisher_exact(...)`.
+    """
+
+    def __init__(self, max_batch_size: int = 4096, max_delay: float = 0.001, inline_total: int = INLINE_TOTAL,
+                 num_threads: int = 0, executor=None):
+        """
+        :param max_batch_size: maximal number of tables per batch
+        :param max_delay: maximal time in seconds that a table waits for others before its batch is sent
+        :param inline_total: tables with grand totals up to this are computed on the event loop (0: never)
+        :param num_threads: number of threads per batch (default: 0, i.e. one per CPU)
+        :param executor: concurrent.futures executor for the batches (default: a thread of its own)
+        """
+        if max_batch_size <= 0:
+            raise ValueError('max_batch_size must be positive')
+        if max_delay < 0:
+            raise ValueError('max_delay must not be negative')
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.inline_total = inline_total
+        self.num_threads = num_threads
+        self._own_executor = executor is None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='fast_fisher') if executor is None else executor
+        # tables waiting for the next batch, per alternative: lists of ((a, b, c, d), future)
+        self._pending = {}
+        self._timer = None
+        self._tasks = set()
+        self.batches = self.batched_tables = self.inline_tables = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def fisher_exact(self, a: int, b: int, c: int, d: int, alternative: str = 'two-sided') -> float:
+        """
+        Perform a Fisher exact test on a 2x2 contingency table, like fast_fisher_exact.
+
+        :param a: row 1 col 1
+        :param b: row 1 col 2
+        :param c: row 2 col 1
+        :param d: row 2 col 2
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+        :return: pvalue
+        """
+        if alternative is None:
+            alternative = 'two-sided'
+        if alternative not in _ALTERNATIVES:
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        total = a + b + c + d
+        if total <= self.inline_total or min(a, b, c, d) < 0 or total > MAX_TOTAL:
+            from . import fast_fisher_exact
+
+            self.inline_tables += 1
+            return fast_fisher_exact(a, b, c, d, alternative)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(alternative, [])
+        pending.append(((a, b, c, d), future))
+        if len(pending) >= self.max_batch_size:
+            self._send(alternative)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    async def fisher_exact_batch(self, a, b, c, d, alternative: str = 'two-sided', output: str = 'pvalue'):
+        """
+        Perform Fisher exact tests on 1-D arrays of contingency tables in the worker thread, see
+        fast_fisher_exact_batch. The arrays are computed as they are, without coalescing.
+
+        :return: array of results
+        """
+        from . import fast_fisher_exact_batch
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: fast_fisher_exact_batch(a, b, c, d, alternative, output=output,
+                                                            num_threads=self.num_threads))
+
+    def flush(self):
+        """
+        Send all waiting tables right away, without waiting for max_delay.
+        """
+        for alternative in list(self._pending):
+            self._send(alternative)
+
+    def _send(self, alternative: str):
+        requests = self._pending.pop(alternative, [])
+        if not self._pending and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if requests:
+            task = asyncio.ensure_future(self._run(alternative, requests))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _compute(self, alternative: str, tables):
+        from . import fast_fisher_exact_batch
+
+        a, b, c, d = (np.ascontiguousarray(x) for x in np.array(tables, dtype=np.int64).T)
+        return fast_fisher_exact_batch(a, b, c, d, alternative, num_threads=self.num_threads)
+
+    async def _run(self, alternative: str, requests):
+        tables, futures = zip(*requests)
+        self.batches += 1
+        self.batched_tables += len(tables)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self._compute, alternative,
+                                                                       tables)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results.tolist()):
+            # the caller may have been cancelled meanwhile
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """
+        Compute the waiting tables, wait for all batches, and shut down the worker thread if it is our own.
+        """
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
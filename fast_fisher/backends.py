@@ -0,0 +1,223 @@
+"""
+Registry of the implementations ("backends") behind the functions of the fast_fisher package.
+
+    cython    fast_fisher_cython, compiled C with parallel batch functions (default)
+    numba     fast_fisher_numba, compiled just in time on first use
+    compiled  fast_fisher_compiled, the numba backend compiled ahead of time (python -m fast_fisher.fast_fisher_numba)
+    python    fast_fisher_python, pure Python
+
+The backend is chosen with set_backend or the environment variable FAST_FISHER_BACKEND and imported only when it is
+first needed, so that importing fast_fisher stays cheap. By default ('auto'), the cython backend is used if it can be
+imported, and otherwise the python backend, with a warning. In strict mode (set_backend(..., strict=True) or
+FAST_FISHER_STRICT=1), an ImportError is raised instead.
+
+Backends that lack some of the functions (compiled) get the batch and array functions built from their scalar
+functions, and the table validation (SHARED) from the python backend. Any other missing function also comes from the
+python backend, with a warning. Optional features (SWITCHES) that a backend does not have cannot be enabled: enable_*
+raises NotImplementedError, and disable_* does nothing. Without instrumentation (only the cython backend has it),
+reset_stats does nothing either, and get_stats returns None.
+"""
+import os
+from math import nan
+from threading import RLock
+from types import SimpleNamespace
+from importlib import import_module
+
+BACKENDS = {
+    'cython': 'fast_fisher_cython',
+    'numba': 'fast_fisher_numba',
+    'compiled': 'fast_fisher_compiled',
+    'python': 'fast_fisher_python',
+}
+# tried in this order by 'auto'
+AUTO_ORDER = ('cython', 'python')
+ENV_BACKEND = 'FAST_FISHER_BACKEND'
+ENV_STRICT = 'FAST_FISHER_STRICT'
+
+# what the package needs from a backend, besides the scalar tests
+API = ('fisher_exact', 'odds_ratio', 'fisher_exact_array', 'odds_ratio_array', 'fisher_exact_batch', 'is_significant',
+       'is_significant_batch', 'table_status', 'STATUS_OK', 'STATUS_INVALID', 'STATUS_OVERFLOW')
+# the same in every backend, taken from the python backend without a warning
+SHARED = ('table_status', 'STATUS_OK', 'STATUS_INVALID', 'STATUS_OVERFLOW')
+# optional features: (enable, disable) functions
+SWITCHES = {
+    'log-factorial table': ('enable_lnfact_table', 'disable_lnfact_table'),
+    'term-ratio recurrence': ('enable_recurrence', 'disable_recurrence'),
+    'instrumentation': ('enable_stats', 'disable_stats'),
+}
+_SUFFIX = {'two-sided': 't', 'less': 'l', 'greater': 'r'}
+_PREFIX = {'pvalue': 'test1', 'mln': 'mlnTest1', 'mlog10': 'mlog10Test1'}
+
+_lock = RLock()
+_backend = None
+_backend_name = None
+
+
+def _is_true(value) -> bool:
+    return value is not None and value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _import(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f'unknown backend {name!r}, choose one of {", ".join(("auto",) + tuple(BACKENDS))}')
+    return _complete(import_module(f'.{BACKENDS[name]}', __package__))
+
+
+def _complete(module):
+    """
+    :return: module if it provides the whole API, else a namespace with the missing functions filled in
+    """
+    if all(hasattr(module, name) for name in API + sum(SWITCHES.values(), ())):
+        return module
+    from . import fast_fisher_python
+
+    backend = module.__name__.rsplit('.', 1)[-1].removeprefix('fast_fisher_')
+
+    def fisher_exact_array(a, b, c, d, alternative: str, out=None):
+        if alternative not in _SUFFIX:
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        return fast_fisher_python._apply_array(getattr(module, f'test1{_SUFFIX[alternative]}'), a, b, c, d, out)
+
+    def odds_ratio_array(a, b, c, d, out=None):
+        return fast_fisher_python._apply_array(module.odds_ratio, a, b, c, d, out)
+
+    def fisher_exact_batch(a, b, c, d, alternative: str = 'two-sided', out=None, output: str = 'pvalue',
+                           num_threads: int = 0, errors: str = 'raise', status=None):
+        if alternative not in _SUFFIX:
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        if output not in _PREFIX:
+            raise ValueError("`output` should be one of {'pvalue', 'mln', 'mlog10'}")
+        function = getattr(module, _PREFIX[output] + _SUFFIX[alternative])
+        return fast_fisher_python._apply_batch(function, a, b, c, d, out, float, nan, errors, status)
+
+    def is_significant_batch(a, b, c, d, alpha: float, alternative: str = 'two-sided', out=None, num_threads: int = 0,
+                             errors: str = 'raise', status=None):
+        if alternative not in _SUFFIX:
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        if not 0 < alpha <= 1:
+            raise ValueError('alpha must be in (0, 1]')
+
+        def function(a, b, c, d):
+            return module.is_significant(a, b, c, d, alpha, alternative)
+
+        return fast_fisher_python._apply_batch(function, a, b, c, d, out, bool, False, errors, status)
+
+    namespace = {name: getattr(fast_fisher_python, name) for name in API}
+    namespace.update(fisher_exact_array=fisher_exact_array, odds_ratio_array=odds_ratio_array,
+                     fisher_exact_batch=fisher_exact_batch)
+    if hasattr(module, 'is_significant'):
+        namespace.update(is_significant_batch=is_significant_batch)
+    for feature, (enable, disable) in SWITCHES.items():
+        if not hasattr(module, enable):
+            namespace[enable] = _unsupported(backend, feature)
+            namespace[disable] = _do_nothing
+    if not hasattr(module, 'get_stats'):
+        namespace.update(reset_stats=_do_nothing, get_stats=_no_stats)
+    namespace.update(vars(module))
+    fallbacks = [name for name in API if name not in SHARED and namespace[name] is getattr(fast_fisher_python, name)]
+    if fallbacks and module is not fast_fisher_python:
+        from logging import warning
+
+        warning(f'The {backend} backend has no {", ".join(fallbacks)}, using those of the python backend')
+    return SimpleNamespace(**namespace)
+
+
+def _unsupported(backend: str, feature: str):
+    def enable(*args, **kwargs):
+        raise NotImplementedError(f'the {backend} backend has no {feature}')
+
+    return enable
+
+
+def _do_nothing():
+    # e.g. disabling a feature that cannot have been enabled
+    pass
+
+
+def _no_stats():
+    # nothing is counted without instrumentation
+    return None
+
+
+def _load(name: str, strict: bool):
+    """
+    :return: (name, backend); 'auto' falls back along AUTO_ORDER unless strict
+    """
+    if name != 'auto':
+        return name, _import(name)
+    for i, candidate in enumerate(AUTO_ORDER):
+        try:
+            return candidate, _import(candidate)
+        except ImportError as e:
+            if strict or i == len(AUTO_ORDER) - 1:
+                raise
+            from logging import warning
+
+            warning(f'Failed to import {BACKENDS[candidate]}, falling back to {AUTO_ORDER[i + 1]}: {str(e)}')
+
+
+def set_backend(name: str = 'auto', strict: bool = None):
+    """
+    Select the backend of all functions of the package. It is imported right away, so that errors surface here.
+
+    :param name: {‘auto’, ‘cython’, ‘numba’, ‘compiled’, ‘python’} (default: 'auto')
+    :param strict: with 'auto', raise ImportError instead of falling back to a slower backend
+                   (default: None, i.e. the environment variable FAST_FISHER_STRICT)
+    :return: the backend module
+    """
+    global _backend, _backend_name
+    if strict is None:
+        strict = _is_true(os.environ.get(ENV_STRICT))
+    with _lock:
+        _backend_name, _backend = _load(name, strict)
+        return _backend
+
+
+def get_backend():
+    """
+    :return: the backend module, imported on first use as chosen by FAST_FISHER_BACKEND (default: 'auto')
+    """
+    backend = _backend
+    if backend is None:
+        with _lock:
+            if _backend is None:
+                set_backend(os.environ.get(ENV_BACKEND, 'auto').strip() or 'auto')
+            backend = _backend
+    return backend
+
+
+def backend_name() -> str:
+    """
+    :return: name of the backend in use, e.g. 'cython'; imports it if necessary
+    """
+    get_backend()
+    return _backend_name
+
+
+def warm_up():
+    """
+    Import the backend and compile its kernels, or load them from the cache, if it has any (numba). Worker processes
+    can call this at startup, so that their first batch is as fast as any other.
+
+    :return: the backend module
+    """
+    backend = get_backend()
+    if hasattr(backend, 'warm_up'):
+        backend.warm_up()
+    return backend
+
+
+def available_backends() -> list:
+    """
+    Try to import every backend. This may take a while, e.g. importing numba.
+
+    :return: names of the backends that can be imported
+    """
+    available = []
+    for name in BACKENDS:
+        try:
+            _import(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
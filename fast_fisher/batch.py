@@ -0,0 +1,129 @@
+import numpy as np
+
+from .fast_fisher_python import STATUS_OK, _raise_status
+from .symmetry import canonical_tables, SWAP_ALTERNATIVE
+
+# Canonical tables with all counts below 2 ** PACK_BITS are packed into a single int64 key for np.unique
+PACK_BITS = 15
+# The batch kernels take these count types without conversion
+COUNT_TYPES = (np.dtype(np.int32), np.dtype(np.int64))
+
+
+def unique_tables(a, b, c, d, alternative: str):
+    """
+    Find the unique contingency tables, taking into account that eight permutations of a table are equivalent.
+
+    For one-sided tests, canonical tables that swap the tails are kept apart from the others.
+
+    :return: (a, b, c, d, swapped, inverse): the unique canonical tables; whether the opposite tail has to be computed
+             for them; and for every input table, the index of its unique table
+    """
+    a, b, c, d, swapped = canonical_tables(a, b, c, d)
+    if alternative == 'two-sided':
+        swapped = np.zeros_like(swapped)
+
+    # the first count of a canonical table is the largest
+    if a.size and a.max() < 2 ** PACK_BITS and min(x.min() for x in (a, b, c, d)) >= 0:
+        keys = a
+        for x in (b, c, d):
+            keys = (keys << PACK_BITS) | x
+        keys, inverse = np.unique((keys << 1) | swapped, return_inverse=True)
+        swapped = (keys & 1).astype(bool)
+        keys >>= 1
+        mask = 2 ** PACK_BITS - 1
+        a, b, c, d = keys >> 3 * PACK_BITS, (keys >> 2 * PACK_BITS) & mask, (keys >> PACK_BITS) & mask, keys & mask
+    else:
+        rows, inverse = np.unique(np.column_stack([a, b, c, d, swapped]), axis=0, return_inverse=True)
+        a, b, c, d = (np.ascontiguousarray(rows[:, i]) for i in range(4))
+        swapped = rows[:, 4].astype(bool)
+    return a, b, c, d, swapped, inverse.reshape(-1)
+
+
+def deduplicated_batch(batch_function, a, b, c, d, alternative: str, out=None, **kwargs):
+    """
+    Evaluate batch_function only on the unique contingency tables (see unique_tables) and scatter the results back.
+
+    :param batch_function: e.g. fast_fisher_cython.fisher_exact_batch
+    :param kwargs: passed on to batch_function
+    :return: array of results, in the order of the input
+    """
+    if alternative not in SWAP_ALTERNATIVE:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    ua, ub, uc, ud, swapped, inverse = unique_tables(a, b, c, d, alternative)
+    results = np.empty(len(ua), dtype=np.float64)
+    for tail_swapped in (False, True):
+        todo = swapped == tail_swapped
+        if todo.any():
+            alt = SWAP_ALTERNATIVE[alternative] if tail_swapped else alternative
+            results[todo] = batch_function(ua[todo], ub[todo], uc[todo], ud[todo], alt, **kwargs)
+    if out is None:
+        return results[inverse]
+    np.take(results, inverse, out=out)
+    return out
+
+
+def as_counts(a, b, c, d):
+    """
+    :return: a, b, c, d as contiguous arrays of a common type the batch kernels accept; arrays that already are
+             int32 or int64 (e.g. memory maps) are returned as they are, anything else is converted to int64
+    """
+    a, b, c, d = (np.asarray(x) for x in (a, b, c, d))
+    dtype = a.dtype if all(x.dtype == a.dtype for x in (b, c, d)) and a.dtype in COUNT_TYPES else np.int64
+    return tuple(np.ascontiguousarray(x, dtype=dtype) for x in (a, b, c, d))
+
+
+def chunked_batch(batch_function, a, b, c, d, *args, out=None, out_dtype=np.float64, chunk_size: int = 2 ** 20,
+                  status=None, **kwargs):
+    """
+    Evaluate batch_function on consecutive chunks of the tables, writing straight into out.
+
+    Apart from out, the memory needed is bounded by the chunk size: inputs that are not int32 or int64 (see as_counts)
+    are converted one chunk at a time, and so are the per-table buffers of batch_function. With errors='raise', the
+    exception of the first invalid table is raised after all other chunks have been computed; invalid arguments raise
+    right away.
+
+    :param batch_function: e.g. fast_fisher_cython.fisher_exact_batch
+    :param a: row 1 col 1 (1-D array of integers, e.g. a memory map, or any object supporting the buffer protocol)
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param args: passed on to batch_function after a, b, c, d
+    :param out: optional contiguous output array, e.g. a memory map
+    :param out_dtype: type of the output array created if out is None
+    :param chunk_size: number of tables per call of batch_function
+    :param status: optional output array of int8 for the status of each table, passed on to batch_function in chunks
+    :param kwargs: passed on to batch_function
+    :return: out
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+    a, b, c, d = (np.asarray(x) for x in (a, b, c, d))
+    n = len(a)
+    if len(b) != n or len(c) != n or len(d) != n:
+        raise ValueError('a, b, c and d must have the same length')
+    if out is None:
+        out = np.empty(n, dtype=out_dtype)
+    elif len(out) != n:
+        raise ValueError('out must have the same length as the input')
+    if status is not None and len(status) != n:
+        raise ValueError('status must have the same length as the input')
+    # invalid tables are only reported after the last chunk, from their status
+    deferred = kwargs.get('errors') == 'raise'
+    if deferred:
+        kwargs['errors'] = 'nan'
+
+    first_error = STATUS_OK
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        chunk = as_counts(a[start:stop], b[start:stop], c[start:stop], d[start:stop])
+        if status is not None:
+            kwargs['status'] = status[start:stop]
+        elif deferred:
+            kwargs['status'] = np.empty(stop - start, dtype=np.int8)
+        batch_function(*chunk, *args, out=out[start:stop], **kwargs)
+        if deferred and first_error == STATUS_OK:
+            invalid = np.flatnonzero(kwargs['status'] != STATUS_OK)
+            if invalid.size:
+                first_error = kwargs['status'][invalid[0]]
+    _raise_status(first_error)
+    return out
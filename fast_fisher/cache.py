@@ -0,0 +1,142 @@
+from math import exp, log
+from threading import Lock
+from collections import OrderedDict, namedtuple
+
+from .symmetry import canonical_table, SWAP_ALTERNATIVE
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+ALTERNATIVES = ('less', 'greater', 'two-sided')
+LN10 = log(10)
+
+
+class FisherCache:
+    """
+    Memoize Fisher exact tests in a bounded LRU cache.
+
+    Tables are mapped to their canonical form first (see symmetry.canonical_table), so all eight equivalent tables
+    share the same entries. The cache is keyed on (canonical table, alternative) and stores -log(pvalue).
+    """
+
+    def __init__(self, backend, maxsize: int = 2 ** 16):
+        """
+        :param backend: fast_fisher_cython, fast_fisher_python or fast_fisher_numba
+        :param maxsize: maximal number of cached (table, alternative) entries
+        """
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self._mln = {'less': backend.mlnTest1l, 'greater': backend.mlnTest1r, 'two-sided': backend.mlnTest1t}
+        self._mln_all = backend.mlnTest1
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _lookup_all(self, keys):
+        """
+        Like _lookup, for several entries that are only useful together: one hit if all of them are cached, else one
+        miss and None.
+        """
+        with self._lock:
+            if not all(key in self._entries for key in keys):
+                self.misses += 1
+                return None
+            for key in keys:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return [self._entries[key] for key in keys]
+
+    def _store(self, key, value):
+        self._store_all([key], [value])
+
+    def _store_all(self, keys, values):
+        # at most maxsize of them, so that they do not evict each other
+        with self._lock:
+            for key, value in list(zip(keys, values))[-self.maxsize:]:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+    def mln(self, a: int, b: int, c: int, d: int, alternative: str) -> float:
+        """
+        :return: -log(pvalue) of the contingency table
+        """
+        if alternative not in self._mln:
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        table, swapped = canonical_table(a, b, c, d)
+        if swapped:
+            alternative = SWAP_ALTERNATIVE[alternative]
+        key = table + (alternative,)
+        value = self._lookup(key)
+        if value is None:
+            value = self._mln[alternative](*table)
+            self._store(key, value)
+        return value
+
+    def fisher_exact(self, a: int, b: int, c: int, d: int, alternative: str) -> float:
+        return exp(-self.mln(a, b, c, d, alternative))
+
+    def mlnTest1(self, a: int, b: int, c: int, d: int) -> (float, float, float):
+        table, swapped = canonical_table(a, b, c, d)
+        keys = [table + (alternative,) for alternative in ALTERNATIVES]
+        values = self._lookup_all(keys)
+        if values is None:
+            values = self._mln_all(*table)
+            self._store_all(keys, values)
+        l, r, t = values
+        return (r, l, t) if swapped else (l, r, t)
+
+    def mlnTest1l(self, a: int, b: int, c: int, d: int) -> float:
+        return self.mln(a, b, c, d, 'less')
+
+    def mlnTest1r(self, a: int, b: int, c: int, d: int) -> float:
+        return self.mln(a, b, c, d, 'greater')
+
+    def mlnTest1t(self, a: int, b: int, c: int, d: int) -> float:
+        return self.mln(a, b, c, d, 'two-sided')
+
+    def test1(self, a: int, b: int, c: int, d: int) -> (float, float, float):
+        l, r, t = self.mlnTest1(a, b, c, d)
+        return exp(-l), exp(-r), exp(-t)
+
+    def test1l(self, a: int, b: int, c: int, d: int) -> float:
+        return exp(-self.mln(a, b, c, d, 'less'))
+
+    def test1r(self, a: int, b: int, c: int, d: int) -> float:
+        return exp(-self.mln(a, b, c, d, 'greater'))
+
+    def test1t(self, a: int, b: int, c: int, d: int) -> float:
+        return exp(-self.mln(a, b, c, d, 'two-sided'))
+
+    def mlog10Test1(self, a: int, b: int, c: int, d: int) -> (float, float, float):
+        l, r, t = self.mlnTest1(a, b, c, d)
+        return l / LN10, r / LN10, t / LN10
+
+    def mlog10Test1l(self, a: int, b: int, c: int, d: int) -> float:
+        return self.mln(a, b, c, d, 'less') / LN10
+
+    def mlog10Test1r(self, a: int, b: int, c: int, d: int) -> float:
+        return self.mln(a, b, c, d, 'greater') / LN10
+
+    def mlog10Test1t(self, a: int, b: int, c: int, d: int) -> float:
+        return self.mln(a, b, c, d, 'two-sided') / LN10
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._entries))
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,39 @@
+# C-level API of fast_fisher_cython, for other Cython extensions:
+#
+#     from fast_fisher.fast_fisher_cython cimport mlnTest2t_nogil, FISHER_OK
+#
+# The kernels take a table as a, ab = a + b, ac = a + c, abcd = a + b + c + d and return -log(pvalue). They hold no GIL
+# and never raise, so they can be called from prange loops. Instead, they set *status to one of the codes below and
+# return NaN if status != FISHER_OK. They honor the switches of the Python module: the log-factorial table, the
+# term-ratio recurrence and the instrumentation counters.
+
+# ======================== Status Codes ========================
+cdef enum:
+    FISHER_OK = 0
+    FISHER_INVALID = 1  # negative counts
+    FISHER_OVERFLOW = 2  # grand total above 2 ** 53
+
+# ======================== Tails ========================
+# `tail` argument of is_significant_nogil
+cdef enum:
+    TAIL_LEFT = 0
+    TAIL_RIGHT = 1
+    TAIL_TWO = 2
+
+cdef int check_table(long long a, long long ab, long long ac, long long abcd) noexcept nogil
+# the same for a, b, c, d; check these before forming the margins, which could wrap around
+cdef int check_counts(long long a, long long b, long long c, long long d) noexcept nogil
+
+# left, right and two-tailed -log(pvalue) at once
+cdef (double, double, double) mlnTest2_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil
+cdef double mlnTest2l_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil
+cdef double mlnTest2r_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil
+cdef double mlnTest2t_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil
+
+# whether pvalue < alpha; takes a, b, c, d, returns 0 if status != FISHER_OK
+cdef int is_significant_nogil(
+        int tail, long long a, long long b, long long c, long long d, double alpha, int *status
+) noexcept nogil
+
+# NaN if a row or column is empty, INFINITY if b or c is 0
+cdef double odds_ratio_nogil(double a, double b, double c, double d) noexcept nogil
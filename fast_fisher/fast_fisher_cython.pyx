@@ -3,8 +3,14 @@
 # cython: wraparound=False
 # cython: infer_types=True
 
-from math import nan as pymath_nan, inf as pymath_inf
-from libc.math cimport log, exp, lgamma, INFINITY, llround
+import os
+import numpy as np
+
+cimport cython
+from cython.parallel cimport prange
+from libc.math cimport log, log1p, exp, fabs, lgamma, INFINITY, NAN, M_PI, llround
+from libc.float cimport DBL_MIN
+from libc.string cimport memset
 
 cdef inline _maxn():
     l, n, h = 1, 2, INFINITY
@@ -19,9 +25,408 @@ cdef inline _maxn():
 cdef double LN10 = log(10)
 cdef double NINF = INFINITY
 cdef  long long MAXN = _maxn()
+# Above LARGE_TOTAL, the log-factorials from lgamma lose more than ~1e-6 in their differences and the large-total mode
+# is used instead, see ln_dhyper. It works for all totals whose counts are exact as doubles, i.e. up to MAX_TOTAL.
+cdef long long LARGE_TOTAL = min(MAXN, 2 ** 24)
+cdef long long MAX_TOTAL = 2 ** 53
+# In two-sided tests, terms up to this much (relative) more likely than the observed table count as ties, like in scipy
+cdef double TIE_TOLERANCE = 1e-7
+cdef double TIE_FACTOR = exp(TIE_TOLERANCE)
+
+# ======================== Status Codes ========================
+# The *_nogil kernels never raise. They report problems through `status` and return NaN instead.
+# FISHER_OK, FISHER_INVALID and FISHER_OVERFLOW are declared in fast_fisher_cython.pxd, the C-level API.
+
+STATUS_OK = FISHER_OK
+STATUS_INVALID = FISHER_INVALID
+STATUS_OVERFLOW = FISHER_OVERFLOW
+
+cdef int check_table(long long a, long long ab, long long ac, long long abcd) noexcept nogil:
+    if 0 > a or a > ab or a > ac:
+        return FISHER_INVALID
+    # ab + ac cannot wrap around if no margin is above MAX_TOTAL
+    if ab > MAX_TOTAL or ac > MAX_TOTAL or abcd > MAX_TOTAL:
+        return FISHER_OVERFLOW
+    if ab + ac > abcd + a:
+        return FISHER_INVALID
+    return FISHER_OK
+
+cdef int check_counts(long long a, long long b, long long c, long long d) noexcept nogil:
+    # a, b, c, d must be checked before the margins are formed, which could wrap around
+    if 0 > a or 0 > b or 0 > c or 0 > d:
+        return FISHER_INVALID
+    # the sum cannot wrap around if no count is above MAX_TOTAL
+    if a > MAX_TOTAL or b > MAX_TOTAL or c > MAX_TOTAL or d > MAX_TOTAL or a + b + c + d > MAX_TOTAL:
+        return FISHER_OVERFLOW
+    return FISHER_OK
+
+cdef inline int raise_counts(long long a, long long b, long long c, long long d) except -1:
+    return raise_status(check_counts(a, b, c, d))
+
+cdef int raise_status(int status) except -1:
+    if status == FISHER_INVALID:
+        raise ValueError('invalid contingency table')
+    if status == FISHER_OVERFLOW:
+        raise OverflowError('the grand total of contingency table is too large')
+    return 0
+
+# ======================== Log-Factorial Table ========================
+# Optional, see enable_lnfact_table. LNGAMMA[x] == lgamma(x) for 0 <= x < LNGAMMA_SIZE, i.e. log((x-1)!).
+# Tables are only grown while holding the GIL. Replaced tables are kept alive until disable_lnfact_table(),
+# so that kernels running without the GIL in other threads never read freed memory.
+cdef double *LNGAMMA = NULL
+cdef long long LNGAMMA_SIZE = 0
+cdef long long LNGAMMA_LIMIT = 0
+_lngamma_tables = []
+
+cdef inline double lngamma(long long x) noexcept nogil:
+    # callers may pass anything, e.g. from unvalidated tables: never read outside the table
+    if 0 <= x < LNGAMMA_SIZE:
+        return LNGAMMA[x]
+    return lgamma(x)
+
+cdef inline int reserve_lngamma(long long abcd) except -1:
+    # a table with grand total abcd needs lgamma(x) for x <= abcd + 1
+    if LNGAMMA_SIZE < abcd + 2 <= LNGAMMA_LIMIT:
+        grow_lngamma(abcd + 2)
+    return 0
+
+cdef int grow_lngamma(long long size) except -1:
+    global LNGAMMA, LNGAMMA_SIZE
+    size = min(max(size, 2 * LNGAMMA_SIZE), LNGAMMA_LIMIT)
+    table = np.empty(size, dtype=np.float64)
+    cdef double[::1] values = table
+    cdef long long x
+    for x in range(LNGAMMA_SIZE):
+        values[x] = LNGAMMA[x]
+    for x in range(LNGAMMA_SIZE, size):
+        values[x] = lgamma(x)
+    _lngamma_tables.append(table)
+    LNGAMMA = &values[0]
+    LNGAMMA_SIZE = size
+    return 0
+
+def enable_lnfact_table(long long max_bytes=64 * 2 ** 20):
+    """
+    Read log-factorials from a shared, precomputed table instead of calling lgamma in every summation step.
+
+    The table grows on demand up to the largest grand total seen, but never beyond max_bytes.
+    Contingency tables with larger grand totals keep using lgamma. The results are identical either way.
+
+    :param max_bytes: memory budget of the table (default: 64 MiB, i.e. grand totals up to ~8.4 million)
+    """
+    global LNGAMMA_LIMIT
+    if max_bytes < 0:
+        raise ValueError('max_bytes must not be negative')
+    LNGAMMA_LIMIT = max_bytes // sizeof(double)
+    if LNGAMMA_SIZE > LNGAMMA_LIMIT:
+        disable_lnfact_table()
+        LNGAMMA_LIMIT = max_bytes // sizeof(double)
+
+def disable_lnfact_table():
+    """
+    Free the log-factorial table and go back to calling lgamma.
+
+    Must not be called while a batch is running in another thread.
+    """
+    global LNGAMMA, LNGAMMA_SIZE, LNGAMMA_LIMIT
+    LNGAMMA_LIMIT = 0
+    LNGAMMA_SIZE = 0
+    LNGAMMA = NULL
+    _lngamma_tables.clear()
+
+def lnfact_table_size():
+    """
+    :return: the largest grand total currently covered by the log-factorial table (-1 if there is no table)
+    """
+    return max(LNGAMMA_SIZE - 2, -1)
+
+# ======================== Large Totals ========================
+# Above LARGE_TOTAL, lgamma cannot resolve the differences between log-factorials well enough. Instead, the log-probabilities
+# are computed with Loader's saddle point expansion ("Fast and accurate computation of binomial probabilities", 2000),
+# which only involves the Stirling series error and the deviance term, and stays accurate for any total.
+cdef double LN_2PI = log(2 * M_PI)
+# The tail terms are derived from each other by the term-ratio recurrence and re-anchored every this many terms
+cdef long long LARGE_TOTAL_ANCHOR = 64
+
+cdef inline double stirlerr(double n) noexcept nogil:
+    # log(n!) - log(sqrt(2 pi n) (n / e) ** n)
+    cdef double nn
+    if n <= 15.:
+        return lgamma(n + 1.) - (n + 0.5) * log(n) + n - 0.5 * LN_2PI
+    nn = n * n
+    if n > 500.:
+        return (1. / 12 - 1. / 360 / nn) / n
+    if n > 80.:
+        return (1. / 12 - (1. / 360 - 1. / 1260 / nn) / nn) / n
+    if n > 35.:
+        return (1. / 12 - (1. / 360 - (1. / 1260 - 1. / 1680 / nn) / nn) / nn) / n
+    return (1. / 12 - (1. / 360 - (1. / 1260 - (1. / 1680 - 1. / 1188 / nn) / nn) / nn) / nn) / n
+
+cdef inline double bd0(double x, double m) noexcept nogil:
+    # the deviance term x log(x / m) + m - x, without cancellation for x close to m
+    cdef double v, s, s1, ej
+    cdef int j
+    if fabs(x - m) < 0.1 * (x + m):
+        v = (x - m) / (x + m)
+        s = (x - m) * v
+        if fabs(s) < DBL_MIN:
+            return s
+        ej = 2 * x * v
+        v = v * v
+        for j in range(1, 1000):
+            ej *= v
+            s1 = s + ej / (2 * j + 1)
+            if s1 == s:
+                return s1
+            s = s1
+    return x * log(x / m) + m - x
+
+cdef inline double ln_dbinom(double x, double n, double p, double q) noexcept nogil:
+    # log of the binomial probability of x in n trials
+    if x == 0:
+        if n == 0:
+            return 0.
+        return -bd0(n, n * q) - n * p if p < 0.1 else n * log(q)
+    if x == n:
+        return -bd0(n, n * p) - n * q if q < 0.1 else n * log(p)
+    return (stirlerr(n) - stirlerr(x) - stirlerr(n - x) - bd0(x, n * p) - bd0(n - x, n * q)
+            - 0.5 * (LN_2PI + log(x) + log1p(-x / n)))
+
+cdef inline double ln_dhyper(long long i, long long ab, long long ac, long long abcd) noexcept nogil:
+    # log of the probability of the table (i, ab - i, ac - i, abcd - ab - ac + i) with fixed margins
+    cdef double p = <double> ab / abcd
+    cdef double q = <double> (abcd - ab) / abcd
+    return (ln_dbinom(i, ac, p, q) + ln_dbinom(ab - i, abcd - ac, p, q) - ln_dbinom(ab, abcd, p, q))
+
+# ======================== Instrumentation ========================
+# Optional, see enable_stats. Each kernel call collects its counts in a KernelStats on its own stack and adds them to
+# the global STATS with atomic additions when it returns, so the counts stay exact in parallel batches.
+cdef extern from *:
+    """
+    #include <time.h>
+    #if defined(_MSC_VER)
+    #include <intrin.h>
+    #define FF_ATOMIC_ADD(p, v) _InterlockedExchangeAdd64((volatile long long *) (p), (v))
+    #else
+    #define FF_ATOMIC_ADD(p, v) __atomic_fetch_add((p), (v), __ATOMIC_RELAXED)
+    #endif
+    static long long ff_now_ns(void) {
+        struct timespec t;
+        timespec_get(&t, TIME_UTC);
+        return (long long) t.tv_sec * 1000000000LL + t.tv_nsec;
+    }
+    """
+    void atomic_add "FF_ATOMIC_ADD"(long long *p, long long v) nogil
+    long long now_ns "ff_now_ns"() nogil
+
+# all fields are long long, so that they can be added up as an array
+ctypedef struct KernelStats:
+    long long calls
+    long long invalid  # invalid tables or grand totals above MAX_TOTAL
+    long long degenerate  # tables with only one possible value of a
+    long long large_total  # tables computed in the large-total mode
+    long long evaluations  # log-probabilities computed (4 log-factorials each, or one saddle point in large-total mode)
+    long long terms  # terms added to the tail sums
+    long long skipped  # terms left out as more likely than the observed table, incl. those jumped over by bisection
+    long long converged  # tail sums stopped because the terms no longer changed the sum
+    long long exhausted  # tail sums that ran to the end of their range
+    long long nanoseconds  # wall time spent in the kernel
+
+cdef enum:
+    STATS_LEFT = 0
+    STATS_RIGHT = 1
+    STATS_TWO = 2
+    STATS_ALL = 3
+
+_STATS_KINDS = {'less': STATS_LEFT, 'greater': STATS_RIGHT, 'two-sided': STATS_TWO, 'all': STATS_ALL}
+_STATS_FIELDS = ('calls', 'invalid', 'degenerate', 'large_total', 'evaluations', 'terms', 'skipped', 'converged',
+                 'exhausted', 'nanoseconds')
+cdef bint STATS_ENABLED = False
+cdef KernelStats STATS[4]
+
+cdef inline KernelStats *start_stats(KernelStats *local) noexcept nogil:
+    # returns NULL if disabled, so that the kernels only count `if stats != NULL`
+    if not STATS_ENABLED:
+        return NULL
+    memset(local, 0, sizeof(KernelStats))
+    local.calls = 1
+    local.nanoseconds = -now_ns()
+    return local
+
+cdef inline void record_stats(int kind, KernelStats *local, int status) noexcept nogil:
+    if local == NULL:
+        return
+    local.nanoseconds += now_ns()
+    local.invalid = status != FISHER_OK
+    cdef long long *src = <long long *> local
+    cdef long long *dst = <long long *> &STATS[kind]
+    cdef size_t j
+    for j in range(sizeof(KernelStats) // sizeof(long long)):
+        atomic_add(&dst[j], src[j])
+
+cdef inline void count_setup(KernelStats *stats, long long abcd) noexcept nogil:
+    # p0 and pa; in the large-total mode, p0 is not needed
+    if stats != NULL:
+        stats.large_total += abcd > LARGE_TOTAL
+        stats.evaluations += 1 if abcd > LARGE_TOTAL else 2
+
+def enable_stats():
+    """
+    Count what the test kernels do, see get_stats. Costs a few percent while enabled.
+    """
+    global STATS_ENABLED
+    STATS_ENABLED = True
+
+def disable_stats():
+    """
+    Stop counting. The counts so far are kept until reset_stats().
+    """
+    global STATS_ENABLED
+    STATS_ENABLED = False
+
+def reset_stats():
+    """
+    Set all counts to zero. Must not be called while a batch is running in another thread.
+    """
+    memset(STATS, 0, sizeof(STATS))
+
+def get_stats():
+    """
+    :return: {alternative: {counter: count}} for 'less', 'greater', 'two-sided' and 'all' (mlnTest2 and friends).
+             The counters are calls, invalid, degenerate, large_total, evaluations, terms, skipped, converged,
+             exhausted and nanoseconds; see KernelStats in fast_fisher_cython.pyx.
+    """
+    cdef long long *values
+    stats = {}
+    for kind, index in _STATS_KINDS.items():
+        values = <long long *> &STATS[index]
+        stats[kind] = {field: values[j] for j, field in enumerate(_STATS_FIELDS)}
+    return stats
+
+# ======================== Tail Summation ========================
+# Summation mode, see enable_recurrence. 0: four lgamma calls per term. n > 0: each term is derived from the previous
+# one by the term-ratio recurrence and re-anchored with lgamma every n terms to bound the accumulated rounding error.
+cdef long long RECURRENCE_ANCHOR = 0
+
+cdef inline double lnhyper(long long i, long long ab, long long ac, long long abcd) noexcept nogil:
+    # p0 - lnhyper(i) is the log-probability of the table with a == i
+    if abcd > LARGE_TOTAL:
+        return -ln_dhyper(i, ab, ac, abcd)
+    return lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
+
+cdef inline double lnhyper0(long long ab, long long ac, long long abcd) noexcept nogil:
+    if abcd > LARGE_TOTAL:
+        return 0.
+    return lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+
+cdef inline long long first_tail_term(
+        long long i, long long stop, long long step, long long ab, long long ac, long long abcd, double pa,
+        long long *evaluations
+) noexcept nogil:
+    # Starting at the mode, the terms only get smaller. Find the first i with pi >= pa by bisection
+    # instead of evaluating every skipped term. Returns stop if there is none. Counts the lnhyper calls in evaluations.
+    cdef long long lo = 0
+    cdef long long hi = (stop - i) * step
+    cdef long long mid
+    while lo < hi:
+        mid = (lo + hi) // 2
+        evaluations[0] += 1
+        if lnhyper(i + mid * step, ab, ac, abcd) < pa - TIE_TOLERANCE:
+            lo = mid + 1
+        else:
+            hi = mid
+    return i + lo * step
+
+cdef inline double sum_tail(
+        double s, long long i, long long stop, long long step,
+        long long ab, long long ac, long long abcd, double pa, bint skip, KernelStats *stats
+) noexcept nogil:
+    # Add exp(pa - pi) to s for i, i + step, ... (stop excluded) until s stops changing.
+    # With skip, the terms that are more likely than the observed table (pi < pa) are left out. The first term
+    # that is not skipped is found by bisection; the skipped terms could also be too large for exp(pa - pi).
+    cdef double pi, s_new
+    cdef double t = 0.
+    cdef long long anchor = RECURRENCE_ANCHOR
+    cdef long long k = 0
+    cdef long long d0 = abcd - ab - ac
+    # counted locally and only reported to stats at the end, which costs next to nothing if stats is NULL
+    cdef long long evaluations = 0
+    cdef long long skipped = 0
+    cdef long long terms = 0
+    cdef bint converged = False
+    if anchor <= 0 and abcd > LARGE_TOTAL:
+        anchor = LARGE_TOTAL_ANCHOR
+    if skip:
+        skipped = i
+        i = first_tail_term(i, stop, step, ab, ac, abcd, pa, &evaluations)
+        skipped = (i - skipped) * step
+    if anchor <= 0:
+        while (stop - i) * step > 0:
+            pi = lnhyper(i, ab, ac, abcd)
+            evaluations += 1
+            i += step
+            if skip and pi < pa - TIE_TOLERANCE:
+                skipped += 1
+                continue
+            terms += 1
+            s_new = s + exp(pa - pi)
+            if s_new == s:
+                converged = True
+                break
+            s = s_new
+    else:
+        while (stop - i) * step > 0:
+            if k % anchor == 0:
+                t = exp(pa - lnhyper(i, ab, ac, abcd))
+                evaluations += 1
+            elif step > 0:
+                t *= <double> (ab - i + 1) * (ac - i + 1) / (<double> i * (d0 + i))
+            else:
+                t *= <double> (i + 1) * (d0 + i + 1) / (<double> (ab - i) * (ac - i))
+            i += step
+            k += 1
+            if skip and t > TIE_FACTOR:
+                skipped += 1
+                continue
+            terms += 1
+            s_new = s + t
+            if s_new == s:
+                converged = True
+                break
+            s = s_new
+    if stats != NULL:
+        stats.evaluations += evaluations
+        stats.skipped += skipped
+        stats.terms += terms
+        stats.converged += converged
+        stats.exhausted += not converged
+    return s
+
+def enable_recurrence(long long anchor=64):
+    """
+    Derive each term of the tail sums from the previous one with the term-ratio recurrence
+    (ab - i) (ac - i) / ((i + 1) (abcd - ab - ac + i + 1)) instead of calling lgamma four times.
+
+    The results differ from the default mode only by rounding errors (relative error ~ anchor * 1e-16).
+
+    :param anchor: recompute the term with lgamma every `anchor` steps to bound the drift (default: 64)
+    """
+    global RECURRENCE_ANCHOR
+    if anchor <= 0:
+        raise ValueError('anchor must be positive')
+    RECURRENCE_ANCHOR = anchor
+
+def disable_recurrence():
+    """
+    Go back to computing every term of the tail sums with lgamma.
+    """
+    global RECURRENCE_ANCHOR
+    RECURRENCE_ANCHOR = 0
 
 # ======================== Full Test ========================
 cpdef (double, double, double) test1(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     result = mlnTest2(a, a + b, a + c, a + b + c + d)
     return exp(-result[0]), exp(-result[1]), exp(-result[2])
 
@@ -29,214 +434,230 @@ cpdef (double, double, double) test2(long long a, long long ab, long long ac, lo
     result = mlnTest2(a, ab, ac, abcd)
     return exp(-result[0]), exp(-result[1]), exp(-result[2])
 
-cdef inline (double, double, double) mlnTest1(long long a, long long b, long long c, long long d) except *:
+cpdef inline (double, double, double) mlnTest1(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2(a, a + b, a + c, a + b + c + d)
 
-cdef inline (double, double, double) mlnTest2(long long a, long long ab, long long ac, long long abcd) except *:
-    if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
-        raise ValueError('invalid contingency table')
-    if abcd > MAXN:
-        raise OverflowError('the grand total of contingency table is too large')
+cpdef inline (double, double, double) mlnTest2(long long a, long long ab, long long ac, long long abcd) except *:
+    cdef int status = FISHER_OK
+    reserve_lngamma(abcd)
+    result = mlnTest2_nogil(a, ab, ac, abcd, &status)
+    if status != FISHER_OK:
+        raise_status(status)
+    return result
+
+cdef (double, double, double) mlnTest2_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil:
+    cdef KernelStats local
+    cdef KernelStats *stats = start_stats(&local)
+    result = mlnTest2_kernel(a, ab, ac, abcd, status, stats)
+    record_stats(STATS_ALL, stats, status[0])
+    return result
+
+cdef inline (double, double, double) mlnTest2_kernel(
+        long long a, long long ab, long long ac, long long abcd, int *status, KernelStats *stats
+) noexcept nogil:
+    status[0] = check_table(a, ab, ac, abcd)
+    if status[0] != FISHER_OK:
+        return NAN, NAN, NAN
     cdef long long a_min = max(0, ab + ac - abcd)
     cdef long long a_max = min(ab, ac)
     if a_min == a_max:
+        if stats != NULL:
+            stats.degenerate += 1
         return 0., 0., 0.
-    cdef double p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    cdef double pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
-    cdef double sl = 0.
-    cdef double sr = 0.
-    cdef double pi, sl_new, sr_new
-    if ab * ac < a * abcd:
-        for i in range(min(a - 1, llround(ab * ac / abcd)), a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            sl_new = sl + exp(pa - pi)
-            if sl_new == sl:
-                break
-            sl = sl_new
-        for i in range(a + 1, a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            sr_new = sr + exp(pa - pi)
-            if sr_new == sr:
-                break
-            sr = sr_new
+    count_setup(stats, abcd)
+    cdef double p0 = lnhyper0(ab, ac, abcd)
+    cdef double pa = lnhyper(a, ab, ac, abcd)
+    cdef double sl, sr
+    if <double> ab * ac < <double> a * abcd:
+        sl = sum_tail(0., min(a - 1, llround(<double> ab * ac / abcd)), a_min - 1, -1, ab, ac, abcd, pa, True, stats)
+        sr = sum_tail(0., a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, stats)
         return -log(1. - max(0, exp(p0 - pa) * sr)), max(0, pa - p0 - log(1. + sr)), max(0, pa - p0 - log(sl + 1. + sr))
     else:
-        for i in range(a - 1, a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            sl_new = sl + exp(pa - pi)
-            if sl_new == sl:
-                break
-            sl = sl_new
-        for i in range(max(a + 1, llround(ab * ac / abcd)), a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            sr_new = sr + exp(pa - pi)
-            if sr_new == sr:
-                break
-            sr = sr_new
+        sl = sum_tail(0., a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, stats)
+        sr = sum_tail(0., max(a + 1, llround(<double> ab * ac / abcd)), a_max + 1, 1, ab, ac, abcd, pa, True, stats)
         return max(0, pa - p0 - log(sl + 1.)), -log(1. - max(0, exp(p0 - pa) * sl)), max(0, pa - p0 - log(sl + 1. + sr))
 
-cdef inline (double, double, double) mlog10Test1(long long a, long long b, long long c, long long d) except *:
+cpdef inline (double, double, double) mlog10Test1(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     cdef double r1, r2, r3
     r1, r2, r3 = mlnTest2(a, a + b, a + c, a + b + c + d)
     return r1 / LN10, r2 / LN10, r3 / LN10
 
-cdef inline (double, double, double) mlog10Test2(long long a, long long ab, long long ac, long long abcd) except *:
+cpdef inline (double, double, double) mlog10Test2(long long a, long long ab, long long ac, long long abcd) except *:
     result = mlnTest2(a, ab, ac, abcd)
     return result[0] / LN10, result[1] / LN10, result[2] / LN10
 
 # ======================== Left Tail Only ========================
 cpdef double test1l(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return exp(-mlnTest2l(a, a + b, a + c, a + b + c + d))
 
 cpdef double test2l(long long a, long long ab, long long ac, long long abcd) except *:
     return exp(-mlnTest2l(a, ab, ac, abcd))
 
-cdef inline double mlnTest1l(long long a, long long b, long long c, long long d) except *:
+cpdef inline double mlnTest1l(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2l(a, a + b, a + c, a + b + c + d)
 
-cdef inline double mlnTest2l(long long a, long long ab, long long ac, long long abcd) except *:
-    if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
-        raise ValueError('invalid contingency table')
-    if abcd > MAXN:
-        raise OverflowError('the grand total of contingency table is too large')
+cpdef inline double mlnTest2l(long long a, long long ab, long long ac, long long abcd) except *:
+    cdef int status = FISHER_OK
+    reserve_lngamma(abcd)
+    result = mlnTest2l_nogil(a, ab, ac, abcd, &status)
+    if status != FISHER_OK:
+        raise_status(status)
+    return result
+
+cdef double mlnTest2l_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil:
+    cdef KernelStats local
+    cdef KernelStats *stats = start_stats(&local)
+    result = mlnTest2l_kernel(a, ab, ac, abcd, status, stats)
+    record_stats(STATS_LEFT, stats, status[0])
+    return result
+
+cdef inline double mlnTest2l_kernel(
+        long long a, long long ab, long long ac, long long abcd, int *status, KernelStats *stats
+) noexcept nogil:
+    status[0] = check_table(a, ab, ac, abcd)
+    if status[0] != FISHER_OK:
+        return NAN
     cdef long long a_min = max(0, ab + ac - abcd)
     cdef long long a_max = min(ab, ac)
     if a_min == a_max:
+        if stats != NULL:
+            stats.degenerate += 1
         return 0.
-    cdef double p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    cdef double pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
-    cdef double pi, sl_new, sr_new
-    cdef double sr = 0.
-    cdef double sl = 1.
-    if ab * ac < a * abcd:
-        for i in range(a + 1, a_max + 1):
-            sr_new = sr + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sr_new == sr:
-                break
-            sr = sr_new
+    count_setup(stats, abcd)
+    cdef double p0 = lnhyper0(ab, ac, abcd)
+    cdef double pa = lnhyper(a, ab, ac, abcd)
+    cdef double sl, sr
+    if <double> ab * ac < <double> a * abcd:
+        sr = sum_tail(0., a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, stats)
         return -log(1. - max(0, exp(p0 - pa) * sr))
     else:
-        for i in range(a - 1, a_min - 1, -1):
-            sl_new = sl + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sl_new == sl:
-                break
-            sl = sl_new
+        sl = sum_tail(1., a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, stats)
         return max(0, pa - p0 - log(sl))
 
-cdef inline double mlog10Test1l(long long a, long long b, long long c, long long d) except *:
+cpdef inline double mlog10Test1l(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2l(a, a + b, a + c, a + b + c + d) / LN10
 
-cdef inline double mlog10Test2l(long long a, long long ab, long long ac, long long abcd) except *:
+cpdef inline double mlog10Test2l(long long a, long long ab, long long ac, long long abcd) except *:
     return mlnTest2l(a, ab, ac, abcd) / LN10
 
 # ======================== Right Tail Only ========================
 cpdef double test1r(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return exp(-mlnTest2r(a, a + b, a + c, a + b + c + d))
 
 cpdef double test2r(long long a, long long ab, long long ac, long long abcd) except *:
     return exp(-mlnTest2r(a, ab, ac, abcd))
 
-cdef inline double mlnTest1r(long long a, long long b, long long c, long long d) except *:
+cpdef inline double mlnTest1r(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2r(a, a + b, a + c, a + b + c + d)
 
-cdef inline double mlnTest2r(long long a, long long ab, long long ac, long long abcd) except *:
-    if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
-        raise ValueError('invalid contingency table')
-    if abcd > MAXN:
-        raise OverflowError('the grand total of contingency table is too large')
+cpdef inline double mlnTest2r(long long a, long long ab, long long ac, long long abcd) except *:
+    cdef int status = FISHER_OK
+    reserve_lngamma(abcd)
+    result = mlnTest2r_nogil(a, ab, ac, abcd, &status)
+    if status != FISHER_OK:
+        raise_status(status)
+    return result
+
+cdef double mlnTest2r_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil:
+    cdef KernelStats local
+    cdef KernelStats *stats = start_stats(&local)
+    result = mlnTest2r_kernel(a, ab, ac, abcd, status, stats)
+    record_stats(STATS_RIGHT, stats, status[0])
+    return result
+
+cdef inline double mlnTest2r_kernel(
+        long long a, long long ab, long long ac, long long abcd, int *status, KernelStats *stats
+) noexcept nogil:
+    status[0] = check_table(a, ab, ac, abcd)
+    if status[0] != FISHER_OK:
+        return NAN
     cdef long long a_min = max(0, ab + ac - abcd)
     cdef long long a_max = min(ab, ac)
     if a_min == a_max:
+        if stats != NULL:
+            stats.degenerate += 1
         return 0.
-    cdef double p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    cdef double pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
-    cdef double sl_new, sr_new
-    cdef double sl = 0.
-    cdef double sr = 1.
-    if ab * ac > a * abcd:
-        for i in range(a - 1, a_min - 1, -1):
-            sl_new = sl + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sl_new == sl:
-                break
-            sl = sl_new
+    count_setup(stats, abcd)
+    cdef double p0 = lnhyper0(ab, ac, abcd)
+    cdef double pa = lnhyper(a, ab, ac, abcd)
+    cdef double sl, sr
+    if <double> ab * ac > <double> a * abcd:
+        sl = sum_tail(0., a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, stats)
         return -log(1. - max(0, exp(p0 - pa) * sl))
     else:
-        for i in range(a + 1, a_max + 1):
-            sr_new = sr + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sr_new == sr:
-                break
-            sr = sr_new
+        sr = sum_tail(1., a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, stats)
         return max(0, pa - p0 - log(sr))
 
-cdef inline double mlog10Test1r(long long a, long long b, long long c, long long d) except *:
+cpdef inline double mlog10Test1r(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2r(a, a + b, a + c, a + b + c + d) / LN10
 
-cdef inline double mlog10Test2r(long long a, long long ab, long long ac, long long abcd) except *:
+cpdef inline double mlog10Test2r(long long a, long long ab, long long ac, long long abcd) except *:
     return mlnTest2r(a, ab, ac, abcd) / LN10
 
 # ======================== Two Tails Only ========================
 cpdef double test1t(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return exp(-mlnTest2t(a, a + b, a + c, a + b + c + d))
 
 cpdef double test2t(long long a, long long ab, long long ac, long long abcd) except *:
     return exp(-mlnTest2t(a, ab, ac, abcd))
 
-cdef inline double mlnTest1t(long long a, long long b, long long c, long long d) except *:
+cpdef inline double mlnTest1t(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2t(a, a + b, a + c, a + b + c + d)
 
-cdef inline double mlnTest2t(long long a, long long ab, long long ac, long long abcd) except *:
-    if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
-        raise ValueError('invalid contingency table')
-    if abcd > MAXN:
-        raise OverflowError('the grand total of contingency table is too large')
+cpdef inline double mlnTest2t(long long a, long long ab, long long ac, long long abcd) except *:
+    cdef int status = FISHER_OK
+    reserve_lngamma(abcd)
+    result = mlnTest2t_nogil(a, ab, ac, abcd, &status)
+    if status != FISHER_OK:
+        raise_status(status)
+    return result
+
+cdef double mlnTest2t_nogil(long long a, long long ab, long long ac, long long abcd, int *status) noexcept nogil:
+    cdef KernelStats local
+    cdef KernelStats *stats = start_stats(&local)
+    result = mlnTest2t_kernel(a, ab, ac, abcd, status, stats)
+    record_stats(STATS_TWO, stats, status[0])
+    return result
+
+cdef inline double mlnTest2t_kernel(
+        long long a, long long ab, long long ac, long long abcd, int *status, KernelStats *stats
+) noexcept nogil:
+    status[0] = check_table(a, ab, ac, abcd)
+    if status[0] != FISHER_OK:
+        return NAN
     cdef long long a_min = max(0, ab + ac - abcd)
     cdef long long a_max = min(ab, ac)
     if a_min == a_max:
+        if stats != NULL:
+            stats.degenerate += 1
         return 0.
-    cdef double p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    cdef double pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
+    count_setup(stats, abcd)
+    cdef double p0 = lnhyper0(ab, ac, abcd)
+    cdef double pa = lnhyper(a, ab, ac, abcd)
     cdef double st = 1.
-    cdef double pi, st_new
-    if ab * ac < a * abcd:
-        for i in range(min(a - 1, llround(ab * ac / abcd)), a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
-        for i in range(a + 1, a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
+    if <double> ab * ac < <double> a * abcd:
+        st = sum_tail(st, min(a - 1, llround(<double> ab * ac / abcd)), a_min - 1, -1, ab, ac, abcd, pa, True, stats)
+        st = sum_tail(st, a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, stats)
     else:
-        for i in range(a - 1, a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
-        for i in range(max(a + 1, llround(ab * ac / abcd)), a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
+        st = sum_tail(st, a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, stats)
+        st = sum_tail(st, max(a + 1, llround(<double> ab * ac / abcd)), a_max + 1, 1, ab, ac, abcd, pa, True, stats)
     return max(0, pa - p0 - log(st))
 
 cpdef inline double mlog10Test1t(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
     return mlnTest2t(a, a + b, a + c, a + b + c + d) / LN10
 
-cdef inline double mlog10Test2t(long long a, long long ab, long long ac, long long abcd) except *:
+cpdef inline double mlog10Test2t(long long a, long long ab, long long ac, long long abcd) except *:
     return mlnTest2t(a, ab, ac, abcd) / LN10
 
 cpdef double fisher_exact(long long a, long long b, long long c, long long d, str alternative: str) except *:
@@ -269,10 +690,438 @@ cpdef double odds_ratio(double a, double b, double c, double d) except *:
     :param d: row 2 col 2
     :return: odds ratio (this is prior odds ratio and not a posterior estimate.)
     """
+    return odds_ratio_nogil(a, b, c, d)
+
+cdef double odds_ratio_nogil(double a, double b, double c, double d) noexcept nogil:
     if a + b == 0 or c + d == 0 or a + c == 0 or b + d == 0:
-        return pymath_nan
+        return NAN
 
     if not (b > 0 and c > 0):
-        return pymath_inf
+        return INFINITY
 
     return (a * d) / (c * b)
+
+# ======================== NumPy ufuncs ========================
+@cython.ufunc
+cdef double test1l_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return exp(-mlnTest2l(a, a + b, a + c, a + b + c + d))
+
+@cython.ufunc
+cdef double test1r_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return exp(-mlnTest2r(a, a + b, a + c, a + b + c + d))
+
+@cython.ufunc
+cdef double test1t_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return exp(-mlnTest2t(a, a + b, a + c, a + b + c + d))
+
+@cython.ufunc
+cdef double mlnTest1l_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return mlnTest2l(a, a + b, a + c, a + b + c + d)
+
+@cython.ufunc
+cdef double mlnTest1r_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return mlnTest2r(a, a + b, a + c, a + b + c + d)
+
+@cython.ufunc
+cdef double mlnTest1t_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return mlnTest2t(a, a + b, a + c, a + b + c + d)
+
+@cython.ufunc
+cdef double mlog10Test1l_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return mlnTest2l(a, a + b, a + c, a + b + c + d) / LN10
+
+@cython.ufunc
+cdef double mlog10Test1r_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return mlnTest2r(a, a + b, a + c, a + b + c + d) / LN10
+
+@cython.ufunc
+cdef double mlog10Test1t_ufunc(long long a, long long b, long long c, long long d) except *:
+    raise_counts(a, b, c, d)
+    return mlnTest2t(a, a + b, a + c, a + b + c + d) / LN10
+
+@cython.ufunc
+cdef double odds_ratio_ufunc(double a, double b, double c, double d) except *:
+    return odds_ratio(a, b, c, d)
+
+_FISHER_UFUNCS = {
+    'two-sided': test1t_ufunc,
+    'less': test1l_ufunc,
+    'greater': test1r_ufunc,
+}
+
+def fisher_exact_array(a, b, c, d, str alternative, out=None):
+    """
+    Perform Fisher exact tests on arrays of 2x2 contingency tables.
+
+    The inputs are broadcast against each other like in any NumPy ufunc.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’}
+    :param out: optional output array of float64
+    :return: array of pvalues
+    """
+    try:
+        ufunc = _FISHER_UFUNCS[alternative]
+    except KeyError:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    return ufunc(a, b, c, d, out=out)
+
+def odds_ratio_array(a, b, c, d, out=None):
+    """
+    Calculate odds ratios of arrays of contingency tables.
+
+    :param a: row 1 col 1 (array)
+    :param b: row 1 col 2 (array)
+    :param c: row 2 col 1 (array)
+    :param d: row 2 col 2 (array)
+    :param out: optional output array of float64
+    :return: array of odds ratios
+    """
+    return odds_ratio_ufunc(a, b, c, d, out=out)
+
+# ======================== Parallel Batch ========================
+# TAIL_LEFT, TAIL_RIGHT and TAIL_TWO are declared in fast_fisher_cython.pxd
+cdef enum:
+    OUTPUT_PVALUE = 0
+    OUTPUT_MLN = 1
+    OUTPUT_MLOG10 = 2
+
+# Batches take int32 or int64 counts as they are, so e.g. memory-mapped int32 columns are not copied
+ctypedef fused count_t:
+    int
+    long long
+
+_TAILS = {'less': TAIL_LEFT, 'greater': TAIL_RIGHT, 'two-sided': TAIL_TWO}
+_OUTPUTS = {'pvalue': OUTPUT_PVALUE, 'mln': OUTPUT_MLN, 'mlog10': OUTPUT_MLOG10}
+
+cdef inline double batch_kernel(int tail, int output, long long a, long long b, long long c, long long d, int *status) noexcept nogil:
+    cdef double mln
+    cdef KernelStats local
+    status[0] = check_counts(a, b, c, d)
+    if status[0] != FISHER_OK:
+        # counted as a call with an invalid table, like in the kernels
+        record_stats(STATS_LEFT if tail == TAIL_LEFT else STATS_RIGHT if tail == TAIL_RIGHT else STATS_TWO,
+                     start_stats(&local), status[0])
+        return NAN
+    if tail == TAIL_LEFT:
+        mln = mlnTest2l_nogil(a, a + b, a + c, a + b + c + d, status)
+    elif tail == TAIL_RIGHT:
+        mln = mlnTest2r_nogil(a, a + b, a + c, a + b + c + d, status)
+    else:
+        mln = mlnTest2t_nogil(a, a + b, a + c, a + b + c + d, status)
+    if output == OUTPUT_PVALUE:
+        return exp(-mln)
+    elif output == OUTPUT_MLOG10:
+        return mln / LN10
+    return mln
+
+_ERRORS = ('raise', 'nan')
+
+def _status_buffer(status, Py_ssize_t n):
+    if status is None:
+        return np.zeros(n, dtype=np.int8)
+    if status.shape[0] != n:
+        raise ValueError('status must have the same length as the input')
+    return status
+
+def table_status(
+        const count_t[::1] a, const count_t[::1] b, const count_t[::1] c, const count_t[::1] d,
+        signed char[::1] out=None, int num_threads=0
+):
+    """
+    Validate 1-D arrays of contingency tables in one parallel pass, with the same checks as the tests.
+
+    :param a: row 1 col 1 (contiguous int32 or int64 array)
+    :param b: row 1 col 2 (contiguous array of the same type)
+    :param c: row 2 col 1 (contiguous array of the same type)
+    :param d: row 2 col 2 (contiguous array of the same type)
+    :param out: optional output array of int8
+    :param num_threads: number of threads (default: 0, i.e. one per CPU)
+    :return: array of STATUS_OK, STATUS_INVALID (negative counts) or STATUS_OVERFLOW (grand total above 2 ** 53)
+    """
+    cdef Py_ssize_t n = a.shape[0]
+    if b.shape[0] != n or c.shape[0] != n or d.shape[0] != n:
+        raise ValueError('a, b, c and d must have the same length')
+    if out is None:
+        out = np.empty(n, dtype=np.int8)
+    elif out.shape[0] != n:
+        raise ValueError('out must have the same length as the input')
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+
+    cdef Py_ssize_t i
+    for i in prange(n, nogil=True, num_threads=num_threads, schedule='static'):
+        out[i] = check_counts(a[i], b[i], c[i], d[i])
+    return out.base
+
+def fisher_exact_batch(
+        const count_t[::1] a, const count_t[::1] b, const count_t[::1] c, const count_t[::1] d,
+        str alternative='two-sided', double[::1] out=None, str output='pvalue', int num_threads=0,
+        str errors='raise', signed char[::1] status=None
+):
+    """
+    Perform Fisher exact tests on 1-D arrays of contingency tables, spread over several threads.
+
+    The GIL is released for the whole batch. Invalid tables get NaN; with errors='raise', the exception of the first
+    one is raised after all other tables have been computed.
+
+    :param a: row 1 col 1 (contiguous int32 or int64 array)
+    :param b: row 1 col 2 (contiguous array of the same type)
+    :param c: row 2 col 1 (contiguous array of the same type)
+    :param d: row 2 col 2 (contiguous array of the same type)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional output array of float64
+    :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+    :param num_threads: number of threads (default: 0, i.e. one per CPU)
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table, or only set its result to NaN (default: 'raise')
+    :param status: optional output array of int8 for the status of each table, see table_status
+    :return: array of results
+    """
+    if alternative not in _TAILS:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if output not in _OUTPUTS:
+        raise ValueError("`output` should be one of {'pvalue', 'mln', 'mlog10'}")
+    if errors not in _ERRORS:
+        raise ValueError("`errors` should be one of {'raise', 'nan'}")
+    cdef Py_ssize_t n = a.shape[0]
+    if b.shape[0] != n or c.shape[0] != n or d.shape[0] != n:
+        raise ValueError('a, b, c and d must have the same length')
+    if out is None:
+        out = np.empty(n, dtype=np.float64)
+    elif out.shape[0] != n:
+        raise ValueError('out must have the same length as the input')
+    status = _status_buffer(status, n)
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+
+    cdef int tail = _TAILS[alternative]
+    cdef int out_kind = _OUTPUTS[output]
+    cdef int st
+    cdef Py_ssize_t i
+    cdef long long abcd_max = 0
+    if LNGAMMA_LIMIT > LNGAMMA_SIZE:
+        for i in range(n):
+            abcd_max = max(abcd_max, <long long> a[i] + b[i] + c[i] + d[i])
+        reserve_lngamma(abcd_max)
+    for i in prange(n, nogil=True, num_threads=num_threads, schedule='guided'):
+        st = FISHER_OK
+        out[i] = batch_kernel(tail, out_kind, a[i], b[i], c[i], d[i], &st)
+        status[i] = st
+
+    if errors == 'raise':
+        for i in range(n):
+            if status[i] != FISHER_OK:
+                raise_status(status[i])
+    return out.base
+
+# ======================== Threshold Decisions ========================
+cdef inline int bounded_sum(
+        double *s, long long i, long long stop, long long step,
+        long long ab, long long ac, long long abcd, double pa, double limit, double rest
+) noexcept nogil:
+    # Add exp(pa - pi) to s for i, i + step, ... (stop excluded) like sum_tail, but stop as soon as the sum is known to
+    # end up above limit (returns 1), or below it even if up to `rest` is added elsewhere (returns 0). As the
+    # distribution is log-concave, the ratio r of consecutive terms only decreases away from i, so the remaining terms
+    # add up to at most t r / (1 - r). Returns -1 if the tail was summed up without a decision.
+    cdef double t = 0.
+    cdef double r, s_new
+    cdef long long anchor = RECURRENCE_ANCHOR
+    cdef long long k = 0
+    cdef long long d0 = abcd - ab - ac
+    if anchor <= 0 and abcd > LARGE_TOTAL:
+        anchor = LARGE_TOTAL_ANCHOR
+    while (stop - i) * step > 0:
+        if anchor <= 0 or k % anchor == 0:
+            t = exp(pa - lnhyper(i, ab, ac, abcd))
+        if step > 0:
+            r = <double> (ab - i) * (ac - i) / (<double> (i + 1) * (d0 + i + 1))
+        else:
+            r = <double> i * (d0 + i) / (<double> (ab - i + 1) * (ac - i + 1))
+        i += step
+        k += 1
+        s_new = s[0] + t
+        if s_new > limit:
+            s[0] = s_new
+            return 1
+        if r < 1. and s_new + t * r / (1. - r) + rest < limit:
+            s[0] = s_new
+            return 0
+        if s_new == s[0]:
+            break
+        s[0] = s_new
+        t *= r
+    return -1
+
+cdef int is_significant_left(long long a, long long ab, long long ac, long long abcd, double alpha) noexcept nogil:
+    # The table must be valid.
+    cdef long long a_min = max(0, ab + ac - abcd)
+    cdef long long a_max = min(ab, ac)
+    if a_min == a_max:
+        return 0
+    cdef double p0 = lnhyper0(ab, ac, abcd)
+    cdef double pa = lnhyper(a, ab, ac, abcd)
+    # the p-value is at least the probability of the table itself
+    if p0 - pa >= log(alpha):
+        return 0
+    cdef double s
+    cdef int decision
+    if <double> ab * ac < <double> a * abcd:
+        # pvalue = 1 - exp(p0 - pa) * sr, significant if sr > (1 - alpha) exp(pa - p0)
+        s = 0.
+        decision = bounded_sum(&s, a + 1, a_max + 1, 1, ab, ac, abcd, pa, (1. - alpha) * exp(pa - p0), 0.)
+        return s > (1. - alpha) * exp(pa - p0) if decision < 0 else decision
+    # pvalue = exp(p0 - pa) * sl, significant if sl < alpha exp(pa - p0)
+    s = 1.
+    decision = bounded_sum(&s, a - 1, a_min - 1, -1, ab, ac, abcd, pa, alpha * exp(pa - p0), 0.)
+    return s < alpha * exp(pa - p0) if decision < 0 else 1 - decision
+
+cdef int is_significant_two(long long a, long long ab, long long ac, long long abcd, double alpha) noexcept nogil:
+    # The table must be valid.
+    cdef long long a_min = max(0, ab + ac - abcd)
+    cdef long long a_max = min(ab, ac)
+    if a_min == a_max:
+        return 0
+    cdef double p0 = lnhyper0(ab, ac, abcd)
+    cdef double pa = lnhyper(a, ab, ac, abcd)
+    if p0 - pa >= log(alpha):
+        return 0
+    # pvalue = exp(p0 - pa) * st, significant if st < alpha exp(pa - p0)
+    cdef double limit = alpha * exp(pa - p0)
+    cdef double st = 1.
+    cdef long long step, stop, stop_other
+    cdef long long j
+    cdef long long evaluations = 0  # threshold decisions are not instrumented
+    if <double> ab * ac < <double> a * abcd:
+        step, stop, stop_other = 1, a_max + 1, a_min - 1
+        j = first_tail_term(min(a - 1, llround(<double> ab * ac / abcd)), stop_other, -1, ab, ac, abcd, pa, &evaluations)
+    else:
+        step, stop, stop_other = -1, a_min - 1, a_max + 1
+        j = first_tail_term(max(a + 1, llround(<double> ab * ac / abcd)), stop_other, 1, ab, ac, abcd, pa, &evaluations)
+    # bound the opposite tail by the geometric series from its first term
+    cdef double rest = 0.
+    cdef double t, r
+    cdef long long d0 = abcd - ab - ac
+    if j != stop_other:
+        t = exp(pa - lnhyper(j, ab, ac, abcd))
+        if step < 0:
+            r = <double> (ab - j) * (ac - j) / (<double> (j + 1) * (d0 + j + 1))
+        else:
+            r = <double> j * (d0 + j) / (<double> (ab - j + 1) * (ac - j + 1))
+        rest = t / (1. - r) if r < 1. else INFINITY
+    cdef int decision = bounded_sum(&st, a + step, stop, step, ab, ac, abcd, pa, limit, rest)
+    if decision >= 0:
+        return 1 - decision
+    decision = bounded_sum(&st, j, stop_other, -step, ab, ac, abcd, pa, limit, 0.)
+    return st < limit if decision < 0 else 1 - decision
+
+cdef int is_significant_nogil(
+        int tail, long long a, long long b, long long c, long long d, double alpha, int *status
+) noexcept nogil:
+    status[0] = check_counts(a, b, c, d)
+    if status[0] != FISHER_OK:
+        return 0
+    if tail == TAIL_LEFT:
+        return is_significant_left(a, a + b, a + c, a + b + c + d, alpha)
+    elif tail == TAIL_RIGHT:
+        # the right tail of a table is the left tail of the table with swapped columns
+        return is_significant_left(b, a + b, b + d, a + b + c + d, alpha)
+    return is_significant_two(a, a + b, a + c, a + b + c + d, alpha)
+
+cpdef bint is_significant(
+        long long a, long long b, long long c, long long d, double alpha, str alternative='two-sided'
+) except *:
+    """
+    Decide whether the pvalue of a Fisher exact test is below alpha, without computing it exactly.
+
+    The tails are only summed until the partial sum, together with a bound on the remaining terms, proves the
+    pvalue to be above or below alpha. Decisions within rounding errors of alpha may differ from `pvalue < alpha`.
+
+    :param a: row 1 col 1
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :return: whether pvalue < alpha
+    """
+    if alternative not in _TAILS:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    cdef int status = FISHER_OK
+    reserve_lngamma(a + b + c + d)
+    result = is_significant_nogil(_TAILS[alternative], a, b, c, d, alpha, &status)
+    if status != FISHER_OK:
+        raise_status(status)
+    return result
+
+def is_significant_batch(
+        const count_t[::1] a, const count_t[::1] b, const count_t[::1] c, const count_t[::1] d,
+        double alpha, str alternative='two-sided', out=None, int num_threads=0,
+        str errors='raise', signed char[::1] status=None
+):
+    """
+    Perform is_significant on 1-D arrays of contingency tables, spread over several threads.
+
+    Like fisher_exact_batch, the GIL is released. Invalid tables are not significant; with errors='raise', the
+    exception of the first one is raised after all other tables have been decided.
+
+    :param a: row 1 col 1 (contiguous int32 or int64 array)
+    :param b: row 1 col 2 (contiguous array of the same type)
+    :param c: row 2 col 1 (contiguous array of the same type)
+    :param d: row 2 col 2 (contiguous array of the same type)
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional output array of bool
+    :param num_threads: number of threads (default: 0, i.e. one per CPU)
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table, or only set its result to False (default: 'raise')
+    :param status: optional output array of int8 for the status of each table, see table_status
+    :return: boolean array, whether pvalue < alpha
+    """
+    if alternative not in _TAILS:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    if errors not in _ERRORS:
+        raise ValueError("`errors` should be one of {'raise', 'nan'}")
+    cdef Py_ssize_t n = a.shape[0]
+    if b.shape[0] != n or c.shape[0] != n or d.shape[0] != n:
+        raise ValueError('a, b, c and d must have the same length')
+    if out is None:
+        out = np.empty(n, dtype=bool)
+    elif out.shape != (n,) or out.dtype != np.bool_:
+        raise ValueError('out must be a boolean array with the same length as the input')
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+
+    cdef int tail = _TAILS[alternative]
+    status = _status_buffer(status, n)
+    cdef unsigned char[::1] result = out.view(np.uint8)
+    cdef int st
+    cdef Py_ssize_t i
+    cdef long long abcd_max = 0
+    if LNGAMMA_LIMIT > LNGAMMA_SIZE:
+        for i in range(n):
+            abcd_max = max(abcd_max, <long long> a[i] + b[i] + c[i] + d[i])
+        reserve_lngamma(abcd_max)
+    for i in prange(n, nogil=True, num_threads=num_threads, schedule='guided'):
+        st = FISHER_OK
+        result[i] = is_significant_nogil(tail, a[i], b[i], c[i], d[i], alpha, &st)
+        status[i] = st
+
+    if errors == 'raise':
+        for i in range(n):
+            if status[i] != FISHER_OK:
+                raise_status(status[i])
+    return out
@@ -1,5 +1,7 @@
-from math import log, exp, lgamma, nan, inf
-from numba import jit_module
+from math import log, log1p, exp, lgamma, pi, nan, inf
+
+import numpy as np
+from numba import jit_module, njit, prange, config, get_num_threads, set_num_threads
 from numba.pycc import CC
 
 cc = CC('fast_fisher_compiled')
@@ -19,6 +21,208 @@ def _maxn():
 LN10 = log(10)
 NINF = float('-inf')
 MAXN = _maxn()
+# Above LARGE_TOTAL, the log-factorials from lgamma lose more than ~1e-6 in their differences and the large-total mode
+# is used instead, see ln_dhyper. It works for all totals whose counts are exact as doubles, i.e. up to MAX_TOTAL.
+LARGE_TOTAL = min(MAXN, 2 ** 24)
+MAX_TOTAL = 2 ** 53
+# In two-sided tests, terms up to this much (relative) more likely than the observed table count as ties, like in scipy
+TIE_TOLERANCE = 1e-7
+TIE_FACTOR = exp(TIE_TOLERANCE)
+
+# Per-table status codes of the batch functions, same as in fast_fisher_cython
+STATUS_OK = 0
+STATUS_INVALID = 1
+STATUS_OVERFLOW = 2
+
+# Tails of is_significant_table and the batch kernels, numbered as in fast_fisher_cython.pxd
+TAIL_LEFT, TAIL_RIGHT, TAIL_TWO = 0, 1, 2
+
+
+# ======================== Log-Factorial Table ========================
+# Optional, see enable_lnfact_table. Numba freezes global arrays at compile time, so the table is passed explicitly
+# to the *_table kernels. Those also take the summation mode `anchor`, see sum_tail.
+# lngammas[x] == lgamma(x) for x < len(lngammas), i.e. log((x-1)!).
+
+NO_TABLE = np.zeros(0)
+
+
+def grow_lnfact_table(lngammas, size):
+    """
+    :return: a copy of lngammas extended to size entries
+    """
+    grown = np.empty(size)
+    grown[:lngammas.shape[0]] = lngammas
+    for x in range(lngammas.shape[0], size):
+        grown[x] = lgamma(x) if x else inf
+    return grown
+
+
+def lngamma(x, lngammas):
+    # negative indices would count from the end of the table
+    if 0 <= x < lngammas.shape[0]:
+        return lngammas[x]
+    return lgamma(x)
+
+
+# ======================== Large Totals ========================
+# Above LARGE_TOTAL, lgamma cannot resolve the differences between log-factorials well enough. Instead, the log-probabilities
+# are computed with Loader's saddle point expansion ("Fast and accurate computation of binomial probabilities", 2000),
+# which only involves the Stirling series error and the deviance term, and stays accurate for any total.
+
+LN_2PI = log(2 * pi)
+DBL_MIN = 2.2250738585072014e-308
+# The tail terms are derived from each other by the term-ratio recurrence and re-anchored every this many terms
+LARGE_TOTAL_ANCHOR = 64
+
+
+def stirlerr(n):
+    """
+    log(n!) - log(sqrt(2 pi n) (n / e) ** n)
+    """
+    if n <= 15.:
+        return lgamma(n + 1.) - (n + 0.5) * log(n) + n - 0.5 * LN_2PI
+    nn = n * n
+    if n > 500.:
+        return (1. / 12 - 1. / 360 / nn) / n
+    if n > 80.:
+        return (1. / 12 - (1. / 360 - 1. / 1260 / nn) / nn) / n
+    if n > 35.:
+        return (1. / 12 - (1. / 360 - (1. / 1260 - 1. / 1680 / nn) / nn) / nn) / n
+    return (1. / 12 - (1. / 360 - (1. / 1260 - (1. / 1680 - 1. / 1188 / nn) / nn) / nn) / nn) / n
+
+
+def bd0(x, m):
+    """
+    The deviance term x log(x / m) + m - x, without cancellation for x close to m
+    """
+    if abs(x - m) < 0.1 * (x + m):
+        v = (x - m) / (x + m)
+        s = (x - m) * v
+        if abs(s) < DBL_MIN:
+            return s
+        ej = 2 * x * v
+        v = v * v
+        for j in range(1, 1000):
+            ej *= v
+            s1 = s + ej / (2 * j + 1)
+            if s1 == s:
+                return s1
+            s = s1
+    return x * log(x / m) + m - x
+
+
+def ln_dbinom(x, n, p, q):
+    """
+    log of the binomial probability of x in n trials
+    """
+    if x == 0:
+        if n == 0:
+            return 0.
+        return -bd0(n, n * q) - n * p if p < 0.1 else n * log(q)
+    if x == n:
+        return -bd0(n, n * p) - n * q if q < 0.1 else n * log(p)
+    return (stirlerr(n) - stirlerr(x) - stirlerr(n - x) - bd0(x, n * p) - bd0(n - x, n * q)
+            - 0.5 * (LN_2PI + log(x) + log1p(-x / n)))
+
+
+def ln_dhyper(i, ab, ac, abcd):
+    """
+    log of the probability of the table (i, ab - i, ac - i, abcd - ab - ac + i) with fixed margins
+    """
+    p = float(ab) / abcd
+    q = float(abcd - ab) / abcd
+    return (ln_dbinom(float(i), float(ac), p, q) + ln_dbinom(float(ab - i), float(abcd - ac), p, q)
+            - ln_dbinom(float(ab), float(abcd), p, q))
+
+
+# ======================== Tail Summation ========================
+# anchor == 0: four lgamma calls per term. anchor > 0: each term is derived from the previous one by the term-ratio
+# recurrence and re-anchored with lgamma every `anchor` terms to bound the accumulated rounding error.
+
+def lnhyper(i, ab, ac, abcd, lngammas):
+    """
+    p0 - lnhyper(i) is the log-probability of the table with a == i
+    """
+    if abcd > LARGE_TOTAL:
+        return -ln_dhyper(i, ab, ac, abcd)
+    return lngamma(i + 1, lngammas) + lngamma(ab - i + 1, lngammas) + lngamma(ac - i + 1, lngammas) + lngamma(abcd - ab - ac + i + 1, lngammas)
+
+
+def lnhyper0(ab, ac, abcd, lngammas):
+    if abcd > LARGE_TOTAL:
+        return 0.
+    return lngamma(ab + 1, lngammas) + lngamma(ac + 1, lngammas) + lngamma(abcd - ac + 1, lngammas) + lngamma(abcd - ab + 1, lngammas) - lngamma(abcd + 1, lngammas)
+
+
+def first_tail_term(i, stop, step, ab, ac, abcd, pa, lngammas):
+    """
+    Starting at the mode, the terms only get smaller. Find the first i with pi >= pa by bisection
+    instead of evaluating every skipped term. Returns stop if there is none.
+    """
+    lo = 0
+    hi = (stop - i) * step
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if lnhyper(i + mid * step, ab, ac, abcd, lngammas) < pa - TIE_TOLERANCE:
+            lo = mid + 1
+        else:
+            hi = mid
+    return i + lo * step
+
+
+def sum_tail(s, i, stop, step, ab, ac, abcd, pa, skip, lngammas, anchor):
+    """
+    Add exp(pa - pi) to s for i, i + step, ... (stop excluded) until s stops changing.
+
+    With skip, the terms that are more likely than the observed table (pi < pa) are left out. The first term
+    that is not skipped is found by bisection; the skipped terms could also be too large for exp(pa - pi).
+    """
+    if anchor <= 0 and abcd > LARGE_TOTAL:
+        anchor = LARGE_TOTAL_ANCHOR
+    if skip:
+        i = first_tail_term(i, stop, step, ab, ac, abcd, pa, lngammas)
+    if anchor <= 0:
+        while (stop - i) * step > 0:
+            pi = lnhyper(i, ab, ac, abcd, lngammas)
+            i += step
+            if skip and pi < pa - TIE_TOLERANCE:
+                continue
+            s_new = s + exp(pa - pi)
+            if s_new == s:
+                break
+            s = s_new
+        return s
+    d0 = abcd - ab - ac
+    t = 0.
+    k = 0
+    while (stop - i) * step > 0:
+        if k % anchor == 0:
+            t = exp(pa - lnhyper(i, ab, ac, abcd, lngammas))
+        elif step > 0:
+            t *= float(ab - i + 1) * (ac - i + 1) / (float(i) * (d0 + i))
+        else:
+            t *= float(i + 1) * (d0 + i + 1) / (float(ab - i) * (ac - i))
+        i += step
+        k += 1
+        if skip and t > TIE_FACTOR:
+            continue
+        s_new = s + t
+        if s_new == s:
+            break
+        s = s_new
+    return s
+
+
+def check_table(a, b, c, d):
+    """
+    :return: STATUS_OK, STATUS_INVALID (negative counts) or STATUS_OVERFLOW (grand total above MAX_TOTAL)
+    """
+    if a < 0 or b < 0 or c < 0 or d < 0:
+        return STATUS_INVALID
+    # the sum cannot wrap around if no count is above MAX_TOTAL
+    if a > MAX_TOTAL or b > MAX_TOTAL or c > MAX_TOTAL or d > MAX_TOTAL or a + b + c + d > MAX_TOTAL:
+        return STATUS_OVERFLOW
+    return STATUS_OK
 
 
 # ======================== Full Test ========================
@@ -26,262 +230,209 @@ MAXN = _maxn()
 
 @cc.export('test1', '(i8, i8, i8, i8)')
 def test1(a, b, c, d):
-    result = mlnTest2(a, a + b, a + c, a + b + c + d)
+    result = mlnTest2_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0)
     return exp(-result[0]), exp(-result[1]), exp(-result[2])
 
 
 @cc.export('test2', '(i8, i8, i8, i8)')
 def test2(a, ab, ac, abcd):
-    result = mlnTest2(a, ab, ac, abcd)
+    result = mlnTest2_table(a, ab, ac, abcd, NO_TABLE, 0)
     return exp(-result[0]), exp(-result[1]), exp(-result[2])
 
 
 @cc.export('mlnTest1', '(i8, i8, i8, i8)')
 def mlnTest1(a, b, c, d):
-    return mlnTest2(a, a + b, a + c, a + b + c + d)
+    return mlnTest2_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0)
 
 
 @cc.export('mlnTest2', '(i8, i8, i8, i8)')
 def mlnTest2(a, ab, ac, abcd):
+    return mlnTest2_table(a, ab, ac, abcd, NO_TABLE, 0)
+
+
+def mlnTest2_table(a, ab, ac, abcd, lngammas, anchor):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
         raise ValueError('invalid contingency table')
-    if abcd > MAXN:
+    if abcd > MAX_TOTAL:
         raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max:
         return 0., 0., 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
-    sl = sr = 0.
-    if ab * ac < a * abcd:
-        for i in range(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            sl_new = sl + exp(pa - pi)
-            if sl_new == sl:
-                break
-            sl = sl_new
-        for i in range(a + 1, a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            sr_new = sr + exp(pa - pi)
-            if sr_new == sr:
-                break
-            sr = sr_new
+    p0 = lnhyper0(ab, ac, abcd, lngammas)
+    pa = lnhyper(a, ab, ac, abcd, lngammas)
+    if float(ab) * ac < float(a) * abcd:
+        sl = sum_tail(0., min(a - 1, int(round(float(ab) * ac / abcd))), a_min - 1, -1, ab, ac, abcd, pa, True, lngammas, anchor)
+        sr = sum_tail(0., a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, lngammas, anchor)
         return -log(1. - max(0, exp(p0 - pa) * sr)), max(0, pa - p0 - log(1. + sr)), max(0, pa - p0 - log(sl + 1. + sr))
     else:
-        for i in range(a - 1, a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            sl_new = sl + exp(pa - pi)
-            if sl_new == sl:
-                break
-            sl = sl_new
-        for i in range(max(a + 1, int(round(ab * ac / abcd))), a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            sr_new = sr + exp(pa - pi)
-            if sr_new == sr:
-                break
-            sr = sr_new
+        sl = sum_tail(0., a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, lngammas, anchor)
+        sr = sum_tail(0., max(a + 1, int(round(float(ab) * ac / abcd))), a_max + 1, 1, ab, ac, abcd, pa, True, lngammas, anchor)
         return max(0, pa - p0 - log(sl + 1.)), -log(1. - max(0, exp(p0 - pa) * sl)), max(0, pa - p0 - log(sl + 1. + sr))
 
 
 @cc.export('mlog10Test1', '(i8, i8, i8, i8)')
 def mlog10Test1(a, b, c, d):
-    result = mlnTest2(a, a + b, a + c, a + b + c + d)
+    result = mlnTest2_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0)
     return result[0] / LN10, result[1] / LN10, result[2] / LN10
 
 
 @cc.export('mlog10Test2', '(i8, i8, i8, i8)')
 def mlog10Test2(a, ab, ac, abcd):
-    result = mlnTest2(a, ab, ac, abcd)
+    result = mlnTest2_table(a, ab, ac, abcd, NO_TABLE, 0)
     return result[0] / LN10, result[1] / LN10, result[2] / LN10
 
 
 # ======================== Left Tail Only ========================
 @cc.export('test1l', 'f8(i8, i8, i8, i8)')
 def test1l(a, b, c, d):
-    return exp(-mlnTest2l(a, a + b, a + c, a + b + c + d))
+    return exp(-mlnTest2l_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0))
 
 
 @cc.export('test2l', 'f8(i8, i8, i8, i8)')
 def test2l(a, ab, ac, abcd):
-    return exp(-mlnTest2l(a, ab, ac, abcd))
+    return exp(-mlnTest2l_table(a, ab, ac, abcd, NO_TABLE, 0))
 
 
 @cc.export('mlnTest1l', '(i8, i8, i8, i8)')
 def mlnTest1l(a, b, c, d):
-    return mlnTest2l(a, a + b, a + c, a + b + c + d)
+    return mlnTest2l_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0)
 
 
 @cc.export('mlnTest2l', 'f8(i8, i8, i8, i8)')
 def mlnTest2l(a, ab, ac, abcd):
+    return mlnTest2l_table(a, ab, ac, abcd, NO_TABLE, 0)
+
+
+def mlnTest2l_table(a, ab, ac, abcd, lngammas, anchor):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
         raise ValueError('invalid contingency table')
-    if abcd > MAXN:
+    if abcd > MAX_TOTAL:
         raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max:
         return 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
-    if ab * ac < a * abcd:
-        sr = 0.
-        for i in range(a + 1, a_max + 1):
-            sr_new = sr + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sr_new == sr:
-                break
-            sr = sr_new
+    p0 = lnhyper0(ab, ac, abcd, lngammas)
+    pa = lnhyper(a, ab, ac, abcd, lngammas)
+    if float(ab) * ac < float(a) * abcd:
+        sr = sum_tail(0., a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, lngammas, anchor)
         return -log(1. - max(0, exp(p0 - pa) * sr))
     else:
-        sl = 1.
-        for i in range(a - 1, a_min - 1, -1):
-            sl_new = sl + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sl_new == sl:
-                break
-            sl = sl_new
+        sl = sum_tail(1., a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, lngammas, anchor)
         return max(0, pa - p0 - log(sl))
 
 
 @cc.export('mlog10Test1l', 'f8(i8, i8, i8, i8)')
 def mlog10Test1l(a, b, c, d):
-    return mlnTest2l(a, a + b, a + c, a + b + c + d) / LN10
+    return mlnTest2l_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0) / LN10
 
 
 @cc.export('mlog10Test2l', 'f8(i8, i8, i8, i8)')
 def mlog10Test2l(a, ab, ac, abcd):
-    return mlnTest2l(a, ab, ac, abcd) / LN10
+    return mlnTest2l_table(a, ab, ac, abcd, NO_TABLE, 0) / LN10
 
 
 # ======================== Right Tail Only ========================
 @cc.export('test1r', 'f8(i8, i8, i8, i8)')
 def test1r(a, b, c, d):
-    return exp(-mlnTest2r(a, a + b, a + c, a + b + c + d))
+    return exp(-mlnTest2r_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0))
 
 
 @cc.export('test2r', 'f8(i8, i8, i8, i8)')
 def test2r(a, ab, ac, abcd):
-    return exp(-mlnTest2r(a, ab, ac, abcd))
+    return exp(-mlnTest2r_table(a, ab, ac, abcd, NO_TABLE, 0))
 
 
 @cc.export('mlnTest1r', 'f8(i8, i8, i8, i8)')
 def mlnTest1r(a, b, c, d):
-    return mlnTest2r(a, a + b, a + c, a + b + c + d)
+    return mlnTest2r_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0)
 
 
 @cc.export('mlnTest2r', 'f8(i8, i8, i8, i8)')
 def mlnTest2r(a, ab, ac, abcd):
+    return mlnTest2r_table(a, ab, ac, abcd, NO_TABLE, 0)
+
+
+def mlnTest2r_table(a, ab, ac, abcd, lngammas, anchor):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
         raise ValueError('invalid contingency table')
-    if abcd > MAXN:
+    if abcd > MAX_TOTAL:
         raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max:
         return 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
-    if ab * ac > a * abcd:
-        sl = 0.
-        for i in range(a - 1, a_min - 1, -1):
-            sl_new = sl + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sl_new == sl:
-                break
-            sl = sl_new
+    p0 = lnhyper0(ab, ac, abcd, lngammas)
+    pa = lnhyper(a, ab, ac, abcd, lngammas)
+    if float(ab) * ac > float(a) * abcd:
+        sl = sum_tail(0., a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, lngammas, anchor)
         return -log(1. - max(0, exp(p0 - pa) * sl))
     else:
-        sr = 1.
-        for i in range(a + 1, a_max + 1):
-            sr_new = sr + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
-            if sr_new == sr:
-                break
-            sr = sr_new
+        sr = sum_tail(1., a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, lngammas, anchor)
         return max(0, pa - p0 - log(sr))
 
 
 @cc.export('mlog10Test1r', 'f8(i8, i8, i8, i8)')
 def mlog10Test1r(a, b, c, d):
-    return mlnTest2r(a, a + b, a + c, a + b + c + d) / LN10
+    return mlnTest2r_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0) / LN10
 
 
 @cc.export('mlog10Test2r', 'f8(i8, i8, i8, i8)')
 def mlog10Test2r(a, ab, ac, abcd):
-    return mlnTest2r(a, ab, ac, abcd) / LN10
+    return mlnTest2r_table(a, ab, ac, abcd, NO_TABLE, 0) / LN10
 
 
 # ======================== Two Tails Only ========================
 @cc.export('test1t', 'f8(i8, i8, i8, i8)')
 def test1t(a, b, c, d):
-    return exp(-mlnTest2t(a, a + b, a + c, a + b + c + d))
+    return exp(-mlnTest2t_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0))
 
 
 @cc.export('test2t', 'f8(i8, i8, i8, i8)')
 def test2t(a, ab, ac, abcd):
-    return exp(-mlnTest2t(a, ab, ac, abcd))
+    return exp(-mlnTest2t_table(a, ab, ac, abcd, NO_TABLE, 0))
 
 
 @cc.export('mlnTest1t', 'f8(i8, i8, i8, i8)')
 def mlnTest1t(a, b, c, d):
-    return mlnTest2t(a, a + b, a + c, a + b + c + d)
+    return mlnTest2t_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0)
 
 
 @cc.export('mlnTest2t', 'f8(i8, i8, i8, i8)')
 def mlnTest2t(a, ab, ac, abcd):
+    return mlnTest2t_table(a, ab, ac, abcd, NO_TABLE, 0)
+
+
+def mlnTest2t_table(a, ab, ac, abcd, lngammas, anchor):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a:
         raise ValueError('invalid contingency table')
-    if abcd > MAXN:
+    if abcd > MAX_TOTAL:
         raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max:
         return 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
+    p0 = lnhyper0(ab, ac, abcd, lngammas)
+    pa = lnhyper(a, ab, ac, abcd, lngammas)
     st = 1.
-    if ab * ac < a * abcd:
-        for i in range(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
-        for i in range(a + 1, a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
+    if float(ab) * ac < float(a) * abcd:
+        st = sum_tail(st, min(a - 1, int(round(float(ab) * ac / abcd))), a_min - 1, -1, ab, ac, abcd, pa, True, lngammas, anchor)
+        st = sum_tail(st, a + 1, a_max + 1, 1, ab, ac, abcd, pa, False, lngammas, anchor)
     else:
-        for i in range(a - 1, a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
-        for i in range(max(a + 1, int(round(ab * ac / abcd))), a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa:
-                continue
-            st_new = st + exp(pa - pi)
-            if st_new == st:
-                break
-            st = st_new
+        st = sum_tail(st, a - 1, a_min - 1, -1, ab, ac, abcd, pa, False, lngammas, anchor)
+        st = sum_tail(st, max(a + 1, int(round(float(ab) * ac / abcd))), a_max + 1, 1, ab, ac, abcd, pa, True, lngammas, anchor)
     return max(0, pa - p0 - log(st))
 
 
 @cc.export('mlog10Test1t', 'f8(i8, i8, i8, i8)')
 def mlog10Test1t(a, b, c, d):
-    return mlnTest2t(a, a + b, a + c, a + b + c + d) / LN10
+    return mlnTest2t_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0) / LN10
 
 
 @cc.export('mlog10Test2t', 'f8(i8, i8, i8, i8)')
 def mlog10Test2t(a, ab, ac, abcd):
-    return mlnTest2t(a, ab, ac, abcd) / LN10
+    return mlnTest2t_table(a, ab, ac, abcd, NO_TABLE, 0) / LN10
 
 
 @cc.export('fisher_exact', 'f8(i8, i8, i8, i8, unicode_type)')
@@ -297,11 +448,11 @@ def fisher_exact(a: int, b: int, c: int, d: int, alternative: str) -> float:
     :return: pvalue
     """
     if alternative == 'two-sided':
-        return test1t(a, b, c, d)
+        return exp(-mlnTest2t_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0))
     elif alternative == 'less':
-        return test1l(a, b, c, d)
+        return exp(-mlnTest2l_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0))
     elif alternative == 'greater':
-        return test1r(a, b, c, d)
+        return exp(-mlnTest2r_table(a, a + b, a + c, a + b + c + d, NO_TABLE, 0))
     else:
         raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
 
@@ -326,11 +477,579 @@ def odds_ratio(a: int, b: int, c: int, d: int) -> float:
     return (a * d) / (c * b)
 
 
+# ======================== Threshold Decisions ========================
+# Same as in fast_fisher_python: the tails are only summed until the decision is known. exp overflows to inf here.
+
+NO_DECISION = -1
+
+
+def bounded_sum(s, i, stop, step, ab, ac, abcd, pa, limit, rest, lngammas):
+    """
+    Add exp(pa - pi) to s for i, i + step, ... (stop excluded), but stop as soon as the sum is known to end up above
+    limit (decision 1), or below it even if up to `rest` is added elsewhere (decision 0). As the distribution is
+    log-concave, the ratio r of consecutive terms only decreases away from i, so the remaining terms add up to at most
+    t r / (1 - r).
+
+    :return: (decision, s), decision is NO_DECISION if the tail was summed up without a decision
+    """
+    d0 = abcd - ab - ac
+    while (stop - i) * step > 0:
+        t = exp(pa - lnhyper(i, ab, ac, abcd, lngammas))
+        if step > 0:
+            r = float(ab - i) * (ac - i) / (float(i + 1) * (d0 + i + 1))
+        else:
+            r = float(i) * (d0 + i) / (float(ab - i + 1) * (ac - i + 1))
+        s_new = s + t
+        if s_new > limit:
+            return 1, s_new
+        if r < 1. and s_new + t * r / (1. - r) + rest < limit:
+            return 0, s_new
+        if s_new == s:
+            break
+        s = s_new
+        i += step
+    return NO_DECISION, s
+
+
+def is_significant_left(a, ab, ac, abcd, alpha, lngammas):
+    a_min = max(0, ab + ac - abcd)
+    a_max = min(ab, ac)
+    if a_min == a_max:
+        return False
+    p0 = lnhyper0(ab, ac, abcd, lngammas)
+    pa = lnhyper(a, ab, ac, abcd, lngammas)
+    # the p-value is at least the probability of the table itself
+    if p0 - pa >= log(alpha):
+        return False
+    if float(ab) * ac < float(a) * abcd:
+        # pvalue = 1 - exp(p0 - pa) * sr, significant if sr > (1 - alpha) exp(pa - p0)
+        limit = (1. - alpha) * exp(pa - p0)
+        decision, sr = bounded_sum(0., a + 1, a_max + 1, 1, ab, ac, abcd, pa, limit, 0., lngammas)
+        if decision == NO_DECISION:
+            return sr > limit
+        return decision == 1
+    # pvalue = exp(p0 - pa) * sl, significant if sl < alpha exp(pa - p0)
+    limit = alpha * exp(pa - p0)
+    decision, sl = bounded_sum(1., a - 1, a_min - 1, -1, ab, ac, abcd, pa, limit, 0., lngammas)
+    if decision == NO_DECISION:
+        return sl < limit
+    return decision == 0
+
+
+def is_significant_two(a, ab, ac, abcd, alpha, lngammas):
+    a_min = max(0, ab + ac - abcd)
+    a_max = min(ab, ac)
+    if a_min == a_max:
+        return False
+    p0 = lnhyper0(ab, ac, abcd, lngammas)
+    pa = lnhyper(a, ab, ac, abcd, lngammas)
+    if p0 - pa >= log(alpha):
+        return False
+    # pvalue = exp(p0 - pa) * st, significant if st < alpha exp(pa - p0)
+    limit = alpha * exp(pa - p0)
+    if float(ab) * ac < float(a) * abcd:
+        step, stop, stop_other = 1, a_max + 1, a_min - 1
+        j = first_tail_term(min(a - 1, int(round(float(ab) * ac / abcd))), stop_other, -1, ab, ac, abcd, pa, lngammas)
+    else:
+        step, stop, stop_other = -1, a_min - 1, a_max + 1
+        j = first_tail_term(max(a + 1, int(round(float(ab) * ac / abcd))), stop_other, 1, ab, ac, abcd, pa, lngammas)
+    # bound the opposite tail by the geometric series from its first term
+    rest = 0.
+    if j != stop_other:
+        d0 = abcd - ab - ac
+        t = exp(pa - lnhyper(j, ab, ac, abcd, lngammas))
+        if step < 0:
+            r = float(ab - j) * (ac - j) / (float(j + 1) * (d0 + j + 1))
+        else:
+            r = float(j) * (d0 + j) / (float(ab - j + 1) * (ac - j + 1))
+        rest = t / (1. - r) if r < 1. else inf
+    decision, st = bounded_sum(1., a + step, stop, step, ab, ac, abcd, pa, limit, rest, lngammas)
+    if decision == NO_DECISION:
+        decision, st = bounded_sum(st, j, stop_other, -step, ab, ac, abcd, pa, limit, 0., lngammas)
+    if decision == NO_DECISION:
+        return st < limit
+    return decision == 0
+
+
+def is_significant_table(a, b, c, d, alpha, tail, lngammas, anchor):
+    """
+    is_significant for a valid table, see check_table
+    """
+    ab, ac, abcd = a + b, a + c, a + b + c + d
+    if abcd > LARGE_TOTAL:
+        if tail == TAIL_LEFT:
+            return exp(-mlnTest2l_table(a, ab, ac, abcd, lngammas, anchor)) < alpha
+        elif tail == TAIL_RIGHT:
+            return exp(-mlnTest2r_table(a, ab, ac, abcd, lngammas, anchor)) < alpha
+        return exp(-mlnTest2t_table(a, ab, ac, abcd, lngammas, anchor)) < alpha
+    if tail == TAIL_LEFT:
+        return is_significant_left(a, ab, ac, abcd, alpha, lngammas)
+    elif tail == TAIL_RIGHT:
+        # the right tail of a table is the left tail of the table with swapped columns
+        return is_significant_left(b, ab, b + d, abcd, alpha, lngammas)
+    return is_significant_two(a, ab, ac, abcd, alpha, lngammas)
+
+
+@cc.export('is_significant', 'b1(i8, i8, i8, i8, f8, unicode_type)')
+def is_significant(a: int, b: int, c: int, d: int, alpha: float, alternative: str) -> bool:
+    """
+    Decide whether the pvalue of a Fisher exact test is below alpha, without computing it exactly.
+
+    :param a: row 1 col 1
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’}
+    :return: whether pvalue < alpha
+    """
+    if alternative == 'two-sided':
+        tail = TAIL_TWO
+    elif alternative == 'less':
+        tail = TAIL_LEFT
+    elif alternative == 'greater':
+        tail = TAIL_RIGHT
+    else:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    status = check_table(a, b, c, d)
+    if status == STATUS_INVALID:
+        raise ValueError('invalid contingency table')
+    if status == STATUS_OVERFLOW:
+        raise OverflowError('the grand total of contingency table is too large')
+    return is_significant_table(a, b, c, d, alpha, tail, NO_TABLE, 0)
+
+
 jit_module(
     nopython=True,
     cache=True,
     nogil=True
 )
 
+
+# ======================== Log-Factorial Table State ========================
+# Defined after jit_module, which would compile them: the switches and the scalar functions below are plain Python.
+# The table is never modified in place but replaced when it grows, so kernels running in other threads keep a
+# consistent one.
+
+_lngammas = NO_TABLE
+_lngamma_limit = 0
+
+
+def _lnfact_table(abcd):
+    """
+    :return: the log-factorial table, grown first if a table with grand total abcd needs more of it and the budget
+             allows
+    """
+    global _lngammas
+    # a table with grand total abcd needs lgamma(x) for x <= abcd + 1
+    if len(_lngammas) < abcd + 2 <= _lngamma_limit:
+        _lngammas = grow_lnfact_table(_lngammas, min(max(abcd + 2, 2 * len(_lngammas)), _lngamma_limit))
+    return _lngammas
+
+
+def enable_lnfact_table(max_bytes: int = 64 * 2 ** 20):
+    """
+    Read log-factorials from a shared, precomputed table instead of calling lgamma in every summation step.
+
+    The table grows on demand up to the largest grand total seen, but never beyond max_bytes.
+    Contingency tables with larger grand totals keep using lgamma. The results are identical either way.
+
+    :param max_bytes: memory budget of the table (default: 64 MiB, i.e. grand totals up to ~8.4 million)
+    """
+    global _lngamma_limit
+    if max_bytes < 0:
+        raise ValueError('max_bytes must not be negative')
+    _lngamma_limit = max_bytes // 8
+    if len(_lngammas) > _lngamma_limit:
+        disable_lnfact_table()
+        _lngamma_limit = max_bytes // 8
+
+
+def disable_lnfact_table():
+    """
+    Free the log-factorial table and go back to calling lgamma.
+    """
+    global _lngammas, _lngamma_limit
+    _lngamma_limit = 0
+    _lngammas = NO_TABLE
+
+
+def lnfact_table_size():
+    """
+    :return: the largest grand total currently covered by the log-factorial table (-1 if there is no table)
+    """
+    return max(len(_lngammas) - 2, -1)
+
+
+# ======================== Summation Mode ========================
+# 0: four lgamma calls per term. n > 0: each term is derived from the previous one by the term-ratio recurrence and
+# re-anchored with lgamma every n terms, see sum_tail.
+
+_recurrence_anchor = 0
+
+
+def enable_recurrence(anchor: int = 64):
+    """
+    Derive each term of the tail sums from the previous one with the term-ratio recurrence
+    (ab - i) (ac - i) / ((i + 1) (abcd - ab - ac + i + 1)) instead of calling lgamma four times.
+
+    The results differ from the default mode only by rounding errors (relative error ~ anchor * 1e-16).
+
+    :param anchor: recompute the term with lgamma every `anchor` steps to bound the drift (default: 64)
+    """
+    global _recurrence_anchor
+    if anchor <= 0:
+        raise ValueError('anchor must be positive')
+    _recurrence_anchor = anchor
+
+
+def disable_recurrence():
+    """
+    Go back to computing every term of the tail sums with lgamma.
+    """
+    global _recurrence_anchor
+    _recurrence_anchor = 0
+
+
+# ======================== Scalar Functions ========================
+# The jitted functions above ignore the module state (and are exported as such by cc). These replace them: they pass
+# the log-factorial table and the summation mode to the *_table kernels.
+
+def _scalar(name: str, kernel, margins, transform):
+    def function(x1: int, x2: int, x3: int, x4: int):
+        a, ab, ac, abcd = margins(x1, x2, x3, x4)
+        # the margins are Python integers here; larger ones would not fit into the int64 arguments of the kernels
+        if ab > MAX_TOTAL or ac > MAX_TOTAL or abcd > MAX_TOTAL:
+            raise OverflowError('the grand total of contingency table is too large')
+        return transform(kernel(a, ab, ac, abcd, _lnfact_table(abcd), _recurrence_anchor))
+
+    function.__name__ = function.__qualname__ = name
+    return function
+
+
+_TAILS = {'two-sided': TAIL_TWO, 'less': TAIL_LEFT, 'greater': TAIL_RIGHT}
+_MARGINS = {'1': lambda a, b, c, d: (a, a + b, a + c, a + b + c + d), '2': lambda a, ab, ac, abcd: (a, ab, ac, abcd)}
+_TRANSFORMS = {'test': lambda mln: exp(-mln), 'mlnTest': lambda mln: mln, 'mlog10Test': lambda mln: mln / LN10}
+
+for _tail, _kernel in (('', mlnTest2_table), ('l', mlnTest2l_table), ('r', mlnTest2r_table), ('t', mlnTest2t_table)):
+    for _prefix, _transform in _TRANSFORMS.items():
+        if not _tail:
+            # mlnTest2_table returns all three tails
+            _transform = (lambda transform: lambda mlns: tuple(transform(mln) for mln in mlns))(_transform)
+        for _kind, _margins in _MARGINS.items():
+            globals()[f'{_prefix}{_kind}{_tail}'] = _scalar(f'{_prefix}{_kind}{_tail}', _kernel, _margins, _transform)
+del _tail, _kernel, _prefix, _transform, _kind, _margins
+
+
+def fisher_exact(a: int, b: int, c: int, d: int, alternative: str = 'two-sided') -> float:
+    """
+    Perform a Fisher exact test on a 2x2 contingency table.
+
+    :param a: row 1 col 1
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :return: pvalue
+    """
+    if alternative == 'two-sided':
+        return test1t(a, b, c, d)
+    elif alternative == 'less':
+        return test1l(a, b, c, d)
+    elif alternative == 'greater':
+        return test1r(a, b, c, d)
+    else:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+
+
+def is_significant(a: int, b: int, c: int, d: int, alpha: float, alternative: str = 'two-sided') -> bool:
+    """
+    Decide whether the pvalue of a Fisher exact test is below alpha, without computing it exactly.
+
+    The tails are only summed until the partial sum, together with a bound on the remaining terms, proves the
+    pvalue to be above or below alpha. Decisions within rounding errors of alpha may differ from `pvalue < alpha`.
+
+    :param a: row 1 col 1
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :return: whether pvalue < alpha
+    """
+    if alternative not in _TAILS:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    if 0 > a or 0 > b or 0 > c or 0 > d:
+        raise ValueError('invalid contingency table')
+    if a + b + c + d > MAX_TOTAL:
+        raise OverflowError('the grand total of contingency table is too large')
+    return bool(is_significant_table(a, b, c, d, alpha, _TAILS[alternative], _lnfact_table(a + b + c + d),
+                                     _recurrence_anchor))
+
+
+# ======================== Batch Kernels ========================
+# Defined after jit_module, which would compile them without parallel=True, and not exported by cc: the compiled
+# backend gets its batch functions from the registry. Like the scalar functions, fisher_exact_batch passes the
+# log-factorial table and the summation mode to fisher_exact_kernel. cache=True keeps the compiled kernels in
+# __pycache__, so the compilation cost is paid once per host; warm_up loads them ahead of the first batch.
+
+OUTPUT_PVALUE, OUTPUT_MLN, OUTPUT_MLOG10 = 0, 1, 2
+_OUTPUTS = {'pvalue': OUTPUT_PVALUE, 'mln': OUTPUT_MLN, 'mlog10': OUTPUT_MLOG10}
+_COUNT_TYPES = (np.dtype(np.int32), np.dtype(np.int64))
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def fisher_exact_kernel(a, b, c, d, tail, output, out, status, lngammas, anchor):
+    for i in prange(a.shape[0]):
+        ai, bi, ci, di = np.int64(a[i]), np.int64(b[i]), np.int64(c[i]), np.int64(d[i])
+        status[i] = check_table(ai, bi, ci, di)
+        if status[i] != STATUS_OK:
+            out[i] = nan
+            continue
+        if tail == TAIL_TWO:
+            result = mlnTest2t_table(ai, ai + bi, ai + ci, ai + bi + ci + di, lngammas, anchor)
+        elif tail == TAIL_LEFT:
+            result = mlnTest2l_table(ai, ai + bi, ai + ci, ai + bi + ci + di, lngammas, anchor)
+        else:
+            result = mlnTest2r_table(ai, ai + bi, ai + ci, ai + bi + ci + di, lngammas, anchor)
+        if output == OUTPUT_PVALUE:
+            out[i] = exp(-result)
+        elif output == OUTPUT_MLN:
+            out[i] = result
+        else:
+            out[i] = result / LN10
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def is_significant_kernel(a, b, c, d, alpha, tail, out, status, lngammas, anchor):
+    for i in prange(a.shape[0]):
+        ai, bi, ci, di = np.int64(a[i]), np.int64(b[i]), np.int64(c[i]), np.int64(d[i])
+        status[i] = check_table(ai, bi, ci, di)
+        if status[i] != STATUS_OK:
+            out[i] = False
+            continue
+        out[i] = is_significant_table(ai, bi, ci, di, alpha, tail, lngammas, anchor)
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def table_status_kernel(a, b, c, d, out):
+    for i in prange(a.shape[0]):
+        out[i] = check_table(np.int64(a[i]), np.int64(b[i]), np.int64(c[i]), np.int64(d[i]))
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def odds_ratio_kernel(a, b, c, d, out):
+    for i in prange(a.shape[0]):
+        out[i] = odds_ratio(np.int64(a[i]), np.int64(b[i]), np.int64(c[i]), np.int64(d[i]))
+
+
+def _counts(*arrays):
+    """
+    :return: the arrays as contiguous 1-D int32 or int64 arrays of the same length; those are not copied
+    """
+    arrays = [np.asarray(x) for x in arrays]
+    arrays = [x if x.dtype in _COUNT_TYPES and x.flags.c_contiguous else np.ascontiguousarray(x, dtype=np.int64)
+              for x in arrays]
+    if any(x.ndim != 1 for x in arrays):
+        raise ValueError('a, b, c and d must be 1-D')
+    if any(len(x) != len(arrays[0]) for x in arrays):
+        raise ValueError('a, b, c and d must have the same length')
+    return arrays
+
+
+def _output_buffer(out, n, dtype, name):
+    if out is None:
+        return np.empty(n, dtype=dtype)
+    if out.dtype != dtype or out.ndim != 1 or len(out) != n or not out.flags.c_contiguous:
+        raise ValueError(f'{name} must be a contiguous 1-D array of {np.dtype(dtype).name} with one entry per table')
+    return out
+
+
+def _run_parallel(kernel, num_threads: int, *args):
+    # the number of threads is local to the calling thread; it cannot exceed NUMBA_NUM_THREADS
+    previous = get_num_threads()
+    set_num_threads(config.NUMBA_NUM_THREADS if num_threads <= 0 else min(num_threads, config.NUMBA_NUM_THREADS))
+    try:
+        kernel(*args)
+    finally:
+        set_num_threads(previous)
+
+
+def _reserve_lnfact_table(a, b, c, d):
+    """
+    :return: the log-factorial table, grown first for the largest grand total of the batch as far as the budget allows
+    """
+    if len(a) and len(_lngammas) < _lngamma_limit:
+        total = int(np.max(a.astype(np.int64) + b + c + d))
+        return _lnfact_table(min(total, _lngamma_limit - 2))
+    return _lngammas
+
+
+def _raise_status(status):
+    bad = np.flatnonzero(status)
+    if len(bad) == 0:
+        return
+    if status[bad[0]] == STATUS_INVALID:
+        raise ValueError('invalid contingency table')
+    raise OverflowError('the grand total of contingency table is too large')
+
+
+def fisher_exact_batch(a, b, c, d, alternative: str = 'two-sided', out=None, output: str = 'pvalue', num_threads: int = 0,
+                       errors: str = 'raise', status=None):
+    """
+    Perform Fisher exact tests on 1-D arrays of contingency tables, spread over several threads.
+
+    Same interface as fast_fisher_cython.fisher_exact_batch. int32 and int64 arrays are used without copying.
+
+    :param a: row 1 col 1 (1-D array of integers)
+    :param b: row 1 col 2 (1-D array of integers)
+    :param c: row 2 col 1 (1-D array of integers)
+    :param d: row 2 col 2 (1-D array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional contiguous output array of float64
+    :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+    :param num_threads: number of threads (default: 0, i.e. NUMBA_NUM_THREADS, one per CPU)
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table after all others have been computed, or only
+                   set its result to NaN (default: 'raise')
+    :param status: optional contiguous output array of int8 for the status of each table, see table_status
+    :return: array of results
+    """
+    if alternative not in _TAILS:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if output not in _OUTPUTS:
+        raise ValueError("`output` should be one of {'pvalue', 'mln', 'mlog10'}")
+    if errors not in ('raise', 'nan'):
+        raise ValueError("`errors` should be one of {'raise', 'nan'}")
+    a, b, c, d = _counts(a, b, c, d)
+    out = _output_buffer(out, len(a), np.float64, 'out')
+    status = _output_buffer(status, len(a), np.int8, 'status')
+    _run_parallel(fisher_exact_kernel, num_threads, a, b, c, d, _TAILS[alternative], _OUTPUTS[output], out, status,
+                  _reserve_lnfact_table(a, b, c, d), _recurrence_anchor)
+    if errors == 'raise':
+        _raise_status(status)
+    return out
+
+
+def is_significant_batch(a, b, c, d, alpha: float, alternative: str = 'two-sided', out=None, num_threads: int = 0,
+                         errors: str = 'raise', status=None):
+    """
+    Perform is_significant on 1-D arrays of contingency tables, spread over several threads.
+
+    Same interface as fast_fisher_cython.is_significant_batch. int32 and int64 arrays are used without copying.
+
+    :param a: row 1 col 1 (1-D array of integers)
+    :param b: row 1 col 2 (1-D array of integers)
+    :param c: row 2 col 1 (1-D array of integers)
+    :param d: row 2 col 2 (1-D array of integers)
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional contiguous output array of bool
+    :param num_threads: number of threads (default: 0, i.e. NUMBA_NUM_THREADS, one per CPU)
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table after all others have been decided, or only
+                   set its result to False (default: 'raise')
+    :param status: optional contiguous output array of int8 for the status of each table, see table_status
+    :return: boolean array, whether pvalue < alpha
+    """
+    if alternative not in _TAILS:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    if errors not in ('raise', 'nan'):
+        raise ValueError("`errors` should be one of {'raise', 'nan'}")
+    a, b, c, d = _counts(a, b, c, d)
+    out = _output_buffer(out, len(a), np.bool_, 'out')
+    status = _output_buffer(status, len(a), np.int8, 'status')
+    _run_parallel(is_significant_kernel, num_threads, a, b, c, d, float(alpha), _TAILS[alternative], out, status,
+                  _reserve_lnfact_table(a, b, c, d), _recurrence_anchor)
+    if errors == 'raise':
+        _raise_status(status)
+    return out
+
+
+def fisher_exact_array(a, b, c, d, alternative: str, out=None):
+    """
+    Perform Fisher exact tests on arrays of 2x2 contingency tables.
+
+    The inputs are broadcast against each other like in any NumPy ufunc.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’}
+    :param out: optional output array of float64
+    :return: array of pvalues
+    """
+    a, b, c, d = np.broadcast_arrays(a, b, c, d)
+    result = fisher_exact_batch(a.ravel(), b.ravel(), c.ravel(), d.ravel(), alternative).reshape(a.shape)
+    if out is None:
+        return result
+    np.copyto(out, result, casting='unsafe')
+    return out
+
+
+def odds_ratio_array(a, b, c, d, out=None):
+    """
+    Calculate odds ratios of arrays of contingency tables.
+
+    :param a: row 1 col 1 (array)
+    :param b: row 1 col 2 (array)
+    :param c: row 2 col 1 (array)
+    :param d: row 2 col 2 (array)
+    :param out: optional output array of float64
+    :return: array of odds ratios
+    """
+    a, b, c, d = np.broadcast_arrays(a, b, c, d)
+    shape = a.shape
+    a, b, c, d = _counts(a.ravel(), b.ravel(), c.ravel(), d.ravel())
+    result = np.empty(len(a))
+    _run_parallel(odds_ratio_kernel, 0, a, b, c, d, result)
+    if out is None:
+        return result.reshape(shape)
+    np.copyto(out, result.reshape(shape), casting='unsafe')
+    return out
+
+
+def table_status(a, b, c, d, out=None, num_threads: int = 0):
+    """
+    Validate 1-D arrays of contingency tables in one parallel pass.
+
+    :param a: row 1 col 1 (1-D array of integers)
+    :param b: row 1 col 2 (1-D array of integers)
+    :param c: row 2 col 1 (1-D array of integers)
+    :param d: row 2 col 2 (1-D array of integers)
+    :param out: optional contiguous output array of int8
+    :param num_threads: number of threads (default: 0, i.e. NUMBA_NUM_THREADS, one per CPU)
+    :return: array of STATUS_OK, STATUS_INVALID (negative counts) or STATUS_OVERFLOW (grand total above 2 ** 53)
+    """
+    a, b, c, d = _counts(a, b, c, d)
+    out = _output_buffer(out, len(a), np.int8, 'out')
+    _run_parallel(table_status_kernel, num_threads, a, b, c, d, out)
+    return out
+
+
+def warm_up():
+    """
+    Compile the scalar tests and the batch kernels for int32 and int64 counts, or load them from the on-disk cache.
+
+    Call this at the start of a worker process to keep the compilation out of the first batch.
+    """
+    for alternative in _TAILS:
+        fisher_exact(1, 2, 3, 4, alternative)
+    mlnTest1(1, 2, 3, 4)
+    odds_ratio(1, 2, 3, 4)
+    is_significant(1, 2, 3, 4, 0.05)
+    for dtype in _COUNT_TYPES:
+        table = [np.array([1, -1], dtype=dtype), *(np.array([x, x], dtype=dtype) for x in (2, 3, 4))]
+        fisher_exact_batch(*table, errors='nan')
+        is_significant_batch(*table, 0.05, errors='nan')
+        table_status(*table)
+        odds_ratio_array(*table)
+
+
 if __name__ == '__main__':
     cc.compile()
@@ -1,4 +1,4 @@
-from math import log, exp, lgamma, nan, inf
+from math import log, log1p, exp, lgamma, pi, nan, inf
 
 
 def _maxn():
@@ -15,6 +15,209 @@ def _maxn():
 LN10 = log(10)
 NINF = float('-inf')
 MAXN = _maxn()
+# Above LARGE_TOTAL, the log-factorials from lgamma lose more than ~1e-6 in their differences and the large-total mode
+# is used instead, see _ln_dhyper. It works for all totals whose counts are exact as doubles, i.e. up to MAX_TOTAL.
+LARGE_TOTAL = min(MAXN, 2 ** 24)
+MAX_TOTAL = 2 ** 53
+# In two-sided tests, terms up to this much (relative) more likely than the observed table count as ties, like in scipy
+TIE_TOLERANCE = 1e-7
+
+# Per-table status codes of the batch functions, same as in fast_fisher_cython
+STATUS_OK = 0
+STATUS_INVALID = 1
+STATUS_OVERFLOW = 2
+
+
+# ======================== Log-Factorial Table ========================
+# Optional, see enable_lnfact_table. _LNGAMMA[x] == lgamma(x), i.e. log((x-1)!).
+
+_LNGAMMA = []
+_LNGAMMA_LIMIT = 0
+_LNGAMMA_ENTRY_BYTES = 32  # list slot + float object
+
+
+def _lngamma(abcd):
+    """
+    Return a drop-in replacement for lgamma that is valid for all arguments needed by a table with grand total abcd.
+    """
+    size = abcd + 2
+    if size > len(_LNGAMMA):
+        if size > _LNGAMMA_LIMIT:
+            return lgamma
+        _LNGAMMA.extend(lgamma(x) if x else inf for x in range(len(_LNGAMMA), min(max(size, 2 * len(_LNGAMMA)), _LNGAMMA_LIMIT)))
+    return _LNGAMMA.__getitem__
+
+
+def enable_lnfact_table(max_bytes: int = 64 * 2 ** 20):
+    """
+    Read log-factorials from a shared, precomputed table instead of calling lgamma in every summation step.
+
+    The table grows on demand up to the largest grand total seen, but never beyond max_bytes.
+    Contingency tables with larger grand totals keep using lgamma. The results are identical either way.
+
+    :param max_bytes: memory budget of the table (default: 64 MiB, i.e. grand totals up to ~2 million)
+    """
+    global _LNGAMMA_LIMIT
+    if max_bytes < 0:
+        raise ValueError('max_bytes must not be negative')
+    _LNGAMMA_LIMIT = max_bytes // _LNGAMMA_ENTRY_BYTES
+    del _LNGAMMA[_LNGAMMA_LIMIT:]
+
+
+def disable_lnfact_table():
+    """
+    Free the log-factorial table and go back to calling lgamma.
+    """
+    global _LNGAMMA_LIMIT
+    _LNGAMMA_LIMIT = 0
+    _LNGAMMA.clear()
+
+
+def lnfact_table_size() -> int:
+    """
+    :return: the largest grand total currently covered by the log-factorial table (-1 if there is no table)
+    """
+    return max(len(_LNGAMMA) - 2, -1)
+
+
+def _first_tail_term(i, stop, step, ab, ac, abcd, pa, lngamma):
+    """
+    Starting at the mode, the terms only get smaller. Find the first i with pi >= pa by bisection
+    instead of evaluating every skipped term. Returns stop if there is none.
+    """
+    lo, hi = 0, (stop - i) * step
+    while lo < hi:
+        mid = (lo + hi) // 2
+        j = i + mid * step
+        if lngamma(j + 1) + lngamma(ab - j + 1) + lngamma(ac - j + 1) + lngamma(abcd - ab - ac + j + 1) < pa - TIE_TOLERANCE:
+            lo = mid + 1
+        else:
+            hi = mid
+    return i + lo * step
+
+
+# ======================== Large Totals ========================
+# Above LARGE_TOTAL, lgamma cannot resolve the differences between log-factorials well enough. Instead, the log-probabilities
+# are computed with Loader's saddle point expansion ("Fast and accurate computation of binomial probabilities", 2000),
+# which only involves the Stirling series error and the deviance term, and stays accurate for any total.
+
+LN_2PI = log(2 * pi)
+DBL_MIN = 2.2250738585072014e-308
+# The tail terms are derived from each other by the term-ratio recurrence and re-anchored every this many terms
+LARGE_TOTAL_ANCHOR = 64
+
+
+def _stirlerr(n):
+    """
+    log(n!) - log(sqrt(2 pi n) (n / e) ** n)
+    """
+    if n <= 15:
+        return lgamma(n + 1) - (n + 0.5) * log(n) + n - 0.5 * LN_2PI
+    nn = n * n
+    if n > 500: return (1 / 12 - 1 / 360 / nn) / n
+    if n > 80: return (1 / 12 - (1 / 360 - 1 / 1260 / nn) / nn) / n
+    if n > 35: return (1 / 12 - (1 / 360 - (1 / 1260 - 1 / 1680 / nn) / nn) / nn) / n
+    return (1 / 12 - (1 / 360 - (1 / 1260 - (1 / 1680 - 1 / 1188 / nn) / nn) / nn) / nn) / n
+
+
+def _bd0(x, m):
+    """
+    The deviance term x log(x / m) + m - x, without cancellation for x close to m
+    """
+    if abs(x - m) < 0.1 * (x + m):
+        v = (x - m) / (x + m)
+        s = (x - m) * v
+        if abs(s) < DBL_MIN: return s
+        ej = 2 * x * v
+        v = v * v
+        for j in range(1, 1000):
+            ej *= v
+            s1 = s + ej / (2 * j + 1)
+            if s1 == s: return s1
+            s = s1
+    return x * log(x / m) + m - x
+
+
+def _ln_dbinom(x, n, p, q):
+    """
+    log of the binomial probability of x in n trials
+    """
+    if x == 0:
+        if n == 0: return 0.
+        return -_bd0(n, n * q) - n * p if p < 0.1 else n * log(q)
+    if x == n:
+        return -_bd0(n, n * p) - n * q if q < 0.1 else n * log(p)
+    return (_stirlerr(n) - _stirlerr(x) - _stirlerr(n - x) - _bd0(x, n * p) - _bd0(n - x, n * q)
+            - 0.5 * (LN_2PI + log(x) + log1p(-x / n)))
+
+
+def _ln_dhyper(i, ab, ac, abcd):
+    """
+    log of the probability of the table (i, ab - i, ac - i, abcd - ab - ac + i) with fixed margins
+    """
+    p, q = ab / abcd, (abcd - ab) / abcd
+    return _ln_dbinom(float(i), float(ac), p, q) + _ln_dbinom(float(ab - i), float(abcd - ac), p, q) - _ln_dbinom(float(ab), float(abcd), p, q)
+
+
+def _first_tail_term_large(i, stop, step, ab, ac, abcd, lpa):
+    """
+    Like _first_tail_term, for grand totals above LARGE_TOTAL. lpa is the log-probability of the observed table.
+    """
+    lo, hi = 0, (stop - i) * step
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _ln_dhyper(i + mid * step, ab, ac, abcd) > lpa + TIE_TOLERANCE:
+            lo = mid + 1
+        else:
+            hi = mid
+    return i + lo * step
+
+
+def _sum_tail_large(s, i, stop, step, ab, ac, abcd, lpa):
+    """
+    Add P(i) / P(a) to s for i, i + step, ... (stop excluded) until s stops changing, where lpa == log(P(a)).
+    Each term is derived from the previous one by the term-ratio recurrence and re-anchored every LARGE_TOTAL_ANCHOR terms.
+    """
+    d0 = abcd - ab - ac
+    t = 0.
+    for k, i in enumerate(range(i, stop, step)):
+        if k % LARGE_TOTAL_ANCHOR == 0:
+            t = exp(_ln_dhyper(i, ab, ac, abcd) - lpa)
+        elif step > 0:
+            t *= (ab - i + 1) * (ac - i + 1) / (i * (d0 + i))
+        else:
+            t *= (i + 1) * (d0 + i + 1) / ((ab - i) * (ac - i))
+        s_new = s + t
+        if s_new == s: break
+        s = s_new
+    return s
+
+
+def _mlnTest2_large(a, ab, ac, abcd, alternative):
+    """
+    -log(pvalue) for grand totals above LARGE_TOTAL, for a valid table with a_min < a_max.
+    """
+    a_min = max(0, ab + ac - abcd)
+    a_max = min(ab, ac)
+    lpa = _ln_dhyper(a, ab, ac, abcd)
+    if alternative == 'less':
+        if ab * ac < a * abcd:
+            return -log(1. - max(0, exp(lpa) * _sum_tail_large(0., a + 1, a_max + 1, 1, ab, ac, abcd, lpa)))
+        return max(0, -lpa - log(_sum_tail_large(1., a - 1, a_min - 1, -1, ab, ac, abcd, lpa)))
+    if alternative == 'greater':
+        if ab * ac > a * abcd:
+            return -log(1. - max(0, exp(lpa) * _sum_tail_large(0., a - 1, a_min - 1, -1, ab, ac, abcd, lpa)))
+        return max(0, -lpa - log(_sum_tail_large(1., a + 1, a_max + 1, 1, ab, ac, abcd, lpa)))
+    st = 1.
+    if ab * ac < a * abcd:
+        i = _first_tail_term_large(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1, ab, ac, abcd, lpa)
+        st = _sum_tail_large(st, i, a_min - 1, -1, ab, ac, abcd, lpa)
+        st = _sum_tail_large(st, a + 1, a_max + 1, 1, ab, ac, abcd, lpa)
+    else:
+        st = _sum_tail_large(st, a - 1, a_min - 1, -1, ab, ac, abcd, lpa)
+        i = _first_tail_term_large(max(a + 1, int(round(ab * ac / abcd))), a_max + 1, 1, ab, ac, abcd, lpa)
+        st = _sum_tail_large(st, i, a_max + 1, 1, ab, ac, abcd, lpa)
+    return max(0, -lpa - log(st))
 
 
 # ======================== Full Test ========================
@@ -35,35 +238,37 @@ def mlnTest1(a, b, c, d):
 
 def mlnTest2(a, ab, ac, abcd):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a: raise ValueError('invalid contingency table')
-    if abcd > MAXN: raise OverflowError('the grand total of contingency table is too large')
+    if abcd > MAX_TOTAL: raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max: return 0., 0., 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
+    if abcd > LARGE_TOTAL: return tuple(_mlnTest2_large(a, ab, ac, abcd, alternative) for alternative in ('less', 'greater', 'two-sided'))
+    lngamma = _lngamma(abcd)
+    p0 = lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+    pa = lngamma(a + 1) + lngamma(ab - a + 1) + lngamma(ac - a + 1) + lngamma(abcd - ab - ac + a + 1)
     sl = sr = 0.
     if ab * ac < a * abcd:
-        for i in range(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa: continue
+        for i in range(_first_tail_term(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1, ab, ac, abcd, pa, lngamma), a_min - 1, -1):
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
+            if pi < pa - TIE_TOLERANCE: continue
             sl_new = sl + exp(pa - pi)
             if sl_new == sl: break
             sl = sl_new
         for i in range(a + 1, a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
             sr_new = sr + exp(pa - pi)
             if sr_new == sr: break
             sr = sr_new
         return -log(1. - max(0, exp(p0 - pa) * sr)), max(0, pa - p0 - log(1. + sr)), max(0, pa - p0 - log(sl + 1. + sr))
     else:
         for i in range(a - 1, a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
             sl_new = sl + exp(pa - pi)
             if sl_new == sl: break
             sl = sl_new
-        for i in range(max(a + 1, int(round(ab * ac / abcd))), a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa: continue
+        for i in range(_first_tail_term(max(a + 1, int(round(ab * ac / abcd))), a_max + 1, 1, ab, ac, abcd, pa, lngamma), a_max + 1):
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
+            if pi < pa - TIE_TOLERANCE: continue
             sr_new = sr + exp(pa - pi)
             if sr_new == sr: break
             sr = sr_new
@@ -96,23 +301,25 @@ def mlnTest1l(a, b, c, d):
 
 def mlnTest2l(a, ab, ac, abcd):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a: raise ValueError('invalid contingency table')
-    if abcd > MAXN: raise OverflowError('the grand total of contingency table is too large')
+    if abcd > MAX_TOTAL: raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max: return 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
+    if abcd > LARGE_TOTAL: return _mlnTest2_large(a, ab, ac, abcd, 'less')
+    lngamma = _lngamma(abcd)
+    p0 = lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+    pa = lngamma(a + 1) + lngamma(ab - a + 1) + lngamma(ac - a + 1) + lngamma(abcd - ab - ac + a + 1)
     if ab * ac < a * abcd:
         sr = 0.
         for i in range(a + 1, a_max + 1):
-            sr_new = sr + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
+            sr_new = sr + exp(pa - lngamma(i + 1) - lngamma(ab - i + 1) - lngamma(ac - i + 1) - lngamma(abcd - ab - ac + i + 1))
             if sr_new == sr: break
             sr = sr_new
         return -log(1. - max(0, exp(p0 - pa) * sr))
     else:
         sl = 1.
         for i in range(a - 1, a_min - 1, -1):
-            sl_new = sl + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
+            sl_new = sl + exp(pa - lngamma(i + 1) - lngamma(ab - i + 1) - lngamma(ac - i + 1) - lngamma(abcd - ab - ac + i + 1))
             if sl_new == sl: break
             sl = sl_new
         return max(0, pa - p0 - log(sl))
@@ -142,23 +349,25 @@ def mlnTest1r(a, b, c, d):
 
 def mlnTest2r(a, ab, ac, abcd):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a: raise ValueError('invalid contingency table')
-    if abcd > MAXN: raise OverflowError('the grand total of contingency table is too large')
+    if abcd > MAX_TOTAL: raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max: return 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
+    if abcd > LARGE_TOTAL: return _mlnTest2_large(a, ab, ac, abcd, 'greater')
+    lngamma = _lngamma(abcd)
+    p0 = lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+    pa = lngamma(a + 1) + lngamma(ab - a + 1) + lngamma(ac - a + 1) + lngamma(abcd - ab - ac + a + 1)
     if ab * ac > a * abcd:
         sl = 0.
         for i in range(a - 1, a_min - 1, -1):
-            sl_new = sl + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
+            sl_new = sl + exp(pa - lngamma(i + 1) - lngamma(ab - i + 1) - lngamma(ac - i + 1) - lngamma(abcd - ab - ac + i + 1))
             if sl_new == sl: break
             sl = sl_new
         return -log(1. - max(0, exp(p0 - pa) * sl))
     else:
         sr = 1.
         for i in range(a + 1, a_max + 1):
-            sr_new = sr + exp(pa - lgamma(i + 1) - lgamma(ab - i + 1) - lgamma(ac - i + 1) - lgamma(abcd - ab - ac + i + 1))
+            sr_new = sr + exp(pa - lngamma(i + 1) - lngamma(ab - i + 1) - lngamma(ac - i + 1) - lngamma(abcd - ab - ac + i + 1))
             if sr_new == sr: break
             sr = sr_new
         return max(0, pa - p0 - log(sr))
@@ -188,34 +397,36 @@ def mlnTest1t(a, b, c, d):
 
 def mlnTest2t(a, ab, ac, abcd):
     if 0 > a or a > ab or a > ac or ab + ac > abcd + a: raise ValueError('invalid contingency table')
-    if abcd > MAXN: raise OverflowError('the grand total of contingency table is too large')
+    if abcd > MAX_TOTAL: raise OverflowError('the grand total of contingency table is too large')
     a_min = max(0, ab + ac - abcd)
     a_max = min(ab, ac)
     if a_min == a_max: return 0.
-    p0 = lgamma(ab + 1) + lgamma(ac + 1) + lgamma(abcd - ac + 1) + lgamma(abcd - ab + 1) - lgamma(abcd + 1)
-    pa = lgamma(a + 1) + lgamma(ab - a + 1) + lgamma(ac - a + 1) + lgamma(abcd - ab - ac + a + 1)
+    if abcd > LARGE_TOTAL: return _mlnTest2_large(a, ab, ac, abcd, 'two-sided')
+    lngamma = _lngamma(abcd)
+    p0 = lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+    pa = lngamma(a + 1) + lngamma(ab - a + 1) + lngamma(ac - a + 1) + lngamma(abcd - ab - ac + a + 1)
     st = 1.
     if ab * ac < a * abcd:
-        for i in range(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa: continue
+        for i in range(_first_tail_term(min(a - 1, int(round(ab * ac / abcd))), a_min - 1, -1, ab, ac, abcd, pa, lngamma), a_min - 1, -1):
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
+            if pi < pa - TIE_TOLERANCE: continue
             st_new = st + exp(pa - pi)
             if st_new == st: break
             st = st_new
         for i in range(a + 1, a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
             st_new = st + exp(pa - pi)
             if st_new == st: break
             st = st_new
     else:
         for i in range(a - 1, a_min - 1, -1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
             st_new = st + exp(pa - pi)
             if st_new == st: break
             st = st_new
-        for i in range(max(a + 1, int(round(ab * ac / abcd))), a_max + 1):
-            pi = lgamma(i + 1) + lgamma(ab - i + 1) + lgamma(ac - i + 1) + lgamma(abcd - ab - ac + i + 1)
-            if pi < pa: continue
+        for i in range(_first_tail_term(max(a + 1, int(round(ab * ac / abcd))), a_max + 1, 1, ab, ac, abcd, pa, lngamma), a_max + 1):
+            pi = lngamma(i + 1) + lngamma(ab - i + 1) + lngamma(ac - i + 1) + lngamma(abcd - ab - ac + i + 1)
+            if pi < pa - TIE_TOLERANCE: continue
             st_new = st + exp(pa - pi)
             if st_new == st: break
             st = st_new
@@ -268,3 +479,299 @@ def odds_ratio(a: int, b: int, c: int, d: int) -> float:
         return inf
 
     return (a * d) / (c * b)
+
+
+# ======================== Threshold Decisions ========================
+
+def _exp(x):
+    """
+    exp that overflows to inf, like in C
+    """
+    return exp(x) if x < 709. else inf
+
+
+def _bounded_sum(s, i, stop, step, ab, ac, abcd, pa, limit, rest, lngamma):
+    """
+    Add exp(pa - pi) to s for i, i + step, ... (stop excluded), but stop as soon as the sum is known to end up above
+    limit (decision 1), or below it even if up to `rest` is added elsewhere (decision 0). As the distribution is
+    log-concave, the ratio r of consecutive terms only decreases away from i, so the remaining terms add up to at most
+    t r / (1 - r).
+
+    :return: (decision, s), decision is None if the tail was summed up without a decision
+    """
+    d0 = abcd - ab - ac
+    for i in range(i, stop, step):
+        t = exp(pa - lngamma(i + 1) - lngamma(ab - i + 1) - lngamma(ac - i + 1) - lngamma(d0 + i + 1))
+        r = (ab - i) * (ac - i) / ((i + 1) * (d0 + i + 1)) if step > 0 else i * (d0 + i) / ((ab - i + 1) * (ac - i + 1))
+        s_new = s + t
+        if s_new > limit: return 1, s_new
+        if r < 1. and s_new + t * r / (1. - r) + rest < limit: return 0, s_new
+        if s_new == s: break
+        s = s_new
+    return None, s
+
+
+def _is_significant_left(a, ab, ac, abcd, alpha):
+    a_min = max(0, ab + ac - abcd)
+    a_max = min(ab, ac)
+    if a_min == a_max: return False
+    lngamma = _lngamma(abcd)
+    p0 = lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+    pa = lngamma(a + 1) + lngamma(ab - a + 1) + lngamma(ac - a + 1) + lngamma(abcd - ab - ac + a + 1)
+    # the p-value is at least the probability of the table itself
+    if p0 - pa >= log(alpha): return False
+    if ab * ac < a * abcd:
+        # pvalue = 1 - exp(p0 - pa) * sr, significant if sr > (1 - alpha) exp(pa - p0)
+        limit = (1. - alpha) * _exp(pa - p0)
+        decision, sr = _bounded_sum(0., a + 1, a_max + 1, 1, ab, ac, abcd, pa, limit, 0., lngamma)
+        return sr > limit if decision is None else decision == 1
+    # pvalue = exp(p0 - pa) * sl, significant if sl < alpha exp(pa - p0)
+    limit = alpha * _exp(pa - p0)
+    decision, sl = _bounded_sum(1., a - 1, a_min - 1, -1, ab, ac, abcd, pa, limit, 0., lngamma)
+    return sl < limit if decision is None else decision == 0
+
+
+def _is_significant_two(a, ab, ac, abcd, alpha):
+    a_min = max(0, ab + ac - abcd)
+    a_max = min(ab, ac)
+    if a_min == a_max: return False
+    lngamma = _lngamma(abcd)
+    p0 = lngamma(ab + 1) + lngamma(ac + 1) + lngamma(abcd - ac + 1) + lngamma(abcd - ab + 1) - lngamma(abcd + 1)
+    pa = lngamma(a + 1) + lngamma(ab - a + 1) + lngamma(ac - a + 1) + lngamma(abcd - ab - ac + a + 1)
+    if p0 - pa >= log(alpha): return False
+    # pvalue = exp(p0 - pa) * st, significant if st < alpha exp(pa - p0)
+    limit = alpha * _exp(pa - p0)
+    if ab * ac < a * abcd:
+        step, stop, stop_other = 1, a_max + 1, a_min - 1
+        j = _first_tail_term(min(a - 1, int(round(ab * ac / abcd))), stop_other, -1, ab, ac, abcd, pa, lngamma)
+    else:
+        step, stop, stop_other = -1, a_min - 1, a_max + 1
+        j = _first_tail_term(max(a + 1, int(round(ab * ac / abcd))), stop_other, 1, ab, ac, abcd, pa, lngamma)
+    # bound the opposite tail by the geometric series from its first term
+    rest = 0.
+    if j != stop_other:
+        d0 = abcd - ab - ac
+        t = exp(pa - lngamma(j + 1) - lngamma(ab - j + 1) - lngamma(ac - j + 1) - lngamma(d0 + j + 1))
+        r = (ab - j) * (ac - j) / ((j + 1) * (d0 + j + 1)) if step < 0 else j * (d0 + j) / ((ab - j + 1) * (ac - j + 1))
+        rest = t / (1. - r) if r < 1. else inf
+    decision, st = _bounded_sum(1., a + step, stop, step, ab, ac, abcd, pa, limit, rest, lngamma)
+    if decision is None:
+        decision, st = _bounded_sum(st, j, stop_other, -step, ab, ac, abcd, pa, limit, 0., lngamma)
+    return st < limit if decision is None else decision == 0
+
+
+def is_significant(a: int, b: int, c: int, d: int, alpha: float, alternative: str = 'two-sided') -> bool:
+    """
+    Decide whether the pvalue of a Fisher exact test is below alpha, without computing it exactly.
+
+    The tails are only summed until the partial sum, together with a bound on the remaining terms, proves the
+    pvalue to be above or below alpha. Decisions within rounding errors of alpha may differ from `pvalue < alpha`.
+
+    :param a: row 1 col 1
+    :param b: row 1 col 2
+    :param c: row 2 col 1
+    :param d: row 2 col 2
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :return: whether pvalue < alpha
+    """
+    if alternative not in ('two-sided', 'less', 'greater'):
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    if 0 > a or 0 > b or 0 > c or 0 > d: raise ValueError('invalid contingency table')
+    if a + b + c + d > MAX_TOTAL: raise OverflowError('the grand total of contingency table is too large')
+    if a + b + c + d > LARGE_TOTAL:
+        if max(0, a - d) == min(a + b, a + c): return False
+        return exp(-_mlnTest2_large(a, a + b, a + c, a + b + c + d, alternative)) < alpha
+    if alternative == 'less':
+        return _is_significant_left(a, a + b, a + c, a + b + c + d, alpha)
+    elif alternative == 'greater':
+        # the right tail of a table is the left tail of the table with swapped columns
+        return _is_significant_left(b, a + b, b + d, a + b + c + d, alpha)
+    return _is_significant_two(a, a + b, a + c, a + b + c + d, alpha)
+
+
+def fisher_exact_array(a, b, c, d, alternative: str, out=None):
+    """
+    Perform Fisher exact tests on arrays of 2x2 contingency tables.
+
+    The inputs are broadcast against each other like in any NumPy ufunc.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’}
+    :param out: optional output array of float64
+    :return: array of pvalues
+    """
+    import numpy as np
+
+    if alternative not in ('two-sided', 'less', 'greater'):
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    a, b, c, d = np.broadcast_arrays(*_as_int64(a, b, c, d))
+    status = table_status(a, b, c, d)
+    if status.any():
+        _raise_status(status.flat[np.flatnonzero(status)[0]])
+    result = np.exp(-_mln_tests(a.ravel(), b.ravel(), c.ravel(), d.ravel(), alternative)).reshape(a.shape)
+    if out is None:
+        return result
+    np.copyto(out, result, casting='unsafe')
+    return out
+
+
+def odds_ratio_array(a, b, c, d, out=None):
+    """
+    Calculate odds ratios of arrays of contingency tables.
+
+    :param a: row 1 col 1 (array)
+    :param b: row 1 col 2 (array)
+    :param c: row 2 col 1 (array)
+    :param d: row 2 col 2 (array)
+    :param out: optional output array of float64
+    :return: array of odds ratios
+    """
+    return _apply_array(odds_ratio, a, b, c, d, out)
+
+
+def table_status(a, b, c, d, out=None, num_threads: int = 0):
+    """
+    Validate arrays of contingency tables in one vectorized pass.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param out: optional output array of int8
+    :param num_threads: ignored
+    :return: array of STATUS_OK, STATUS_INVALID (negative counts) or STATUS_OVERFLOW (grand total above 2 ** 53)
+    """
+    import numpy as np
+
+    a, b, c, d = _as_int64(a, b, c, d)
+    # the sum cannot wrap around if no count is above MAX_TOTAL
+    overflow = (np.maximum.reduce([a, b, c, d]) > MAX_TOTAL) | (a + b + c + d > MAX_TOTAL)
+    invalid = (a < 0) | (b < 0) | (c < 0) | (d < 0)
+    status = np.where(invalid, STATUS_INVALID, np.where(overflow, STATUS_OVERFLOW, STATUS_OK)).astype(np.int8)
+    if out is None:
+        return status
+    out[...] = status
+    return out
+
+
+def _raise_status(status):
+    if status == STATUS_INVALID:
+        raise ValueError('invalid contingency table')
+    if status == STATUS_OVERFLOW:
+        raise OverflowError('the grand total of contingency table is too large')
+
+
+def _apply_batch(function, a, b, c, d, out, dtype, fill, errors: str, status, vectorized: bool = False):
+    """
+    Apply function to the valid tables only; fill in the others and raise for the first of them if errors == 'raise'.
+    A vectorized function gets the arrays of all valid tables at once, any other one table after table.
+    """
+    import numpy as np
+
+    if errors not in ('raise', 'nan'):
+        raise ValueError("`errors` should be one of {'raise', 'nan'}")
+    a, b, c, d = _as_int64(a, b, c, d)
+    status = table_status(a, b, c, d, status)
+    valid = status == STATUS_OK
+    if out is None:
+        out = np.empty(len(a), dtype=dtype)
+    out[~valid] = fill
+    if valid.any():
+        if not vectorized:
+            function = np.frompyfunc(function, 4, 1)
+        out[valid] = function(a[valid], b[valid], c[valid], d[valid])
+    if errors == 'raise' and not valid.all():
+        _raise_status(status[np.argmin(valid)])
+    return out
+
+
+def fisher_exact_batch(a, b, c, d, alternative: str = 'two-sided', out=None, output: str = 'pvalue', num_threads: int = 0,
+                       errors: str = 'raise', status=None):
+    """
+    Perform Fisher exact tests on 1-D arrays of contingency tables.
+
+    Same interface as fast_fisher_cython.fisher_exact_batch, but always runs on a single thread. The tables are
+    computed together with NumPy, see fast_fisher.vectorized.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional output array of float64
+    :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+    :param num_threads: ignored
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table, or only set its result to NaN (default: 'raise')
+    :param status: optional output array of int8 for the status of each table, see table_status
+    :return: array of results
+    """
+    import numpy as np
+
+    transforms = {'pvalue': lambda mln: np.exp(-mln), 'mln': lambda mln: mln, 'mlog10': lambda mln: mln / LN10}
+    if alternative not in ('two-sided', 'less', 'greater'):
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if output not in transforms:
+        raise ValueError("`output` should be one of {'pvalue', 'mln', 'mlog10'}")
+
+    def function(a, b, c, d):
+        return transforms[output](_mln_tests(a, b, c, d, alternative))
+
+    return _apply_batch(function, a, b, c, d, out, float, nan, errors, status, vectorized=True)
+
+
+def is_significant_batch(a, b, c, d, alpha: float, alternative: str = 'two-sided', out=None, num_threads: int = 0,
+                         errors: str = 'raise', status=None):
+    """
+    Perform is_significant on 1-D arrays of contingency tables.
+
+    Same interface as fast_fisher_cython.is_significant_batch, but always runs on a single thread.
+
+    :param a: row 1 col 1 (array of integers)
+    :param b: row 1 col 2 (array of integers)
+    :param c: row 2 col 1 (array of integers)
+    :param d: row 2 col 2 (array of integers)
+    :param alpha: significance level, 0 < alpha <= 1
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional output array of bool
+    :param num_threads: ignored
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table, or only set its result to False (default: 'raise')
+    :param status: optional output array of int8 for the status of each table, see table_status
+    :return: boolean array, whether pvalue < alpha
+    """
+    if alternative not in ('two-sided', 'less', 'greater'):
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    def function(a, b, c, d):
+        return is_significant(a, b, c, d, alpha, alternative)
+
+    return _apply_batch(function, a, b, c, d, out, bool, False, errors, status)
+
+
+def _mln_tests(a, b, c, d, alternative: str):
+    from .vectorized import mln_tests
+
+    return mln_tests(a, a + b, a + c, a + b + c + d, alternative)
+
+
+def _as_int64(*arrays):
+    # e.g. int32 counts would overflow in sums of the NumPy scalars frompyfunc passes on
+    import numpy as np
+
+    return (np.asarray(x, dtype=np.int64) for x in arrays)
+
+
+def _apply_array(function, a, b, c, d, out):
+    import numpy as np
+
+    result = np.frompyfunc(function, 4, 1)(a, b, c, d)
+    if out is None:
+        return np.asarray(result, dtype=float)
+    np.copyto(out, result, casting='unsafe')
+    return out
@@ -0,0 +1,104 @@
+import numpy as np
+
+LN10 = np.log(10)
+# In two-sided tests, tables up to this much (relative) more likely than the observed one count as ties, like in the kernels
+TIE_TOLERANCE = 1e-7
+
+
+class FixedMargins:
+    """
+    All Fisher exact tests for contingency tables with the same margins (ab, ac, abcd), which differ only in a.
+
+    The full hypergeometric distribution of a and its cumulative tails are computed once, in log space.
+    Afterwards, the left and right tails of any a are looked up in O(1), the two-sided p-value in O(log n).
+    All methods accept scalars or arrays of a.
+    """
+
+    def __init__(self, ab: int, ac: int, abcd: int):
+        """
+        :param ab: row 1 sum
+        :param ac: column 1 sum
+        :param abcd: grand total
+        """
+        if 0 > ab or 0 > ac or ab > abcd or ac > abcd:
+            raise ValueError('invalid contingency table')
+        self.ab, self.ac, self.abcd = ab, ac, abcd
+        self.a_min = max(0, ab + ac - abcd)
+        self.a_max = min(ab, ac)
+
+        # log(P(i + 1) / P(i)) for i in [a_min, a_max)
+        i = np.arange(self.a_min, self.a_max, dtype=np.float64)
+        log_ratios = np.log((ab - i) * (ac - i) / ((i + 1) * (abcd - ab - ac + i + 1)))
+
+        # log-probabilities relative to the mode, accumulated outward from the mode to keep rounding errors small
+        self.mode = int(np.searchsorted(-log_ratios, 0.)) + self.a_min
+        m = self.mode - self.a_min
+        lp = np.empty(self.a_max - self.a_min + 1)
+        lp[m] = 0.
+        lp[m + 1:] = np.cumsum(log_ratios[m:])
+        lp[:m] = -np.cumsum(log_ratios[:m][::-1])[::-1]
+        lp -= np.logaddexp.reduce(lp)
+
+        self.lnpmf = lp
+        self.lnleft = np.minimum(np.logaddexp.accumulate(lp), 0.)
+        self.lnright = np.minimum(np.logaddexp.accumulate(lp[::-1])[::-1], 0.)
+        # increasing up to the mode, and the negative of the decreasing part after it, for the two-sided search
+        self._lp_up = lp[:m + 1]
+        self._neg_lp_down = -lp[m:]
+
+    def _index(self, a):
+        a = np.asarray(a)
+        if np.any(a < self.a_min) or np.any(a > self.a_max):
+            raise ValueError('invalid contingency table')
+        return a - self.a_min
+
+    def lnprob(self, a):
+        """
+        :return: log(P(a)), the log-probability of the table itself
+        """
+        return self.lnpmf[self._index(a)]
+
+    def mlnTest2l(self, a):
+        return -self.lnleft[self._index(a)]
+
+    def mlnTest2r(self, a):
+        return -self.lnright[self._index(a)]
+
+    def mlnTest2t(self, a):
+        k = self._index(a)
+        m = self.mode - self.a_min
+        threshold = self.lnpmf[k] + TIE_TOLERANCE
+        # left of the mode: the left tail up to k plus the right tail from the first j with lp[j] <= lp[k]
+        j = np.searchsorted(self._neg_lp_down, -threshold) + m
+        left = np.logaddexp(self.lnleft[k], np.where(j < len(self.lnpmf), self.lnright[np.minimum(j, len(self.lnpmf) - 1)], -np.inf))
+        # right of the mode: the right tail from k plus the left tail up to the last i with lp[i] <= lp[k]
+        i = np.searchsorted(self._lp_up, threshold, side='right') - 1
+        right = np.logaddexp(self.lnright[k], np.where(i >= 0, self.lnleft[np.maximum(i, 0)], -np.inf))
+        return -np.minimum(np.where(k <= m, left, right), 0.)
+
+    def mlnTest2(self, a):
+        return self.mlnTest2l(a), self.mlnTest2r(a), self.mlnTest2t(a)
+
+    def test2l(self, a):
+        return np.exp(-self.mlnTest2l(a))
+
+    def test2r(self, a):
+        return np.exp(-self.mlnTest2r(a))
+
+    def test2t(self, a):
+        return np.exp(-self.mlnTest2t(a))
+
+    def test2(self, a):
+        return self.test2l(a), self.test2r(a), self.test2t(a)
+
+    def mlog10Test2l(self, a):
+        return self.mlnTest2l(a) / LN10
+
+    def mlog10Test2r(self, a):
+        return self.mlnTest2r(a) / LN10
+
+    def mlog10Test2t(self, a):
+        return self.mlnTest2t(a) / LN10
+
+    def mlog10Test2(self, a):
+        return self.mlog10Test2l(a), self.mlog10Test2r(a), self.mlog10Test2t(a)
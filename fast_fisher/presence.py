@@ -0,0 +1,276 @@
+"""
+Association screens of a binary presence/absence matrix (e.g. genes x isolates) against binary traits.
+
+The matrix is bit-packed once, one bit per entry in 64-bit words. For each trait, the contingency table of every gene,
+
+    a = gene present, trait positive      b = gene present, trait negative
+    c = gene absent, trait positive       d = gene absent, trait negative
+
+is derived by popcount of the packed rows and the packed trait, without creating any Python objects per gene. Since
+all tables share the trait margins, they only differ in (a, b); each distinct table is tested once, by the batch
+functions, and the results are scattered back to the genes.
+
+Co-occurrence screens test every pair of genes i < j against each other:
+
+    a = both present                      b = i present, j absent
+    c = i absent, j present               d = both absent
+
+Only a needs counting, all other counts follow from the gene counts. The matrix X of genes x isolates is unpacked one
+block of genes at a time and a for a block of pairs is taken from the matrix product X[I] @ X[J].T, in float32 (exact
+up to 2 ** 24 isolates) so that it runs on BLAS. Thus, the memory needed is bounded by the block size, not N ** 2.
+
+Permutation tests (Westfall-Young) shuffle the trait many times. This keeps the margins of all tables: the number of
+isolates of each gene and the number of positive isolates. Thus, the p-value of a gene only depends on a and on its
+number of isolates, and all p-values that can occur are computed once, from the margins. For each permutation, a of
+every gene is again taken from matrix products, of gene blocks with a batch of permuted traits, and the p-values are
+looked up.
+"""
+import os
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# matrix products of 0/1 rows in float32 are exact up to this number of isolates
+FLOAT32_ISOLATES = 2 ** 24
+
+# popcount of every byte, for NumPy versions without np.bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount_table(words):
+    return _POPCOUNT_TABLE[words.view(np.uint8)]
+
+
+_popcount = getattr(np, 'bitwise_count', _popcount_table)
+
+
+def _popcount_rows(words):
+    """
+    :return: the number of set bits in each row of a 2-D array of uint64
+    """
+    return _popcount(words).sum(axis=1, dtype=np.int64)
+
+
+def _pack(rows, n_words: int):
+    """
+    :return: 2-D array of uint64 with the nonzero entries of rows as bits; the padding bits are 0
+    """
+    packed = np.zeros((len(rows), 8 * n_words), dtype=np.uint8)
+    bits = np.packbits(np.asarray(rows) != 0, axis=1, bitorder='little')
+    packed[:, :bits.shape[1]] = bits
+    return packed.view(np.uint64)
+
+
+class PresenceAbsence:
+    """
+    Bit-packed binary matrix of genes (rows) x isolates (columns), to be tested against binary traits of the isolates.
+
+    The packed matrix takes one bit per entry, plus a few bytes per gene for the counts and results of each trait.
+    """
+
+    def __init__(self, matrix, chunk_size: int = 2 ** 14):
+        """
+        :param matrix: 2-D array of genes x isolates, e.g. a memory map; nonzero entries mean present
+        :param chunk_size: number of genes packed and counted at once
+        """
+        if not isinstance(matrix, np.ndarray):
+            matrix = np.asarray(matrix)
+        if matrix.ndim != 2:
+            raise ValueError('matrix must be 2-D: genes x isolates')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        self.n_genes, self.n_isolates = matrix.shape
+        self.chunk_size = chunk_size
+        n_words = (self.n_isolates + 63) // 64
+        self.packed = np.empty((self.n_genes, n_words), dtype=np.uint64)
+        for start in range(0, self.n_genes, chunk_size):
+            self.packed[start:start + chunk_size] = _pack(matrix[start:start + chunk_size], n_words)
+        # number of isolates with each gene
+        self.gene_counts = self._count(None)
+
+    def _count(self, mask):
+        """
+        :return: for each gene, the number of set bits in mask (packed), or of all bits if mask is None
+        """
+        counts = np.empty(self.n_genes, dtype=np.int64)
+        for start in range(0, self.n_genes, self.chunk_size):
+            words = self.packed[start:start + self.chunk_size]
+            counts[start:start + self.chunk_size] = _popcount_rows(words if mask is None else words & mask)
+        return counts
+
+    def _trait_masks(self, trait):
+        """
+        :return: packed masks of the positive and negative isolates, their numbers, and whether all are known
+        """
+        trait = np.asarray(trait)
+        if trait.shape != (self.n_isolates,):
+            raise ValueError('trait must have one entry per isolate')
+        known = ~np.isnan(trait) if trait.dtype.kind == 'f' else np.ones(self.n_isolates, dtype=bool)
+        if not np.isin(trait[known], (0, 1)).all():
+            raise ValueError('trait must be binary: 0/1 or False/True, NaN if unknown')
+        positive = known & (trait == 1)
+        negative = known & (trait == 0)
+        n_words = self.packed.shape[1]
+        return (_pack(positive[None], n_words)[0], _pack(negative[None], n_words)[0], int(positive.sum()),
+                int(negative.sum()), bool(known.all()))
+
+    def counts(self, trait):
+        """
+        Contingency tables of all genes against a trait. Isolates with unknown trait are left out.
+
+        :param trait: 1-D array with one entry per isolate: 1/True (positive), 0/False (negative), NaN (unknown)
+        :return: a, b, c, d as int64 arrays with one entry per gene
+        """
+        positive, negative, n_positive, n_negative, all_known = self._trait_masks(trait)
+        a = self._count(positive)
+        b = self.gene_counts - a if all_known else self._count(negative)
+        return a, b, n_positive - a, n_negative - b
+
+    def test(self, trait, alternative: str = 'two-sided', output: str = 'pvalue', num_threads: int = 0):
+        """
+        Perform Fisher exact tests of all genes against a trait.
+
+        :param trait: 1-D array with one entry per isolate: 1/True (positive), 0/False (negative), NaN (unknown)
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided'); 'greater' means that the gene is
+                            associated with the positive trait
+        :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+        :param num_threads: number of threads (default: 0, i.e. one per CPU)
+        :return: results and odds ratios, arrays with one entry per gene
+        """
+        from . import fast_fisher_exact_batch, odds_ratio_array
+
+        a, b, c, d = self.counts(trait)
+        # all tables share the margins of the trait, b + d is the number of negative isolates; so (a, b) identifies them
+        n_negative = int(b[0] + d[0]) if self.n_genes else 0
+        _, index, inverse = np.unique(a * (n_negative + 1) + b, return_index=True, return_inverse=True)
+        a, b, c, d = a[index], b[index], c[index], d[index]
+        results = fast_fisher_exact_batch(a, b, c, d, alternative, output=output, num_threads=num_threads)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            odds = odds_ratio_array(a, b, c, d)
+        return results[inverse], odds[inverse]
+
+    def _unpack(self, start: int, stop: int):
+        """
+        :return: rows start:stop of the matrix as 0/1 floats, for exact matrix products
+        """
+        bits = np.unpackbits(self.packed[start:stop].view(np.uint8), axis=1, count=self.n_isolates,
+                             bitorder='little')
+        return bits.astype(np.float32 if self.n_isolates <= FLOAT32_ISOLATES else np.float64)
+
+    def cooccurrence(self, alternative: str = 'two-sided', output: str = 'pvalue', alpha: float = None,
+                     block_size: int = 1024, num_threads: int = 0, dedup: bool = True):
+        """
+        Perform Fisher exact tests of all pairs of genes i < j, one block of block_size x block_size pairs at a time.
+
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided'); 'greater' means that the genes
+                            co-occur, 'less' that they avoid each other
+        :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+        :param alpha: if given, only the pairs with pvalue < alpha are returned, decided by is_significant_batch,
+                      which is much faster than computing all pvalues (default: None, i.e. all pairs)
+        :param block_size: number of genes per block; a block of pairs needs about 100 bytes per pair
+        :param num_threads: number of threads (default: 0, i.e. one per CPU)
+        :param dedup: compute each distinct table of a block only once
+        :return: generator of (i, j, results) per block: int64 arrays of the gene indices, i < j, and the results
+        """
+        from . import fast_fisher_exact_batch, is_significant_batch
+
+        if alternative not in ('two-sided', 'less', 'greater'):
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        if block_size <= 0:
+            raise ValueError('block_size must be positive')
+        if alpha is not None and not 0 < alpha <= 1:
+            raise ValueError('alpha must be in (0, 1]')
+        for row in range(0, self.n_genes, block_size):
+            rows = self._unpack(row, row + block_size)
+            for col in range(row, self.n_genes, block_size):
+                cols = rows if col == row else self._unpack(col, col + block_size)
+                both = rows @ cols.T
+                # on the diagonal blocks, only the pairs above the diagonal
+                i, j = np.nonzero(np.triu(np.ones(both.shape, dtype=bool), 1)) if col == row else \
+                    np.indices(both.shape).reshape(2, -1)
+                a = both[i, j].astype(np.int64)
+                i += row
+                j += col
+                b = self.gene_counts[i] - a
+                c = self.gene_counts[j] - a
+                d = self.n_isolates - a - b - c
+                if alpha is not None:
+                    significant = np.flatnonzero(is_significant_batch(a, b, c, d, alpha, alternative,
+                                                                      num_threads=num_threads))
+                    i, j, a, b, c, d = (x[significant] for x in (i, j, a, b, c, d))
+                yield i, j, fast_fisher_exact_batch(a, b, c, d, alternative, output=output, num_threads=num_threads,
+                                                    dedup=dedup)
+
+    def permutation_test(self, trait, n_permutations: int = 1000, alternative: str = 'two-sided', seed=None,
+                         batch_size: int = 256, block_size: int = 2048, num_threads: int = 0):
+        """
+        Westfall-Young (single-step min-p) permutation test of all genes against a trait, for control of the
+        family-wise error rate over correlated genes.
+
+        The trait is shuffled among the isolates with known trait. For each permutation, the minimal p-value over all
+        genes is recorded. The adjusted p-value of a gene is the fraction of permutations, counting the observed trait
+        as one, whose minimal p-value is at most its own.
+
+        Needs memory for distinct gene counts x (positive isolates + 1) p-values, and for block_size x batch_size
+        tables per thread.
+
+        :param trait: 1-D array with one entry per isolate: 1/True (positive), 0/False (negative), NaN (unknown)
+        :param n_permutations: number of permutations of the trait
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided'); 'greater' means that the gene is
+                            associated with the positive trait
+        :param seed: seed or numpy.random.Generator for the permutations
+        :param batch_size: number of permutations computed at once
+        :param block_size: number of genes per matrix product
+        :param num_threads: number of threads (default: 0, i.e. one per CPU)
+        :return: pvalues and adjusted pvalues, arrays with one entry per gene
+        """
+        from . import fast_fisher_exact_batch
+
+        if alternative not in ('two-sided', 'less', 'greater'):
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        if n_permutations <= 0 or batch_size <= 0 or block_size <= 0:
+            raise ValueError('n_permutations, batch_size and block_size must be positive')
+        trait = np.asarray(trait)
+        positive, negative, n_positive, n_negative, all_known = self._trait_masks(trait)
+        if not self.n_genes:
+            return np.zeros(0), np.zeros(0)
+        n_known = n_positive + n_negative
+        a = self._count(positive)
+        k = self.gene_counts if all_known else a + self._count(negative)
+
+        # -log(pvalue) of every table with these margins: row i for the gene count k_unique[i], column a
+        k_unique, k_index = np.unique(k, return_inverse=True)
+        table_k = np.repeat(k_unique, n_positive + 1)
+        table_a = np.tile(np.arange(n_positive + 1), len(k_unique))
+        valid = (table_a <= table_k) & (table_k - table_a <= n_negative)
+        mln = np.full(len(table_k), -np.inf)
+        ka, aa = table_k[valid], table_a[valid]
+        mln[valid] = fast_fisher_exact_batch(aa, ka - aa, n_positive - aa, n_negative - ka + aa, alternative,
+                                             output='mln', num_threads=num_threads)
+        mln = mln.reshape(len(k_unique), n_positive + 1)
+        observed = mln[k_index, a]
+
+        known = np.flatnonzero(~np.isnan(trait)) if trait.dtype.kind == 'f' else np.arange(self.n_isolates)
+        labels = np.zeros(n_known, dtype=np.float32)
+        labels[:n_positive] = 1
+        rng = np.random.default_rng(seed)
+        dtype = np.float32 if self.n_isolates <= FLOAT32_ISOLATES else np.float64
+
+        def block_maximum(start, traits):
+            # maximal -log(pvalue) over the genes of a block, for each permutation
+            counts = (self._unpack(start, start + block_size) @ traits).astype(np.int64)
+            return mln[k_index[start:start + block_size, None], counts].max(axis=0, initial=-np.inf)
+
+        maxima = []
+        with ThreadPoolExecutor(num_threads or os.cpu_count()) as executor:
+            for done in range(0, n_permutations, batch_size):
+                batch = min(batch_size, n_permutations - done)
+                traits = np.zeros((self.n_isolates, batch), dtype=dtype)
+                traits[known] = rng.permuted(np.tile(labels, (batch, 1)), axis=1).T
+                blocks = executor.map(block_maximum, range(0, self.n_genes, block_size), repeat(traits))
+                maxima.append(np.max(list(blocks), axis=0, initial=-np.inf))
+        maxima = np.sort(np.concatenate(maxima))
+        # permutations with a minimal pvalue at most that of the gene, plus the observed one
+        exceed = n_permutations - np.searchsorted(maxima, observed, side='left')
+        return np.exp(-observed), (exceed + 1) / (n_permutations + 1)
@@ -0,0 +1,151 @@
+"""
+Fisher exact tests on table sets that are too large for one process or for memory, spread over worker processes.
+
+The inputs and results are never pickled: arrays are copied once into shared memory, and .npy files are memory-mapped
+by every worker. Each worker computes contiguous chunks and writes its results straight into the shared output, so
+the results are in input order however the chunks are scheduled.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+_ALTERNATIVES = ('two-sided', 'less', 'greater')
+_OUTPUTS = ('pvalue', 'mln', 'mlog10')
+
+# state of a worker process: input and output arrays, the shared memory blocks backing them, and the test options
+_arrays = None
+_blocks = []
+_options = None
+
+
+def _open(x):
+    """
+    :return: x as a 1-D array; paths to .npy files are memory-mapped
+    """
+    if isinstance(x, (str, os.PathLike)):
+        x = np.load(x, mmap_mode='r')
+    else:
+        x = np.asarray(x)
+    if x.ndim != 1:
+        raise ValueError('a, b, c and d must be 1-D')
+    return x
+
+
+def _share(source, array, blocks: list) -> tuple:
+    """
+    :return: picklable description of the array: its .npy file, or a new shared memory block holding a copy of it
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return 'npy', os.fspath(source), None, None
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+    return 'shm', block.name, array.shape, array.dtype.str
+
+
+def _attach(spec, mode: str = 'r'):
+    kind, where, shape, dtype = spec
+    if kind == 'npy':
+        return np.load(where, mmap_mode=mode)
+    block = SharedMemory(name=where)
+    _blocks.append(block)
+    return np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def _init_worker(specs, backend: str, alternative: str, output: str, errors: str):
+    from .backends import set_backend, warm_up
+
+    global _arrays, _options
+    set_backend(backend)
+    warm_up()
+    _arrays = [_attach(spec) for spec in specs[:4]] + [_attach(specs[4], 'r+')]
+    _options = alternative, output, errors
+
+
+def _run_chunk(bounds):
+    from . import fast_fisher_exact_batch
+
+    start, stop = bounds
+    a, b, c, d, out = _arrays
+    alternative, output, errors = _options
+    fast_fisher_exact_batch(a[start:stop], b[start:stop], c[start:stop], d[start:stop], alternative,
+                            out=out[start:stop], output=output, num_threads=1, errors=errors)
+
+
+def sharded_batch(a, b, c, d, alternative: str = 'two-sided', out=None, output: str = 'pvalue',
+                  num_workers: int = 0, chunk_size: int = 2 ** 20, errors: str = 'raise'):
+    """
+    Perform Fisher exact tests on 1-D arrays of contingency tables, spread over a pool of worker processes.
+
+    :param a: row 1 col 1 (1-D array of integers, or path to a .npy file)
+    :param b: row 1 col 2 (1-D array of integers, or path to a .npy file)
+    :param c: row 2 col 1 (1-D array of integers, or path to a .npy file)
+    :param d: row 2 col 2 (1-D array of integers, or path to a .npy file)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+    :param out: optional output array of float64, or path of a .npy file to create for the results
+    :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+    :param num_workers: number of processes (default: 0, i.e. one per CPU)
+    :param chunk_size: number of tables per task
+    :param errors: {‘raise’, ‘nan’}: raise for the first invalid table, or only set its result to NaN (default: 'raise')
+    :return: array of results, in the order of the input; a read-write memory map if out is a path
+    """
+    if alternative is None:
+        alternative = 'two-sided'
+    if alternative not in _ALTERNATIVES:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    if output not in _OUTPUTS:
+        raise ValueError("`output` should be one of {'pvalue', 'mln', 'mlog10'}")
+    if errors not in ('raise', 'nan'):
+        raise ValueError("`errors` should be one of {'raise', 'nan'}")
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+    if num_workers <= 0:
+        num_workers = os.cpu_count() or 1
+
+    sources = (a, b, c, d)
+    arrays = [_open(x) for x in sources]
+    n = len(arrays[0])
+    if any(len(x) != n for x in arrays):
+        raise ValueError('a, b, c and d must have the same length')
+    out_is_path = isinstance(out, (str, os.PathLike))
+    if out is not None and not out_is_path and len(out) != n:
+        raise ValueError('out must have the same length as the input')
+    chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+    blocks = []
+    result = None
+    try:
+        specs = [_share(source, array, blocks) for source, array in zip(sources, arrays)]
+        if out_is_path:
+            np.lib.format.open_memmap(out, mode='w+', dtype=np.float64, shape=(n,)).flush()
+            specs.append(('npy', os.fspath(out), None, None))
+        else:
+            block = SharedMemory(create=True, size=max(8 * n, 1))
+            blocks.append(block)
+            result = np.ndarray(n, np.float64, buffer=block.buf)
+            specs.append(('shm', block.name, (n,), result.dtype.str))
+
+        if chunks:
+            from .backends import backend_name
+
+            # spawn, because fork is unsafe once the OpenMP thread pool of the batch kernels has been started
+            with ProcessPoolExecutor(min(num_workers, len(chunks)), get_context('spawn'), _init_worker,
+                                     (specs, backend_name(), alternative, output, errors)) as executor:
+                for _ in executor.map(_run_chunk, chunks):
+                    pass
+
+        if out_is_path:
+            return np.load(out, mmap_mode='r+')
+        if out is None:
+            return result.copy()
+        out[:] = result
+        return out
+    finally:
+        # the views into shared memory must be gone before it can be closed
+        del result
+        for block in blocks:
+            block.close()
+            block.unlink()
@@ -0,0 +1,239 @@
+"""
+Persistent on-disk store of Fisher exact test results, for pipelines that test mostly the same tables on every run.
+
+Tables are mapped to their canonical form first (see symmetry.canonical_tables), so all eight equivalent tables share
+the same entries, keyed on (canonical table, alternative), like in FisherCache. The values are -log(pvalue).
+
+The store is a directory of sorted runs ("segments"), each made of three .npy files that are memory-mapped:
+
+    segment-000001-keys.npy      uint64 hash of each entry, sorted
+    segment-000001-tables.npy    int64 (n, 5): canonical a, b, c, d and the alternative (index in ALTERNATIVES)
+    segment-000001-mln.npy       float64 -log(pvalue)
+
+Lookups are binary searches of the hashes (np.searchsorted), verified against the stored tables, so a hash collision
+can cause a miss but never a wrong result. Bulk inserts write a new segment; once there are more than MAX_SEGMENTS,
+they are merged into one. Only one process at a time may insert, but any number may read.
+"""
+import os
+import re
+from threading import Lock
+
+import numpy as np
+
+from .symmetry import canonical_tables
+
+ALTERNATIVES = ('less', 'greater', 'two-sided')
+# segments are merged once there are more than this
+MAX_SEGMENTS = 16
+
+_SEGMENT = re.compile(r'segment-(\d+)-keys\.npy$')
+_PARTS = ('tables', 'mln', 'keys')  # written in this order, so a segment is complete once its keys exist
+
+
+def _hash(tables):
+    """
+    :return: uint64 hash of each row of a 2-D int64 array
+    """
+    with np.errstate(over='ignore'):
+        h = np.full(len(tables), 0x9E3779B97F4A7C15, dtype=np.uint64)
+        for column in tables.T:
+            h ^= column.astype(np.uint64)
+            h *= np.uint64(0xBF58476D1CE4E5B9)
+            h ^= h >> np.uint64(31)
+    return h
+
+
+class ResultStore:
+    """
+    Persistent store of -log(pvalue) per (canonical table, alternative), with bulk lookup and insert.
+    """
+
+    def __init__(self, path, max_segments: int = MAX_SEGMENTS):
+        """
+        :param path: directory of the store; it is created if it does not exist
+        :param max_segments: merge the segments once there are more than this
+        """
+        self.path = os.fspath(path)
+        self.max_segments = max_segments
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = Lock()
+        self.hits = self.misses = 0
+        self._segments = []
+        self.reload()
+
+    def _file(self, number: int, part: str) -> str:
+        return os.path.join(self.path, f'segment-{number:06d}-{part}.npy')
+
+    def reload(self):
+        """
+        Memory-map the segments on disk again, e.g. after another process has inserted entries.
+        """
+        numbers = sorted(int(match.group(1)) for match in map(_SEGMENT.match, os.listdir(self.path)) if match)
+        with self._lock:
+            self._segments = [(number,) + tuple(np.load(self._file(number, part), mmap_mode='r')
+                                                for part in ('keys', 'tables', 'mln')) for number in numbers]
+
+    def __len__(self) -> int:
+        """
+        :return: number of stored entries, counting entries stored twice in different segments twice
+        """
+        return sum(len(keys) for _, keys, _, _ in self._segments)
+
+    @staticmethod
+    def _canonical(a, b, c, d, alternative: str):
+        """
+        :return: the (n, 5) int64 array of canonical tables with their alternative, and their hashes
+        """
+        if alternative not in ALTERNATIVES:
+            raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+        a, b, c, d, swapped = canonical_tables(*(np.ravel(x) for x in (a, b, c, d)))
+        code = ALTERNATIVES.index(alternative)
+        # the left tail of a swapped table is the right tail of its canonical table
+        codes = np.where(swapped, 1 - code, code) if alternative != 'two-sided' else np.full(len(a), code)
+        tables = np.column_stack((a, b, c, d, codes)).astype(np.int64)
+        return tables, _hash(tables)
+
+    def _lookup(self, tables, keys):
+        values = np.full(len(keys), np.nan)
+        todo = np.arange(len(keys))
+        # the newest segment first
+        for _, segment_keys, segment_tables, segment_mln in reversed(self._segments):
+            if not len(todo) or not len(segment_keys):
+                continue
+            index = np.minimum(np.searchsorted(segment_keys, keys[todo]), len(segment_keys) - 1)
+            found = (segment_keys[index] == keys[todo]) & (segment_tables[index] == tables[todo]).all(axis=1)
+            values[todo[found]] = segment_mln[index[found]]
+            todo = todo[~found]
+        return values, todo
+
+    def lookup(self, a, b, c, d, alternative: str = 'two-sided'):
+        """
+        Look up many contingency tables at once.
+
+        :param a: row 1 col 1 (1-D array of integers)
+        :param b: row 1 col 2 (1-D array of integers)
+        :param c: row 2 col 1 (1-D array of integers)
+        :param d: row 2 col 2 (1-D array of integers)
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+        :return: array of -log(pvalue), NaN for the tables that are not stored
+        """
+        values, missing = self._lookup(*self._canonical(a, b, c, d, alternative))
+        self.hits += len(values) - len(missing)
+        self.misses += len(missing)
+        return values
+
+    def insert(self, a, b, c, d, alternative: str, mln):
+        """
+        Store the results of many contingency tables at once, as one new segment.
+
+        :param a: row 1 col 1 (1-D array of integers)
+        :param b: row 1 col 2 (1-D array of integers)
+        :param c: row 2 col 1 (1-D array of integers)
+        :param d: row 2 col 2 (1-D array of integers)
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’}
+        :param mln: -log(pvalue) of each table, e.g. from fast_fisher_exact_batch(..., output='mln')
+        """
+        tables, keys = self._canonical(a, b, c, d, alternative)
+        mln = np.ravel(np.asarray(mln, dtype=np.float64))
+        if len(mln) != len(keys):
+            raise ValueError('mln must have one entry per table')
+        self._insert(tables, keys, mln)
+
+    def _insert(self, tables, keys, mln):
+        if not len(keys):
+            return
+        order = np.argsort(keys, kind='stable')
+        with self._lock:
+            number = self._segments[-1][0] + 1 if self._segments else 1
+            self._write(number, keys[order], tables[order], mln[order])
+        self.reload()
+        if len(self._segments) > self.max_segments:
+            self.compact()
+
+    def _write(self, number: int, keys, tables, mln):
+        for part, array in zip(_PARTS, (tables, mln, keys)):
+            temporary = self._file(number, part) + '.tmp'
+            with open(temporary, 'wb') as f:
+                np.save(f, array)
+            os.replace(temporary, self._file(number, part))
+
+    def compact(self):
+        """
+        Merge all segments into one, dropping entries that are stored more than once.
+        """
+        with self._lock:
+            segments = self._segments
+            if len(segments) <= 1:
+                return
+            # newest first, so that the stable sort keeps the newest of equal entries in front
+            keys, tables, mln = (np.concatenate([segment[i] for segment in reversed(segments)]) for i in (1, 2, 3))
+            order = np.lexsort(tuple(tables[:, i] for i in range(4, -1, -1)) + (keys,))
+            keys, tables, mln = keys[order], tables[order], mln[order]
+            unique = np.ones(len(keys), dtype=bool)
+            unique[1:] = (keys[1:] != keys[:-1]) | (tables[1:] != tables[:-1]).any(axis=1)
+            number = segments[-1][0] + 1
+            self._write(number, keys[unique], tables[unique], mln[unique])
+            self._segments = []
+            for old, *_ in segments:
+                for part in reversed(_PARTS):
+                    os.remove(self._file(old, part))
+        self.reload()
+
+    @staticmethod
+    def _compute(tables, rows, values, num_threads: int):
+        """
+        Compute values[rows] from the canonical tables, one batch per alternative.
+        """
+        from . import fast_fisher_exact_batch
+
+        for code, alternative in enumerate(ALTERNATIVES):
+            todo = rows[tables[rows, 4] == code]
+            if len(todo):
+                values[todo] = fast_fisher_exact_batch(*(tables[todo, i] for i in range(4)), alternative,
+                                                       output='mln', num_threads=num_threads)
+
+    def mln_batch(self, a, b, c, d, alternative: str = 'two-sided', num_threads: int = 0):
+        """
+        -log(pvalue) of many contingency tables: stored results are looked up, the others are computed with
+        fast_fisher_exact_batch, each distinct table once, and stored.
+
+        :param a: row 1 col 1 (1-D array of integers)
+        :param b: row 1 col 2 (1-D array of integers)
+        :param c: row 2 col 1 (1-D array of integers)
+        :param d: row 2 col 2 (1-D array of integers)
+        :param alternative: {‘two-sided’, ‘less’, ‘greater’} (default: 'two-sided')
+        :param num_threads: number of threads (default: 0, i.e. one per CPU)
+        :return: array of -log(pvalue)
+        """
+        tables, keys = self._canonical(a, b, c, d, alternative)
+        values, missing = self._lookup(tables, keys)
+        self.hits += len(values) - len(missing)
+        self.misses += len(missing)
+        if not len(missing):
+            return values
+        _, first, inverse = np.unique(keys[missing], return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        new = missing[first]
+        self._compute(tables, new, values, num_threads)
+        values[missing] = values[new[inverse]]
+        # tables that share a hash with a different table are computed on their own, and not stored
+        self._compute(tables, missing[(tables[new[inverse]] != tables[missing]).any(axis=1)], values, num_threads)
+        self._insert(tables[new], keys[new], values[new])
+        return values
+
+    def fisher_exact_batch(self, a, b, c, d, alternative: str = 'two-sided', output: str = 'pvalue',
+                           num_threads: int = 0):
+        """
+        Like fast_fisher_exact_batch, with the results taken from the store if possible, see mln_batch.
+
+        :param output: {‘pvalue’, ‘mln’, ‘mlog10’}: p-value, -log(p-value) or -log10(p-value) (default: 'pvalue')
+        :return: array of results
+        """
+        if output not in ('pvalue', 'mln', 'mlog10'):
+            raise ValueError("`output` should be one of {'pvalue', 'mln', 'mlog10'}")
+        mln = self.mln_batch(a, b, c, d, alternative, num_threads)
+        if output == 'pvalue':
+            return np.exp(-mln)
+        if output == 'mlog10':
+            return mln / np.log(10)
+        return mln
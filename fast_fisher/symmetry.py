@@ -0,0 +1,55 @@
+import numpy as np
+
+FISHER_COMBINATIONS = ['abcd', 'acbd', 'badc', 'bdac', 'cadb', 'cdab', 'dbca', 'dcba']
+
+# These permutations keep the odds ratio, the others invert it and swap the left and right tails.
+SAME_TAILS = ['abcd', 'acbd', 'dbca', 'dcba']
+SWAPPED_TAILS = ['badc', 'bdac', 'cadb', 'cdab']
+
+SWAP_ALTERNATIVE = {'less': 'greater', 'greater': 'less', 'two-sided': 'two-sided'}
+
+
+def canonical_table(a: int, b: int, c: int, d: int) -> ((int, int, int, int), bool):
+    """
+    Eight contingency tables always give the same two-sided pvalue: ['abcd', 'acbd', 'badc', 'bdac', 'cadb', 'cdab', 'dbca', 'dcba']
+
+    Map them all to the same canonical table, i.e. the largest one in lexicographic order.
+
+    :return: (canonical table, swapped): if swapped, the left tail of the table is the right tail of the canonical table
+    """
+    same = max((a, b, c, d), (a, c, b, d), (d, b, c, a), (d, c, b, a))
+    swapped = max((b, a, d, c), (b, d, a, c), (c, a, d, b), (c, d, a, b))
+    if swapped > same:
+        return swapped, True
+    return same, False
+
+
+def canonical_tables(a, b, c, d):
+    """
+    Vectorized canonical_table for arrays of contingency tables.
+
+    :return: (a, b, c, d, swapped) of the canonical tables, as arrays
+    """
+    a, b, c, d = np.broadcast_arrays(*(np.asarray(x, dtype=np.int64) for x in (a, b, c, d)))
+    vals = {'a': a, 'b': b, 'c': c, 'd': d}
+    same = _lex_max([tuple(vals[letter] for letter in combination) for combination in SAME_TAILS])
+    swapped_tables = _lex_max([tuple(vals[letter] for letter in combination) for combination in SWAPPED_TAILS])
+    swapped = _lex_greater(swapped_tables, same)
+    return tuple(np.where(swapped, x, y) for x, y in zip(swapped_tables, same)) + (swapped,)
+
+
+def _lex_greater(x, y):
+    greater = np.zeros(x[0].shape, dtype=bool)
+    equal = np.ones(x[0].shape, dtype=bool)
+    for xi, yi in zip(x, y):
+        greater |= equal & (xi > yi)
+        equal &= xi == yi
+    return greater
+
+
+def _lex_max(tables):
+    best = tables[0]
+    for table in tables[1:]:
+        greater = _lex_greater(table, best)
+        best = tuple(np.where(greater, x, y) for x, y in zip(table, best))
+    return best
@@ -0,0 +1,185 @@
+"""
+Vectorized Fisher exact tests for the python backend, which needs no compiler.
+
+Instead of summing the tail terms of one table at a time in interpreted loops, the tails of many tables are summed
+together with NumPy: each round evaluates a block of terms per table as one array operation, and the blocks get wider
+for the tables that still need more terms. Like the scalar functions, each tail sum stops once its terms no longer
+change it, and two-sided tests find the first term of the far tail by bisection.
+
+Log-factorials come from a table that is built on demand up to LNFACT_TABLE_SIZE; larger arguments use
+scipy.special.gammaln if scipy is installed, else Stirling's series. Tables with grand totals above LARGE_TOTAL are
+left to the scalar functions of fast_fisher_python.
+"""
+from math import lgamma, log, pi
+
+import numpy as np
+
+from . import fast_fisher_python
+
+LARGE_TOTAL = fast_fisher_python.LARGE_TOTAL
+TIE_TOLERANCE = fast_fisher_python.TIE_TOLERANCE
+# log-factorials of 0 .. LNFACT_TABLE_SIZE - 1 are looked up (8 MiB)
+LNFACT_TABLE_SIZE = 2 ** 20
+# width of the first block of terms per table, and the number of terms evaluated at once
+MIN_BLOCK = 16
+BLOCK_TERMS = 2 ** 20
+CHUNK_SIZE = BLOCK_TERMS // MIN_BLOCK
+
+_ALTERNATIVES = ('two-sided', 'less', 'greater')
+_LN_2PI = log(2 * pi)
+
+# _lnfact_table[x] == lgamma(x + 1), i.e. log(x!)
+_lnfact_table = np.zeros(0)
+_gammaln = None
+
+
+def _lnfact_large(x):
+    global _gammaln
+    if _gammaln is None:
+        try:
+            from scipy.special import gammaln
+            _gammaln = lambda x: gammaln(x + 1.)
+        except ImportError:
+            _gammaln = _stirling
+    return _gammaln(x)
+
+
+def _stirling(x):
+    # accurate to double precision for x >= LNFACT_TABLE_SIZE
+    x = x.astype(float)
+    return (x + 0.5) * np.log(x) - x + 0.5 * _LN_2PI + (1. / 12 - 1. / 360 / (x * x)) / x
+
+
+def _lnfact(x):
+    """
+    :return: log(x!) of an array of non-negative integers
+    """
+    global _lnfact_table
+    x_max = x.max(initial=0)
+    size = len(_lnfact_table)
+    if x_max >= size and size < LNFACT_TABLE_SIZE:
+        new_size = min(max(x_max + 1, 2 * size, 1024), LNFACT_TABLE_SIZE)
+        new = np.fromiter((lgamma(i + 1) for i in range(size, new_size)), dtype=float, count=new_size - size)
+        _lnfact_table = np.concatenate((_lnfact_table, new))
+    table = _lnfact_table
+    if x_max < len(table):
+        return table.take(x)
+    large = x >= len(table)
+    result = table.take(np.where(large, 0, x))
+    result[large] = _lnfact_large(x[large])
+    return result
+
+
+def _lnhyper(i, ab, ac, abcd):
+    """
+    p0 - _lnhyper(i) is the log-probability of the table with a == i
+    """
+    return _lnfact(i) + _lnfact(ab - i) + _lnfact(ac - i) + _lnfact(abcd - ab - ac + i)
+
+
+def _first_tail_term(i, stop, step, ab, ac, abcd, pa):
+    """
+    Bisection for the first term that is not more likely than the observed table, see fast_fisher_python.
+    """
+    lo = np.zeros_like(i)
+    hi = (stop - i) * step
+    todo = np.flatnonzero(lo < hi)
+    while len(todo):
+        mid = (lo[todo] + hi[todo]) // 2
+        below = _lnhyper(i[todo] + mid * step[todo], ab[todo], ac[todo], abcd[todo]) < pa[todo] - TIE_TOLERANCE
+        lo[todo] = np.where(below, mid + 1, lo[todo])
+        hi[todo] = np.where(below, hi[todo], mid)
+        todo = todo[lo[todo] < hi[todo]]
+    return i + lo * step
+
+
+def _sum_tail(s, i, stop, step, ab, ac, abcd, pa, skip: bool):
+    """
+    Add exp(pa - pi) to s for i, i + step, ... (stop excluded) until s stops changing, for every table at once.
+
+    Away from the mode, the terms only get smaller. Thus, once the last term of a block does not change the sum, the
+    sum is complete. With skip, the terms more likely than the observed table are left out.
+    """
+    s = s.astype(float)
+    if skip:
+        i = _first_tail_term(i, stop, step, ab, ac, abcd, pa)
+    i = i.copy()
+    todo = np.flatnonzero((stop - i) * step > 0)
+    width = MIN_BLOCK
+    while len(todo):
+        offsets = np.arange(width)
+        j = i[todo, None] + offsets * step[todo, None]
+        inside = (stop[todo, None] - j) * step[todo, None] > 0
+        j = np.where(inside, j, i[todo, None])
+        pi = _lnhyper(j, ab[todo, None], ac[todo, None], abcd[todo, None])
+        terms = np.exp(pa[todo, None] - pi)
+        terms[~inside] = 0.
+        if skip:
+            terms[pi < pa[todo, None] - TIE_TOLERANCE] = 0.
+        total = s[todo] + terms.sum(axis=1)
+        s[todo] = total
+        i[todo] += width * step[todo]
+        done = ~inside[:, -1] | (total + terms[:, -1] == total)
+        todo = todo[~done]
+        width = max(MIN_BLOCK, min(2 * width, BLOCK_TERMS // max(len(todo), 1)))
+    return s
+
+
+def _mln_chunk(a, ab, ac, abcd, alternative: str):
+    """
+    -log(pvalue) of valid tables with a_min < a_max and grand totals up to LARGE_TOTAL
+    """
+    a_min = np.maximum(0, ab + ac - abcd)
+    a_max = np.minimum(ab, ac)
+    p0 = _lnfact(ab) + _lnfact(ac) + _lnfact(abcd - ac) + _lnfact(abcd - ab) - _lnfact(abcd)
+    pa = _lnhyper(a, ab, ac, abcd)
+    zeros, ones = np.zeros(len(a)), np.ones(len(a))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if alternative == 'two-sided':
+            right = ab * ac < a * abcd
+            mode = np.rint(ab * ac / abcd).astype(np.int64)
+            # the far tail, starting at the mode, then the near tail, starting next to a
+            st = _sum_tail(ones, np.where(right, np.minimum(a - 1, mode), np.maximum(a + 1, mode)),
+                           np.where(right, a_min - 1, a_max + 1), np.where(right, -1, 1), ab, ac, abcd, pa, True)
+            st = _sum_tail(st, np.where(right, a + 1, a - 1), np.where(right, a_max + 1, a_min - 1),
+                           np.where(right, 1, -1), ab, ac, abcd, pa, False)
+            return np.maximum(0, pa - p0 - np.log(st))
+        if alternative == 'less':
+            # sum the smaller tail: above a if a is above the mean
+            complement = ab * ac < a * abcd
+            step = np.where(complement, 1, -1)
+            stop = np.where(complement, a_max + 1, a_min - 1)
+        else:
+            complement = ab * ac > a * abcd
+            step = np.where(complement, -1, 1)
+            stop = np.where(complement, a_min - 1, a_max + 1)
+        s = _sum_tail(np.where(complement, zeros, ones), a + step, stop, step, ab, ac, abcd, pa, False)
+        return np.where(complement, -np.log(1. - np.maximum(0, np.exp(p0 - pa) * s)), np.maximum(0, pa - p0 - np.log(s)))
+
+
+def mln_tests(a, ab, ac, abcd, alternative: str):
+    """
+    -log(pvalue) of many contingency tables, given as a, a+b, a+c, a+b+c+d.
+
+    :param a: row 1 col 1 (1-D int64 array)
+    :param ab: row 1 sum (1-D int64 array)
+    :param ac: col 1 sum (1-D int64 array)
+    :param abcd: grand total (1-D int64 array)
+    :param alternative: {‘two-sided’, ‘less’, ‘greater’}
+    :return: array of -log(pvalue); all tables must be valid, see fast_fisher_python.table_status
+    """
+    if alternative not in _ALTERNATIVES:
+        raise ValueError("`alternative` should be one of {'two-sided', 'less', 'greater'}")
+    result = np.zeros(len(a))
+    # tables with only one possible value of a have pvalue 1
+    rows = np.flatnonzero(np.maximum(0, ab + ac - abcd) < np.minimum(ab, ac))
+    large = rows[abcd[rows] > LARGE_TOTAL]
+    rows = rows[abcd[rows] <= LARGE_TOTAL]
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        result[chunk] = _mln_chunk(a[chunk], ab[chunk], ac[chunk], abcd[chunk], alternative)
+    scalar = {'two-sided': fast_fisher_python.mlnTest2t, 'less': fast_fisher_python.mlnTest2l,
+              'greater': fast_fisher_python.mlnTest2r}[alternative]
+    for row in large.tolist():
+        result[row] = scalar(int(a[row]), int(ab[row]), int(ac[row]), int(abcd[row]))
+    return result
@@ -1,13 +1,23 @@
 # based on https://realpython.com/pypi-publish-python-package
+import sys
 import pathlib
-from setuptools import setup
+from setuptools import setup, Extension
 from Cython.Build import cythonize
 import Cython.Compiler.Options as CO
+import numpy
 
 from fast_fisher import __version__
 
 CO.extra_compile_args = ['-O3', '-ffast-math', '-march=native']
 
+# OpenMP is used for the parallel batch functions. Without it, they simply run on one thread.
+if sys.platform == 'win32':
+    OPENMP_ARGS = ['/openmp'], []
+elif sys.platform == 'darwin':
+    OPENMP_ARGS = [], []  # Apple clang ships without OpenMP
+else:
+    OPENMP_ARGS = ['-fopenmp'], ['-fopenmp']
+
 # The directory containing this file
 HERE = pathlib.Path(__file__).parent
 
@@ -32,6 +42,17 @@ if __name__ == '__main__':
             'Programming Language :: Python :: 3.10',
         ],
         packages=['fast_fisher'],
-        install_requires=[],  # development: numba
-        ext_modules=cythonize('fast_fisher/fast_fisher_cython.pyx', language_level=3)
+        # fast_fisher_cython.pxd lets other extensions cimport the C kernels
+        package_data={'fast_fisher': ['*.pxd']},
+        install_requires=['numpy'],  # development: numba
+        ext_modules=cythonize(
+            Extension(
+                'fast_fisher.fast_fisher_cython',
+                ['fast_fisher/fast_fisher_cython.pyx'],
+                include_dirs=[numpy.get_include()],
+                extra_compile_args=OPENMP_ARGS[0],
+                extra_link_args=OPENMP_ARGS[1],
+            ),
+            language_level=3
+        )
     )
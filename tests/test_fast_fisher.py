@@ -1,5 +1,12 @@
 from .utils import *
 
+from math import comb, log
+from random import choice
+
+from fast_fisher import AsyncFisher, FisherCache, FixedMargins, PresenceAbsence, ResultStore, enable_cache, disable_cache, cache_info, is_significant, is_significant_batch, \
+    sharded_batch, table_status, STATUS_OK, STATUS_INVALID, STATUS_OVERFLOW
+from fast_fisher.symmetry import canonical_table
+
 
 class TestFisher(TestCase):
     def _test(self, function: Callable, name: str, table, scipy_l, scipy_r, scipy_t):
@@ -102,7 +109,8 @@ class TestFisher(TestCase):
 
     def test_swap(self, alternative='two-sided'):
         """
-        Unlike in scipy's implementation, swapping can produce minor differences (~ 0.6 % in this test)
+        Swapping does not change the pvalue, as in scipy's implementation. (Before ties were detected with a
+        tolerance, swapping produced minor differences in ~ 0.6 % of these tables.)
         """
         all_combinations = list(combinations(range(20), 4))
         not_identical = 0
@@ -117,6 +125,7 @@ class TestFisher(TestCase):
                 not_identical_min_pval = min(not_identical_min_pval, orig_p, swap_p)
 
         print(f'{not_identical=} out of {len(all_combinations)}; {not_identical_min_pval=}')
+        self.assertEqual(not_identical, 0)
 
     def test_ranking_preserved_naive(self, alternative='two-sided'):
         """
@@ -172,3 +181,931 @@ class TestFisher(TestCase):
             self.assertTrue(is_equivalent(or_orig, or_calc), msg=f'{or_orig=} != {or_calc=}; {[[a, b], [c, d]]}')
 
         print(f'{n_not_equal=} out of {n_range}')
+
+    def test_array(self, samples=1000):
+        """
+        The vectorized functions agree with the scalar ones, broadcast their inputs and honour out=
+        """
+        tables = np.array([[randint(0, 200) for _ in range(4)] for _ in range(samples)])
+        a, b, c, d = tables.T
+        for alternative in ['two-sided', 'less', 'greater']:
+            pvals = fast_fisher_exact_array(a, b, c, d, alternative)
+            for table, pval in zip(tables, pvals):
+                self.assertEqual(pval, fast_fisher_exact(*(int(v) for v in table), alternative), msg=f'{table=}')
+
+        out = np.empty((2, samples))
+        result = fast_fisher_exact_array(a, b, c, [[0], [5]], out=out)
+        self.assertIs(result, out)
+        self.assertEqual(out[1, 0], fast_fisher_exact(int(a[0]), int(b[0]), int(c[0]), 5))
+
+        odds = odds_ratio_array(a, b, c, d)
+        for table, odd in zip(tables, odds):
+            self.assertTrue(is_equivalent(odd, fast_fisher_cython.odds_ratio(*table)), msg=f'{table=}')
+
+        with self.assertRaises(ValueError):
+            fast_fisher_exact_array([1, -1], 2, 3, 4)
+
+    def test_batch(self, samples=1000):
+        """
+        The multithreaded batch function gives exactly the same results as the scalar functions
+        """
+        a, b, c, d = np.array([[randint(0, 200) for _ in range(4)] for _ in range(samples)]).T
+        for alternative, function in [('two-sided', fast_fisher_cython.test1t),
+                                      ('less', fast_fisher_cython.test1l),
+                                      ('greater', fast_fisher_cython.test1r)]:
+            pvals = fast_fisher_exact_batch(a, b, c, d, alternative, num_threads=4)
+            mlog10 = fast_fisher_exact_batch(a, b, c, d, alternative, output='mlog10', num_threads=4)
+            for table, pval, mlog in zip(zip(a, b, c, d), pvals, mlog10):
+                table = tuple(int(v) for v in table)
+                self.assertEqual(pval, function(*table), msg=f'{table=}')
+                self.assertAlmostEqual(mlog, -np.log10(pval), msg=f'{table=}')
+
+        with self.assertRaises(ValueError):
+            fast_fisher_exact_batch([1, 2], [1, 1], [1, 1], [-5, 1])
+
+    def test_lnfact_table(self, samples=300):
+        """
+        The log-factorial table gives exactly the same results as lgamma, and respects its memory budget
+        """
+        tables = [tuple(randint(0, 3000) for _ in range(4)) for _ in range(samples)]
+        for module in (fast_fisher_cython, fast_fisher_python, fast_fisher_numba):
+            expected = [module.test1(*table) for table in tables]
+            try:
+                module.enable_lnfact_table()
+                self.assertEqual(expected, [module.test1(*table) for table in tables])
+                self.assertGreaterEqual(module.lnfact_table_size(), max(sum(table) for table in tables))
+
+                module.enable_lnfact_table(max_bytes=2 ** 12)
+                self.assertLess(module.lnfact_table_size(), 2 ** 12 / 8)
+                self.assertEqual(expected, [module.test1(*table) for table in tables])
+            finally:
+                module.disable_lnfact_table()
+            self.assertEqual(module.lnfact_table_size(), -1)
+
+        # arguments outside the table, including negative ones, fall back to lgamma
+        table = fast_fisher_numba.grow_lnfact_table(fast_fisher_numba.NO_TABLE, 16)
+        for x in (-3, 5, 20):
+            self.assertEqual(fast_fisher_numba.lngamma(x, table), fast_fisher_numba.lngamma(x, fast_fisher_numba.NO_TABLE))
+
+        # numba batches use the table too, grown for their largest grand total
+        a, b, c, d = np.array(tables).T.copy()
+        expected = fast_fisher_numba.fisher_exact_batch(a, b, c, d)
+        try:
+            fast_fisher_numba.enable_lnfact_table()
+            np.testing.assert_array_equal(fast_fisher_numba.fisher_exact_batch(a, b, c, d), expected)
+            self.assertGreaterEqual(fast_fisher_numba.lnfact_table_size(), max(a + b + c + d))
+        finally:
+            fast_fisher_numba.disable_lnfact_table()
+
+    def test_recurrence(self, samples=300):
+        """
+        The term-ratio recurrence agrees with the lgamma summation up to rounding errors, in cython and numba
+        """
+        tables = [tuple(int(10 ** (random() * 4.5)) for _ in range(4)) for _ in range(samples)]
+        expected = [fast_fisher_cython.test1(*table) for table in tables]
+        try:
+            fast_fisher_cython.enable_recurrence(anchor=16)
+            for table, pvals in zip(tables, expected):
+                for pval, pval_recurrence in zip(pvals, fast_fisher_cython.test1(*table)):
+                    self.assertTrue(isclose(pval, pval_recurrence, rel_tol=1e-8), msg=f'{table=}')
+        finally:
+            fast_fisher_cython.disable_recurrence()
+        try:
+            fast_fisher_numba.enable_recurrence(anchor=16)
+            for table, pvals in zip(tables, expected):
+                for pval, pval_recurrence in zip(pvals, fast_fisher_numba.test1(*table)):
+                    self.assertTrue(isclose(pval, pval_recurrence, rel_tol=1e-8), msg=f'{table=}')
+            # the batches use the same summation mode
+            np.testing.assert_array_equal(fast_fisher_numba.fisher_exact_batch(*np.array(tables).T.copy()),
+                                          [fast_fisher_numba.test1t(*table) for table in tables])
+        finally:
+            fast_fisher_numba.disable_recurrence()
+        with self.assertRaises(ValueError):
+            fast_fisher_numba.enable_recurrence(anchor=0)
+
+        # the switch of the current backend
+        import fast_fisher
+        from fast_fisher import set_backend
+
+        try:
+            for name in ('cython', 'numba'):
+                set_backend(name)
+                try:
+                    fast_fisher.enable_recurrence(anchor=16)
+                    self.assertTrue(isclose(fast_fisher_exact(*tables[0]), expected[0][2], rel_tol=1e-8), msg=name)
+                finally:
+                    fast_fisher.disable_recurrence()
+            set_backend('python')
+            with self.assertRaises(NotImplementedError):
+                fast_fisher.enable_recurrence()
+            fast_fisher.disable_recurrence()
+        finally:
+            set_backend('auto')
+
+    def test_skewed_two_sided(self):
+        """
+        The cutoff in the opposite tail of two-sided tests is found by bisection; check skewed tables against scipy
+        """
+        for table in [(10000, 100, 1000, 100000), (100, 10000, 100000, 1000), (30, 1, 5, 900), (1, 300, 200, 20)]:
+            for function in (fast_fisher_cython.test1, fast_fisher_python.test1):
+                l, r, t = function(*table)
+                self.assertAlmostEqual(t, scipy_fisher_exact(*table, 'two-sided'), msg=f'{table=}')
+                self.assertLessEqual(t, min(1., 2 * min(l, r)) * (1 + 1e-9), msg=f'{table=}')
+
+    def test_cache(self):
+        """
+        The cache maps equivalent tables to one entry, swaps the tails where needed and evicts the oldest entries
+        """
+        for table in combinations(range(8), 4):
+            self.assertEqual(canonical_table(*table)[0], fisher_swap(*table))
+
+        cache = FisherCache(fast_fisher_python, maxsize=3)
+        self.assertEqual(cache.mlnTest1(8, 2, 1, 5), fast_fisher_python.mlnTest1(8, 2, 1, 5))
+        self.assertEqual(cache.mlnTest1(2, 8, 5, 1), fast_fisher_python.mlnTest1(2, 8, 5, 1))
+        self.assertEqual(cache.test1l(5, 1, 2, 8), fast_fisher_python.test1l(5, 1, 2, 8))
+        # one hit or miss per call, like functools.lru_cache
+        self.assertEqual(cache.cache_info(), (2, 1, 0, 3, 3))
+        cache.test1t(1, 2, 3, 4)
+        self.assertEqual(cache.cache_info(), (2, 2, 1, 3, 3))
+
+        # the three tails do not fit, but do not evict each other
+        cache = FisherCache(fast_fisher_python, maxsize=2)
+        for _ in range(2):
+            self.assertEqual(cache.mlnTest1(8, 2, 1, 5), fast_fisher_python.mlnTest1(8, 2, 1, 5))
+        self.assertEqual(cache.test1t(8, 2, 1, 5), fast_fisher_python.test1t(8, 2, 1, 5))
+        self.assertEqual(cache.cache_info(), (1, 2, 0, 2, 2))
+
+        try:
+            enable_cache(maxsize=10000)
+            for table in product(range(6), repeat=4):
+                for alternative in ['two-sided', 'less', 'greater']:
+                    self.assertTrue(isclose(fast_fisher_exact(*table, alternative),
+                                            fast_fisher_cython.fisher_exact(*table, alternative)), msg=f'{table=}')
+            info = cache_info()
+            self.assertGreater(info.hits, 4 * info.misses)
+            self.assertEqual(info.currsize, info.misses)
+        finally:
+            disable_cache()
+        self.assertIsNone(cache_info())
+
+    def test_batch_dedup(self, samples=5000):
+        """
+        Deduplicating the tables before the batch computation does not change the results, for small and large counts
+        """
+        for range_max in (6, 10 ** 5):
+            a, b, c, d = np.array([[randint(0, range_max) for _ in range(4)] for _ in range(samples)]).T
+            for alternative in ['two-sided', 'less', 'greater']:
+                expected = fast_fisher_exact_batch(a, b, c, d, alternative, output='mln')
+                out = np.empty(samples)
+                dedup = fast_fisher_exact_batch(a, b, c, d, alternative, out=out, output='mln', dedup=True)
+                self.assertIs(dedup, out)
+                np.testing.assert_allclose(dedup, expected, rtol=1e-8, atol=1e-8)
+
+    def test_fixed_margins(self, samples=100):
+        """
+        All tables with the same margins, at once, agree with the scalar functions and scipy
+        """
+        for _ in range(samples):
+            ab, ac = randint(0, 200), randint(0, 200)
+            abcd = max(ab, ac) + randint(0, 200)
+            margins = FixedMargins(ab, ac, abcd)
+            a = np.arange(margins.a_min, margins.a_max + 1)
+            l, r, t = margins.mlnTest2(a)
+            self.assertAlmostEqual(np.exp(margins.lnpmf).sum(), 1.)
+            for i in a:
+                table = (int(i), ab - int(i), ac - int(i), abcd - ab - ac + int(i))
+                expected = fast_fisher_cython.mlnTest1(*table)
+                np.testing.assert_allclose((l[i - margins.a_min], r[i - margins.a_min], t[i - margins.a_min]),
+                                           expected, rtol=1e-9, atol=1e-9, err_msg=f'{table=}')
+            i = randint(margins.a_min, margins.a_max)
+            table = (i, ab - i, ac - i, abcd - ab - ac + i)
+            self.assertAlmostEqual(margins.test2t(i), scipy_fisher_exact(*table, 'two-sided'), msg=f'{table=}')
+
+        self.assertRaises(ValueError, FixedMargins, 5, 11, 10)
+        self.assertRaises(ValueError, FixedMargins(5, 5, 10).test2l, 6)
+
+    def test_is_significant(self, samples=1000):
+        """
+        Threshold decisions agree with the pvalues, unless alpha is within rounding errors of the pvalue
+        """
+        for range_max in (20, 10 ** 5):
+            a, b, c, d = np.array([[randint(0, range_max) for _ in range(4)] for _ in range(samples)]).T
+            for alternative in ['two-sided', 'less', 'greater']:
+                pvalues = fast_fisher_exact_batch(a, b, c, d, alternative)
+                for alpha in (1e-10, 0.05, 0.5):
+                    expected = pvalues < alpha
+                    clear = np.abs(pvalues - alpha) > 1e-9 * alpha
+                    decisions = is_significant_batch(a, b, c, d, alpha, alternative)
+                    self.assertTrue(np.all((decisions == expected)[clear]), msg=f'{alternative=} {alpha=}')
+                    for i in range(50):
+                        table = int(a[i]), int(b[i]), int(c[i]), int(d[i])
+                        if clear[i]:
+                            self.assertEqual(is_significant(*table, alpha, alternative), expected[i], msg=f'{table=}')
+                            self.assertEqual(fast_fisher_python.is_significant(*table, alpha, alternative),
+                                             expected[i], msg=f'{table=}')
+                            self.assertEqual(fast_fisher_numba.is_significant(*table, alpha, alternative),
+                                             expected[i], msg=f'{table=}')
+                    # the numba kernels are ports of the cython ones
+                    np.testing.assert_array_equal(fast_fisher_numba.is_significant_batch(a, b, c, d, alpha, alternative),
+                                                  decisions, err_msg=f'{alternative=} {alpha=}')
+
+        # just above and below the pvalue
+        for table in [(8, 2, 1, 5), (100, 3000, 2000, 20), (1, 300, 200, 20), (10000, 100, 1000, 100000)]:
+            for alternative in ['two-sided', 'less', 'greater']:
+                pvalue = fast_fisher_exact(*table, alternative)
+                if 1e-300 < pvalue < 1:
+                    self.assertTrue(is_significant(*table, pvalue * (1 + 1e-6), alternative), msg=f'{table=}')
+                    self.assertFalse(is_significant(*table, pvalue * (1 - 1e-6), alternative), msg=f'{table=}')
+
+        self.assertRaises(ValueError, is_significant, 1, 2, 3, 4, 0.)
+        self.assertRaises(ValueError, is_significant, -1, 2, 3, 4, 0.05)
+        self.assertRaises(ValueError, is_significant_batch, [1, -1], [2, 2], [3, 3], [4, 4], 0.05)
+
+    def test_large_totals(self, samples=30):
+        """
+        Above 2 ** 24, all backends switch to the large-total mode; check it against exact rational arithmetic
+        """
+        def exact_mln(a, b, c, d):
+            ab, ac, abcd = a + b, a + c, a + b + c + d
+            a_min = max(0, ab + ac - abcd)
+            terms = [comb(ac, i) * comb(abcd - ac, ab - i) for i in range(a_min, min(ab, ac) + 1)]
+            pa = terms[a - a_min]
+            two_sided = sum(t for t in terms if t * 10 ** 7 <= pa * (10 ** 7 + 1))
+            total = comb(abcd, ab)
+            return tuple(log(total) - log(s) for s in (sum(terms[:a - a_min + 1]), sum(terms[a - a_min:]), two_sided))
+
+        for exponent in (8, 12, 15):
+            for _ in range(samples):
+                abcd = randint(10 ** exponent, 2 ** 53)
+                ab = randint(1, 200)
+                a = randint(0, ab)
+                c = min(choice([randint(0, 300), randint(0, abcd // 3)]), abcd - ab)
+                table = (a, ab - a, c, abcd - ab - c)
+                expected = exact_mln(*table)
+                for function in (fast_fisher_cython.mlnTest1, fast_fisher_python.mlnTest1, fast_fisher_numba.mlnTest1):
+                    np.testing.assert_allclose(function(*table), expected, rtol=1e-10, atol=1e-10, err_msg=f'{table=}')
+
+        self.assertAlmostEqual(fast_fisher_cython.mlog10Test1t(100, 1, 10, 10 ** 15), 1326.3545240142)
+        for function in (fast_fisher_cython.mlnTest1t, fast_fisher_python.mlnTest1t, fast_fisher_numba.mlnTest1t):
+            self.assertRaises(OverflowError, function, 1, 2, 3, 2 ** 53)
+
+    def test_cli(self, samples=1000):
+        """
+        The command-line tool streams tables from files in chunks and writes the same results as the batch function
+        """
+        import io
+        from tempfile import TemporaryDirectory
+        from unittest.mock import patch
+        from fast_fisher.__main__ import main
+
+        a, b, c, d = np.array([[randint(0, 100) for _ in range(4)] for _ in range(samples)]).T
+        with TemporaryDirectory() as tmp:
+            path_abcd, path_margins, path_out = f'{tmp}/abcd.tsv', f'{tmp}/margins.tsv', f'{tmp}/out.tsv'
+            with open(path_abcd, 'w') as f:
+                f.write('id\ta\tb\tc\td\n')
+                f.writelines(f'row{i}\t{a[i]}\t{b[i]}\t{c[i]}\t{d[i]}\n' for i in range(samples))
+            with open(path_margins, 'w') as f:
+                f.writelines(f'{a[i]},{a[i] + b[i]},{a[i] + c[i]},{a[i] + b[i] + c[i] + d[i]}\n' for i in range(samples))
+
+            for alternative in ['two-sided', 'less', 'greater']:
+                expected = fast_fisher_exact_batch(a, b, c, d, alternative)
+
+                main([path_abcd, '-o', path_out, '--header', '--columns', '2,3,4,5', '--chunk-size', '100',
+                      '--alternative', alternative])
+                result = pd.read_csv(path_out, sep='\t')
+                self.assertEqual(list(result.columns), ['id', 'a', 'b', 'c', 'd', 'pvalue', 'mlog10', 'odds_ratio'])
+                np.testing.assert_allclose(result.pvalue, expected, rtol=1e-12)
+                np.testing.assert_allclose(result.mlog10, -np.log10(expected), rtol=1e-9, atol=1e-12)
+                np.testing.assert_allclose(result.odds_ratio, odds_ratio_array(a, b, c, d), rtol=1e-12)
+
+                main([path_margins, '-o', path_out, '--margins', '-d', ',', '--only-results', '--output-columns',
+                      'pvalue', '--alternative', alternative])
+                result = np.loadtxt(path_out)
+                np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+            # invalid tables get NaN and are counted, unless --strict
+            with open(path_abcd, 'a') as f:
+                f.write('row\t1\t-2\t3\t4\n')
+            with patch('sys.stderr', new_callable=io.StringIO) as stderr:
+                main([path_abcd, '-o', path_out, '--header', '--columns', '2,3,4,5', '--output-columns',
+                      'pvalue,odds_ratio,status'])
+            self.assertIn('1 invalid tables', stderr.getvalue())
+            result = pd.read_csv(path_out, sep='\t')
+            np.testing.assert_allclose(result.pvalue[:samples], fast_fisher_exact_batch(a, b, c, d), rtol=1e-12)
+            self.assertTrue(np.isnan(result.pvalue.iloc[-1]) and np.isnan(result.odds_ratio.iloc[-1]))
+            self.assertEqual(list(result.status), [STATUS_OK] * samples + [STATUS_INVALID])
+            self.assertRaises(SystemExit, main, [path_abcd, '-o', path_out, '--header', '--columns', '2,3,4,5',
+                                                 '--strict'])
+
+            with open(path_abcd, 'a') as f:
+                f.write('row\t1\t2\tx\t4\n')
+            self.assertRaises(SystemExit, main, [path_abcd, '-o', path_out, '--header', '--columns', '2,3,4,5'])
+
+            # stdin is not closed after the first '-'
+            stdin = io.StringIO(''.join(f'{a[i]} {b[i]} {c[i]} {d[i]}\n' for i in range(10)))
+            with patch('sys.stdin', stdin):
+                main(['-', '-', '--only-results', '--output-columns', 'pvalue', '-o', path_out])
+            self.assertFalse(stdin.closed)
+            np.testing.assert_allclose(np.loadtxt(path_out), fast_fisher_exact_batch(a[:10], b[:10], c[:10], d[:10]),
+                                       rtol=1e-12)
+
+    def test_sharded_batch(self, samples=10000):
+        """
+        Worker processes with shared memory or memory-mapped .npy files return the results of the batch, in order
+        """
+        import os
+        from tempfile import TemporaryDirectory
+
+        a, b, c, d = np.array([[randint(0, 1000) for _ in range(4)] for _ in range(samples)]).T
+        for alternative in ['two-sided', 'less', 'greater']:
+            expected = fast_fisher_exact_batch(a, b, c, d, alternative, output='mln')
+            result = sharded_batch(a, b, c, d, alternative, output='mln', num_workers=2, chunk_size=999)
+            np.testing.assert_array_equal(result, expected)
+
+        with TemporaryDirectory() as tmp:
+            paths = [f'{tmp}/{name}.npy' for name in 'abcd']
+            for x, path in zip((a, b, c, d), paths):
+                np.save(path, x.astype(np.int32))
+            result = sharded_batch(*paths, out=f'{tmp}/out.npy', num_workers=2, chunk_size=3000)
+            self.assertIsInstance(result, np.memmap)
+            np.testing.assert_array_equal(result, fast_fisher_exact_batch(a, b, c, d))
+            del result
+
+        out = np.empty(samples)
+        self.assertIs(sharded_batch(a, b, c, d, out=out, chunk_size=5000), out)
+        self.assertEqual(len(sharded_batch([], [], [], [])), 0)
+        self.assertRaises(ValueError, sharded_batch, [1, -1], [2, 2], [3, 3], [4, 4], chunk_size=1)
+        self.assertRaises(ValueError, sharded_batch, [1, 1], [2], [3, 3], [4, 4])
+
+    def test_batch_memmap(self, samples=10000):
+        """
+        Batches take int32 memory maps without copying, write into memory-mapped outputs and work in chunks
+        """
+        import os
+        from tempfile import TemporaryDirectory
+
+        a, b, c, d = np.array([[randint(0, 1000) for _ in range(4)] for _ in range(samples)]).T
+        expected = fast_fisher_exact_batch(a, b, c, d, output='mln')
+        with TemporaryDirectory() as tmp:
+            inputs = []
+            for name, x in zip('abcd', (a, b, c, d)):
+                np.save(f'{tmp}/{name}.npy', x.astype(np.int32))
+                inputs.append(np.load(f'{tmp}/{name}.npy', mmap_mode='r'))
+            out = np.lib.format.open_memmap(f'{tmp}/out.npy', mode='w+', dtype=np.float64, shape=(samples,))
+            result = fast_fisher_exact_batch(*inputs, out=out, output='mln', chunk_size=999)
+            self.assertIs(result, out)
+            np.testing.assert_array_equal(out, expected)
+            np.testing.assert_array_equal(fast_fisher_cython.fisher_exact_batch(*inputs, output='mln'), expected)
+            del result, out
+
+            significant = is_significant_batch(*inputs, 0.05, chunk_size=999)
+            np.testing.assert_array_equal(significant, is_significant_batch(a, b, c, d, 0.05))
+            del inputs
+
+        # other and mixed integer types are converted chunk by chunk
+        small = [x.astype(np.int16) for x in (a, b, c, d)]
+        np.testing.assert_array_equal(fast_fisher_exact_batch(*small, output='mln', chunk_size=999), expected)
+        mixed = [a.astype(np.int32), b, c.astype(np.uint16), d]
+        np.testing.assert_array_equal(fast_fisher_exact_batch(*mixed, output='mln', chunk_size=999), expected)
+
+        # invalid tables raise only after all chunks have been computed
+        a_invalid = a.copy()
+        a_invalid[0] = -1
+        out = np.zeros(samples)
+        self.assertRaises(ValueError, fast_fisher_exact_batch, a_invalid, b, c, d, out=out, output='mln', chunk_size=999)
+        np.testing.assert_array_equal(out[999:], expected[999:])
+
+        # invalid arguments raise right away, without going on to the next chunk
+        from fast_fisher import chunked_batch
+
+        calls = []
+
+        def batch_function(*args, **kwargs):
+            calls.append(args)
+            return fast_fisher_cython.fisher_exact_batch(*args, **kwargs)
+
+        for alternative, kwargs in [('both', {}), ('less', {'errors': 'ignore'}),
+                                    ('less', {'out': np.zeros(samples, dtype=np.int64)})]:
+            calls.clear()
+            self.assertRaises(ValueError, chunked_batch, batch_function, a, b, c, d, alternative, chunk_size=999,
+                              **kwargs)
+            self.assertEqual(len(calls), 1)
+
+    def test_batch_errors(self, samples=1000):
+        """
+        With errors='nan', invalid tables get NaN (or False) and a status code, and all other tables are computed
+        """
+        a, b, c, d = np.array([[randint(0, 100) for _ in range(4)] for _ in range(samples)]).T.copy()
+        expected_status = np.full(samples, STATUS_OK, dtype=np.int8)
+        for i in range(0, samples, 7):
+            x = choice((a, b, c, d))
+            x[i] = -randint(1, 5)
+            expected_status[i] = STATUS_INVALID
+        for i in range(3, samples, 11):
+            if expected_status[i] == STATUS_OK:
+                d[i] = 2 ** 53
+                expected_status[i] = STATUS_OVERFLOW
+        valid = expected_status == STATUS_OK
+        a_valid, b_valid, c_valid, d_valid = (x[valid] for x in (a, b, c, d))
+
+        for backend in (fast_fisher_cython, fast_fisher_python):
+            np.testing.assert_array_equal(backend.table_status(a, b, c, d), expected_status)
+        np.testing.assert_array_equal(table_status(a, b, c, d, chunk_size=100), expected_status)
+
+        for alternative in ['two-sided', 'less', 'greater']:
+            expected = fast_fisher_exact_batch(a_valid, b_valid, c_valid, d_valid, alternative)
+            for batch in (fast_fisher_cython.fisher_exact_batch, fast_fisher_python.fisher_exact_batch):
+                status = np.empty(samples, dtype=np.int8)
+                result = batch(a, b, c, d, alternative, errors='nan', status=status)
+                np.testing.assert_array_equal(status, expected_status)
+                self.assertTrue(np.all(np.isnan(result[~valid])))
+                np.testing.assert_allclose(result[valid], expected, rtol=1e-9)
+
+            status = np.empty(samples, dtype=np.int8)
+            result = fast_fisher_exact_batch(a, b, c, d, alternative, errors='nan', status=status, chunk_size=100)
+            np.testing.assert_array_equal(status, expected_status)
+            np.testing.assert_array_equal(result[valid], expected)
+            result = fast_fisher_exact_batch(a, b, c, d, alternative, errors='nan', dedup=True)
+            np.testing.assert_allclose(result[valid], expected, rtol=1e-9)
+
+            significant = is_significant_batch(a, b, c, d, 0.05, alternative, errors='nan', chunk_size=100)
+            self.assertFalse(significant[~valid].any())
+            np.testing.assert_array_equal(significant[valid],
+                                          is_significant_batch(a_valid, b_valid, c_valid, d_valid, 0.05, alternative))
+
+            # the default still raises, but only after all valid tables have been written
+            out = np.zeros(samples)
+            self.assertRaises(ValueError, fast_fisher_exact_batch, a, b, c, d, alternative, out=out, chunk_size=100)
+            np.testing.assert_array_equal(out[valid], expected)
+
+        self.assertRaises(ValueError, fast_fisher_exact_batch, a, b, c, d, errors='ignore')
+
+        # counts near the int64 limit must not wrap around when summed into the margins
+        huge = [(0, 2 ** 62, 2 ** 62, 2 ** 62), (2 ** 63 - 1, 1, 0, 0), (2 ** 62, 2 ** 62, 0, 0), (1, 2 ** 53, 0, 0)]
+        columns = [np.array(x, dtype=np.int64) for x in zip(*huge)]
+        for backend in (fast_fisher_cython, fast_fisher_python, fast_fisher_numba):
+            name = backend.__name__
+            np.testing.assert_array_equal(backend.table_status(*columns), STATUS_OVERFLOW, err_msg=name)
+            status = np.empty(len(huge), dtype=np.int8)
+            self.assertTrue(np.isnan(backend.fisher_exact_batch(*columns, errors='nan', status=status)).all(), msg=name)
+            np.testing.assert_array_equal(status, STATUS_OVERFLOW, err_msg=name)
+            self.assertFalse(backend.is_significant_batch(*columns, 0.05, errors='nan').any(), msg=name)
+            self.assertRaises(OverflowError, backend.fisher_exact_batch, *columns)
+            for table in huge:
+                for function in (backend.test1, backend.mlnTest1t, backend.test1l, backend.mlog10Test1r):
+                    self.assertRaises(OverflowError, function, *table)
+                self.assertRaises(OverflowError, backend.is_significant, *table, 0.05)
+        for ufunc in (fast_fisher_cython.mlnTest1t_ufunc, fast_fisher_cython.test1l_ufunc):
+            self.assertRaises(OverflowError, ufunc, *columns)
+
+    def test_stats(self, samples=1000):
+        """
+        The instrumentation counts the calls and tail sums of every alternative, also in parallel batches
+        """
+        # positive counts are never degenerate, only the rows set below are
+        a, b, c, d = np.array([[randint(1, 1000) for _ in range(4)] for _ in range(samples)]).T.copy()
+        a[:10] = -1
+        a[10:20] = b[10:20] = 0
+        d[20:30] = 10 ** 9
+        fast_fisher_cython.enable_stats()
+        try:
+            fast_fisher_cython.reset_stats()
+            for alternative in ['two-sided', 'less', 'greater']:
+                fast_fisher_cython.fisher_exact_batch(a, b, c, d, alternative, errors='nan', num_threads=4)
+            for table in zip(a[10:].tolist(), b[10:].tolist(), c[10:].tolist(), d[10:].tolist()):
+                fast_fisher_cython.mlnTest1(*table)
+            stats = fast_fisher_cython.get_stats()
+        finally:
+            fast_fisher_cython.disable_stats()
+
+        for kind, sums_per_call in (('less', 1), ('greater', 1), ('two-sided', 2), ('all', 2)):
+            counts = stats[kind]
+            self.assertEqual(counts['calls'], samples - (10 if kind == 'all' else 0), msg=kind)
+            self.assertEqual(counts['invalid'], 0 if kind == 'all' else 10, msg=kind)
+            self.assertEqual(counts['degenerate'], 10, msg=kind)
+            self.assertEqual(counts['large_total'], 10, msg=kind)
+            computed = counts['calls'] - counts['invalid'] - counts['degenerate']
+            self.assertEqual(counts['converged'] + counts['exhausted'], sums_per_call * computed, msg=kind)
+            self.assertGreater(counts['terms'], computed, msg=kind)
+            self.assertGreater(counts['evaluations'], computed, msg=kind)
+            self.assertGreater(counts['nanoseconds'], 0, msg=kind)
+        self.assertGreater(stats['two-sided']['skipped'], 0)
+
+        # nothing is counted while disabled, and reset_stats starts over
+        fast_fisher_cython.mlnTest1(1, 2, 3, 4)
+        self.assertEqual(fast_fisher_cython.get_stats(), stats)
+        fast_fisher_cython.reset_stats()
+        self.assertFalse(any(any(counts.values()) for counts in fast_fisher_cython.get_stats().values()))
+
+        # through the registry: the other backends count nothing, and cannot be asked to
+        import fast_fisher
+        from fast_fisher import set_backend
+
+        try:
+            for name in ('python', 'numba'):
+                set_backend(name)
+                with self.assertRaises(NotImplementedError, msg=name):
+                    fast_fisher.enable_stats()
+                fast_fisher.reset_stats()
+                fast_fisher.disable_stats()
+                self.assertIsNone(fast_fisher.get_stats(), msg=name)
+            set_backend('cython')
+            fast_fisher.enable_stats()
+            try:
+                fast_fisher_exact(1, 2, 3, 4)
+                self.assertEqual(fast_fisher.get_stats()['two-sided']['calls'], 1)
+            finally:
+                fast_fisher.disable_stats()
+                fast_fisher.reset_stats()
+        finally:
+            set_backend('auto')
+
+    def test_backends(self, samples=100):
+        """
+        Every backend gives the same results through the package functions; 'auto' falls back unless strict
+        """
+        import os
+        import sys
+        import subprocess
+        from unittest.mock import patch
+        from types import ModuleType
+        import fast_fisher
+        from fast_fisher import BACKENDS, set_backend, backend_name, fast_fisher_exact_array
+        from fast_fisher.backends import _complete
+
+        a, b, c, d = np.array([[randint(0, 100) for _ in range(4)] for _ in range(samples)]).T.copy()
+        a[0] = -1
+        expected = {alternative: fast_fisher_cython.fisher_exact_batch(a, b, c, d, alternative, errors='nan')
+                    for alternative in ['two-sided', 'less', 'greater']}
+        significant = fast_fisher_cython.is_significant_batch(a, b, c, d, 0.05, errors='nan')
+        try:
+            for name in BACKENDS:
+                set_backend(name)
+                self.assertEqual(backend_name(), name)
+                for alternative, pvalues in expected.items():
+                    np.testing.assert_allclose(fast_fisher_exact_batch(a, b, c, d, alternative, errors='nan'),
+                                               pvalues, rtol=1e-9, err_msg=name)
+                    np.testing.assert_allclose(fast_fisher_exact_array(a[1:], b[1:], c[1:], d[1:], alternative),
+                                               pvalues[1:], rtol=1e-9, err_msg=name)
+                    self.assertAlmostEqual(fast_fisher_exact(a[1], b[1], c[1], d[1], alternative), pvalues[1],
+                                           delta=1e-9 * pvalues[1], msg=name)
+                with self.assertRaises(ValueError, msg=name):
+                    fast_fisher_exact_batch(a, b, c, d)
+                np.testing.assert_array_equal(table_status(a, b, c, d), fast_fisher_cython.table_status(a, b, c, d))
+                np.testing.assert_array_equal(is_significant_batch(a, b, c, d, 0.05, errors='nan'), significant,
+                                              err_msg=name)
+
+            # the compiled backend has no log-factorial table, but nothing silently comes from the python backend
+            with self.assertNoLogs(level='WARNING'):
+                set_backend('compiled')
+            with self.assertRaises(NotImplementedError):
+                fast_fisher.enable_lnfact_table()
+            with self.assertLogs(level='WARNING') as logs:
+                _complete(ModuleType('fast_fisher_empty'))
+            self.assertIn('is_significant', logs.output[0])
+
+            with self.assertRaises(ValueError):
+                set_backend('fortran')
+            with patch.dict(sys.modules, {'fast_fisher.fast_fisher_cython': None}):
+                with self.assertRaises(ImportError):
+                    set_backend('cython')
+                with self.assertRaises(ImportError):
+                    set_backend('auto', strict=True)
+                with self.assertLogs(level='WARNING'):
+                    set_backend('auto', strict=False)
+                self.assertEqual(backend_name(), 'python')
+        finally:
+            set_backend('auto')
+        self.assertEqual(backend_name(), 'cython')
+
+        # importing the package imports neither a backend nor numpy; FAST_FISHER_BACKEND chooses the backend
+        code = 'import sys, fast_fisher; ' \
+               'assert not {"numpy", "fast_fisher.fast_fisher_cython"} & set(sys.modules); ' \
+               'print(fast_fisher.backend_name(), fast_fisher.fast_fisher_exact(1, 2, 3, 4))'
+        root = os.path.dirname(os.path.dirname(fast_fisher_cython.__file__))
+        env = dict(os.environ, FAST_FISHER_BACKEND='python', PYTHONPATH=root)
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        name, pvalue = result.stdout.split()
+        self.assertEqual(name, 'python')
+        self.assertAlmostEqual(float(pvalue), fast_fisher_exact(1, 2, 3, 4))
+
+    def test_numba_batch(self, samples=1000):
+        """
+        The parallel numba kernels agree with the cython batch functions, including the per-table status
+        """
+        fast_fisher_numba.warm_up()
+        a, b, c, d = np.array([[randint(0, 1000) for _ in range(4)] for _ in range(samples)]).T.copy()
+        a[:10] = -1
+        d[10:20] = 2 ** 53
+        expected_status = fast_fisher_cython.table_status(a, b, c, d)
+        # int32 and int64 are used as they are, other types are converted
+        tables = [[x.astype(np.int32) for x in (a, b, c, d)], [a, b, c, d],
+                  [x.clip(0, 2 ** 16 - 1).astype(np.uint16) for x in (a, b, c, d)]]
+        for table in tables:
+            table64 = [x.astype(np.int64) for x in table]
+            for alternative in ['two-sided', 'less', 'greater']:
+                for output in ['pvalue', 'mln', 'mlog10']:
+                    status = np.empty(samples, dtype=np.int8)
+                    result = fast_fisher_numba.fisher_exact_batch(*table, alternative, output=output, errors='nan',
+                                                                  status=status, num_threads=2)
+                    expected = fast_fisher_cython.fisher_exact_batch(*table64, alternative, output=output, errors='nan')
+                    np.testing.assert_allclose(result, expected, rtol=1e-9, err_msg=f'{table[0].dtype} {alternative}')
+                    np.testing.assert_array_equal(status, fast_fisher_cython.table_status(*table64))
+        np.testing.assert_array_equal(fast_fisher_numba.table_status(a, b, c, d), expected_status)
+        # the tails are numbered as in the C API of fast_fisher_cython.pxd
+        self.assertEqual(fast_fisher_numba._TAILS, fast_fisher_cython._TAILS)
+
+        with self.assertRaises(ValueError):
+            fast_fisher_numba.fisher_exact_batch(a, b, c, d)
+        with self.assertRaises(OverflowError):
+            fast_fisher_numba.fisher_exact_batch(a[10:], b[10:], c[10:], d[10:])
+        with self.assertRaises(ValueError):
+            fast_fisher_numba.fisher_exact_batch(a, b, c, d, out=np.empty(samples, dtype=np.float32))
+
+        # broadcasting like the ufuncs
+        a, b, c, d = a[20:].reshape(-1, 10), b[20:].reshape(-1, 10), c[20:].reshape(-1, 10), 50
+        np.testing.assert_allclose(fast_fisher_numba.fisher_exact_array(a, b, c, d, 'less'),
+                                   fast_fisher_cython.fisher_exact_array(a, b, c, d, 'less'), rtol=1e-9)
+        np.testing.assert_array_equal(fast_fisher_numba.odds_ratio_array(a, b, c, d),
+                                      fast_fisher_cython.odds_ratio_array(a, b, c, d))
+
+    def test_vectorized(self, samples=3000):
+        """
+        The vectorized tail sums of the python backend agree with the cython backend, with or without scipy
+        """
+        from fast_fisher import vectorized
+
+        tables = np.array([[randint(0, 20) for _ in range(4)] for _ in range(samples)] +
+                          [[randint(0, 2000) for _ in range(4)] for _ in range(samples)] +
+                          # ties between the tails, and tables with only one possible value of a
+                          [[x, x, x, x] for x in range(50)] + [[0, 0, x, x] for x in range(50)]).T.copy()
+        large = np.array([[randint(0, 1000), randint(0, 1000), randint(10 ** 6, 10 ** 8), randint(10 ** 6, 10 ** 8)]
+                          for _ in range(100)]).T.copy()
+        try:
+            for lnfact_large in (None, vectorized._stirling):
+                vectorized._gammaln = lnfact_large
+                for alternative in ['two-sided', 'less', 'greater']:
+                    # near 0, -log(pvalue) is the difference of log-factorial sums of ~1e5, i.e. only exact to ~1e-11
+                    np.testing.assert_allclose(fast_fisher_python.fisher_exact_batch(*tables, alternative, output='mln'),
+                                               fast_fisher_cython.fisher_exact_batch(*tables, alternative, output='mln'),
+                                               rtol=1e-9, atol=1e-9, err_msg=alternative)
+                    # log-factorials above the table differ from lgamma in the last bits, i.e. ~1e-8 at such totals
+                    np.testing.assert_allclose(fast_fisher_python.fisher_exact_batch(*large, alternative, output='mln'),
+                                               fast_fisher_cython.fisher_exact_batch(*large, alternative, output='mln'),
+                                               rtol=1e-9, atol=1e-6, err_msg=alternative)
+        finally:
+            vectorized._gammaln = None
+
+        # broadcasting, and invalid tables raise like in the scalar functions
+        a, b, c = tables[0, :100].reshape(10, 10), tables[1, :10], 5
+        np.testing.assert_allclose(fast_fisher_python.fisher_exact_array(a, b, c, 7, 'greater'),
+                                   fast_fisher_cython.fisher_exact_array(a, b, c, 7, 'greater'), rtol=1e-9)
+        with self.assertRaises(ValueError):
+            fast_fisher_python.fisher_exact_array(a, b, -c, 7, 'greater')
+
+    def test_cython_api(self, samples=1000):
+        """
+        Other extensions can cimport the nogil kernels from fast_fisher_cython.pxd and call them in prange loops
+        """
+        import os
+        import os
+        from tempfile import TemporaryDirectory
+        from importlib.util import spec_from_file_location, module_from_spec
+        try:
+            from setuptools import Distribution, Extension
+            from Cython.Build import cythonize
+        except ImportError:
+            self.skipTest('needs Cython and setuptools')
+
+        source = """
+from cython.parallel cimport prange
+from fast_fisher.fast_fisher_cython cimport (
+    mlnTest2_nogil, mlnTest2t_nogil, is_significant_nogil, odds_ratio_nogil, check_table, FISHER_OK, TAIL_TWO
+)
+
+def scan(const long long[::1] a, const long long[::1] b, const long long[::1] c, const long long[::1] d,
+         double[::1] mln, double[::1] mln_left, signed char[::1] significant, double[::1] odds, signed char[::1] status):
+    cdef Py_ssize_t i
+    cdef int s
+    for i in prange(a.shape[0], nogil=True):
+        s = check_table(a[i], a[i] + b[i], a[i] + c[i], a[i] + b[i] + c[i] + d[i])
+        mln[i] = mlnTest2t_nogil(a[i], a[i] + b[i], a[i] + c[i], a[i] + b[i] + c[i] + d[i], &s)
+        mln_left[i] = mlnTest2_nogil(a[i], a[i] + b[i], a[i] + c[i], a[i] + b[i] + c[i] + d[i], &s)[0]
+        significant[i] = is_significant_nogil(TAIL_TWO, a[i], b[i], c[i], d[i], 0.05, &s)
+        odds[i] = odds_ratio_nogil(a[i], b[i], c[i], d[i])
+        status[i] = s
+"""
+        root = os.path.dirname(os.path.dirname(fast_fisher_cython.__file__))
+        with TemporaryDirectory() as tmp:
+            with open(f'{tmp}/downstream.pyx', 'w') as f:
+                f.write(source)
+            extensions = cythonize([Extension('downstream', [f'{tmp}/downstream.pyx'])], include_path=[root],
+                                   language_level=3, quiet=True)
+            build = Distribution({'ext_modules': extensions}).get_command_obj('build_ext')
+            build.build_lib, build.build_temp = tmp, f'{tmp}/build'
+            build.ensure_finalized()
+            build.run()
+            spec = spec_from_file_location('downstream', build.get_ext_fullpath('downstream'))
+            downstream = module_from_spec(spec)
+            spec.loader.exec_module(downstream)
+
+        a, b, c, d = np.array([[randint(0, 1000) for _ in range(4)] for _ in range(samples)]).T.copy()
+        a[0] = -1
+        mln, mln_left, odds = np.empty(samples), np.empty(samples), np.empty(samples)
+        significant, status = np.empty(samples, dtype=np.int8), np.empty(samples, dtype=np.int8)
+        downstream.scan(a, b, c, d, mln, mln_left, significant, odds, status)
+
+        np.testing.assert_array_equal(status, fast_fisher_cython.table_status(a, b, c, d))
+        self.assertTrue(np.isnan(mln[0]))
+        np.testing.assert_array_equal(mln, fast_fisher_cython.fisher_exact_batch(a, b, c, d, output='mln', errors='nan'))
+        # mlnTest2 computes all tails at once, slightly differently from mlnTest2l
+        np.testing.assert_allclose(mln_left, fast_fisher_cython.fisher_exact_batch(a, b, c, d, 'less', output='mln',
+                                                                                   errors='nan'), rtol=1e-12)
+        np.testing.assert_array_equal(significant.astype(bool),
+                                      fast_fisher_cython.is_significant_batch(a, b, c, d, 0.05, errors='nan'))
+        np.testing.assert_array_equal(odds, odds_ratio_array(a, b, c, d))
+
+    def test_presence_absence(self, genes=500, isolates=150):
+        """
+        The popcount-derived tables of a presence/absence matrix are those counted directly, and so are the results
+        """
+        from fast_fisher import presence
+
+        rng = np.random.default_rng(randint(0, 2 ** 32))
+        matrix = rng.random((genes, isolates)) < rng.random((genes, 1))
+        matrix[:10] = False
+        matrix[10:20] = True
+        screen = PresenceAbsence(matrix.astype(np.uint8), chunk_size=64)
+        self.assertEqual(screen.packed.shape, (genes, 3))
+        np.testing.assert_array_equal(screen.gene_counts, matrix.sum(axis=1))
+        # the lookup table for NumPy versions without np.bitwise_count
+        np.testing.assert_array_equal(presence._popcount_table(screen.packed).sum(axis=1), screen.gene_counts)
+
+        trait = (rng.random(isolates) < 0.3).astype(float)
+        for missing in (False, True):
+            if missing:
+                trait[rng.random(isolates) < 0.2] = np.nan
+            positive, negative = trait == 1, trait == 0
+            a, b = (matrix & positive).sum(axis=1), (matrix & negative).sum(axis=1)
+            c, d = positive.sum() - a, negative.sum() - b
+            for x, y in zip(screen.counts(trait), (a, b, c, d)):
+                np.testing.assert_array_equal(x, y)
+            for alternative in ['two-sided', 'less', 'greater']:
+                results, odds = screen.test(trait, alternative, output='mlog10')
+                np.testing.assert_array_equal(results, fast_fisher_exact_batch(a, b, c, d, alternative, output='mlog10'))
+                np.testing.assert_array_equal(odds, odds_ratio_array(a, b, c, d))
+
+        with self.assertRaises(ValueError):
+            screen.test(np.full(isolates, 2))
+        with self.assertRaises(ValueError):
+            screen.test(trait[1:])
+
+    def test_cooccurrence(self, genes=150, isolates=70):
+        """
+        The blockwise co-occurrence screen covers every pair of genes once, with the tables counted directly
+        """
+        rng = np.random.default_rng(randint(0, 2 ** 32))
+        matrix = (rng.random((genes, isolates)) < rng.random((genes, 1))).astype(np.int64)
+        matrix[:5] = 0
+        matrix[5:10] = 1
+        screen = PresenceAbsence(matrix)
+        i, j = np.triu_indices(genes, 1)
+        a = (matrix @ matrix.T)[i, j]
+        b = matrix.sum(axis=1)[i] - a
+        c = matrix.sum(axis=1)[j] - a
+        d = isolates - a - b - c
+        for alternative in ['two-sided', 'less', 'greater']:
+            expected = fast_fisher_exact_batch(a, b, c, d, alternative, output='mln')
+            for block_size, dedup in [(genes, False), (40, True), (7, False)]:
+                blocks = list(screen.cooccurrence(alternative, output='mln', block_size=block_size, dedup=dedup))
+                x, y, results = (np.concatenate(arrays) for arrays in zip(*blocks))
+                order = np.lexsort((y, x))
+                np.testing.assert_array_equal(x[order], i)
+                np.testing.assert_array_equal(y[order], j)
+                # dedup computes equivalent permutations of the tables, which differ by rounding near pvalue 1
+                np.testing.assert_allclose(results[order], expected, rtol=1e-12, atol=1e-12)
+
+            significant = is_significant_batch(a, b, c, d, 0.01, alternative)
+            x, y, results = (np.concatenate(arrays) for arrays in zip(*screen.cooccurrence(alternative, alpha=0.01,
+                                                                                           block_size=40)))
+            order = np.lexsort((y, x))
+            np.testing.assert_array_equal(x[order], i[significant])
+            np.testing.assert_array_equal(y[order], j[significant])
+            np.testing.assert_allclose(results[order], fast_fisher_exact_batch(
+                a[significant], b[significant], c[significant], d[significant], alternative), rtol=1e-12, atol=1e-12)
+
+        with self.assertRaises(ValueError):
+            next(screen.cooccurrence(block_size=0))
+        with self.assertRaises(ValueError):
+            next(screen.cooccurrence(alpha=0))
+
+    def test_result_store(self, n=3000):
+        """
+        The on-disk store returns the results of fast_fisher_exact_batch, for all equivalent tables, across instances
+        """
+        import os
+        from tempfile import TemporaryDirectory
+
+        rng = np.random.default_rng(randint(0, 2 ** 32))
+        a, b, c, d = (rng.integers(0, 40, n) for _ in range(4))
+        with TemporaryDirectory() as path:
+            store = ResultStore(path, max_segments=3)
+            self.assertTrue(np.isnan(store.lookup(a, b, c, d)).all())
+            for alternative in ['two-sided', 'less', 'greater']:
+                expected = fast_fisher_exact_batch(a, b, c, d, alternative, output='mln')
+                np.testing.assert_allclose(store.mln_batch(a, b, c, d, alternative), expected, rtol=1e-12, atol=1e-12)
+            # equivalent tables are stored once; for one-sided tests, half of them need the opposite tail
+            for alternative in ['two-sided', 'less', 'greater']:
+                for combination in FISHER_COMBINATIONS:
+                    x = dict(zip('abcd', (a, b, c, d)))
+                    np.testing.assert_allclose(store.lookup(*(x[letter] for letter in combination), alternative),
+                                               fast_fisher_exact_batch(*(x[letter] for letter in combination),
+                                                                       alternative, output='mln'),
+                                               rtol=1e-12, atol=1e-12)
+
+            reopened = ResultStore(path)
+            self.assertEqual(len(reopened), len(store))
+            np.testing.assert_allclose(reopened.fisher_exact_batch(a, b, c, d, 'less'),
+                                       fast_fisher_exact_batch(a, b, c, d, 'less'), rtol=1e-12, atol=1e-12)
+            self.assertEqual((reopened.hits, reopened.misses), (n, 0))
+
+            # four segments are merged into one, without duplicates
+            store.insert(a[:10], b[:10], c[:10], d[:10], 'two-sided', np.zeros(10))
+            self.assertEqual(len(os.listdir(path)), 3)
+            np.testing.assert_array_equal(store.lookup(a[:10], b[:10], c[:10], d[:10]), 0.)
+            self.assertEqual(len(store), len(reopened))
+
+            with self.assertRaises(ValueError):
+                store.insert(a, b, c, d, 'two-sided', np.zeros(n - 1))
+            with self.assertRaises(ValueError):
+                store.mln_batch(a, b, c, d, 'both')
+            with self.assertRaises(ValueError):
+                store.mln_batch([-1], [1], [1], [1])
+
+    def test_async(self, n=500):
+        """
+        Concurrent requests are coalesced into batches, small and invalid tables are computed right away
+        """
+        import asyncio
+
+        tables = [(randint(2500, 5000), randint(0, 5000), randint(0, 5000), randint(2500, 5000)) for _ in range(n)]
+        alternatives = [choice(['two-sided', 'less', 'greater']) for _ in range(n)]
+
+        async def run():
+            async with AsyncFisher(max_batch_size=100, max_delay=0.01) as fisher:
+                results = await asyncio.gather(*(fisher.fisher_exact(*table, alternative)
+                                                 for table, alternative in zip(tables, alternatives)))
+                self.assertEqual(fisher.batched_tables, n)
+                self.assertLessEqual(fisher.batches, n // 100 + 3)
+                self.assertEqual(await fisher.fisher_exact(1, 2, 3, 4, 'less'), fast_fisher_exact(1, 2, 3, 4, 'less'))
+                self.assertEqual(fisher.inline_tables, 1)
+                with self.assertRaises(ValueError):
+                    await fisher.fisher_exact(-1, 2, 3, 4)
+                with self.assertRaises(ValueError):
+                    await fisher.fisher_exact(1, 2, 3, 4, 'both')
+                # a lone table is sent after max_delay
+                self.assertEqual(await fisher.fisher_exact(*tables[0]), fast_fisher_exact(*tables[0]))
+                a, b, c, d = (np.array(x) for x in zip(*tables))
+                np.testing.assert_array_equal(await fisher.fisher_exact_batch(a, b, c, d, output='mln'),
+                                              fast_fisher_exact_batch(a, b, c, d, output='mln'))
+            return results
+
+        for result, table, alternative in zip(asyncio.run(run()), tables, alternatives):
+            self.assertEqual(result, fast_fisher_exact(*table, alternative))
+
+    def test_permutation_test(self, genes=200, isolates=60, permutations=150):
+        """
+        The Westfall-Young adjusted pvalues are those of testing every permuted trait with PresenceAbsence.test
+        """
+        rng = np.random.default_rng(randint(0, 2 ** 32))
+        matrix = rng.random((genes, isolates)) < rng.random((genes, 1))
+        matrix[:5] = matrix[5]
+        screen = PresenceAbsence(matrix)
+        trait = (rng.random(isolates) < 0.4).astype(float)
+        trait[rng.random(isolates) < 0.1] = np.nan
+        known = ~np.isnan(trait)
+        labels = np.zeros(known.sum(), dtype=np.float32)
+        labels[:int((trait == 1).sum())] = 1
+        for alternative in ['two-sided', 'less', 'greater']:
+            seed = randint(0, 2 ** 32)
+            pvalues, adjusted = screen.permutation_test(trait, permutations, alternative, seed=seed, batch_size=64,
+                                                        block_size=50)
+            observed = screen.test(trait, alternative, output='mln')[0]
+            np.testing.assert_allclose(pvalues, np.exp(-observed), rtol=1e-12)
+
+            # the same permutations, in the same batches
+            permuted = np.random.default_rng(seed)
+            maxima = []
+            for done in range(0, permutations, 64):
+                for labels_permuted in permuted.permuted(np.tile(labels, (min(64, permutations - done), 1)), axis=1):
+                    shuffled = np.full(isolates, np.nan)
+                    shuffled[known] = labels_permuted
+                    maxima.append(screen.test(shuffled, alternative, output='mln')[0].max())
+            expected = ((np.array(maxima)[None, :] >= observed[:, None]).sum(axis=1) + 1) / (permutations + 1)
+            np.testing.assert_array_equal(adjusted, expected)
+            self.assertTrue((adjusted >= pvalues).all())
+
+        with self.assertRaises(ValueError):
+            screen.permutation_test(trait, 0)
+        with self.assertRaises(ValueError):
+            screen.permutation_test(trait[1:])
@@ -7,11 +7,12 @@ from itertools import combinations, product
 from math import isclose, isnan, isinf
 from random import randint
 
+import numpy as np
 import pandas as pd
 
 from scipy.stats import fisher_exact
 
-from fast_fisher import fast_fisher_exact, fast_fisher_exact_compatibility, fast_fisher_python, fast_fisher_numba, fast_fisher_cython
+from fast_fisher import fast_fisher_exact, fast_fisher_exact_compatibility, fast_fisher_exact_array, fast_fisher_exact_batch, odds_ratio_array, fast_fisher_python, fast_fisher_numba, fast_fisher_cython
 
 try:
     from fast_fisher import fast_fisher_compiled